@@ -1,5 +1,12 @@
+from bedparse._version import __version__
+
 class BEDexception(Exception):
     pass
 
 from bedparse.bedline import bedline
+from bedparse.bedbatch import bedbatch
+from bedparse.compactbedline import compactbedline
 from bedparse.converters import gtf2bed
+from bedparse.bedindex import bedindex, parseRegion
+from bedparse.exonmap import exonmap
+from bedparse.dataframe import read_dataframe, to_dataframe, from_dataframe
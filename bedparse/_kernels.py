@@ -0,0 +1,342 @@
+from bedparse import BEDexception
+from bedparse.arrowio import columns
+
+# Column-wise versions of the transcript operations of bedline, computed with numpy.
+# They are used by bedbatch and by the DataFrame functions of bedparse.dataframe,
+# and give the same records and errors as the per-record functions of bedbatch
+
+def _numpy():
+    try:
+        import numpy
+        return numpy
+    except ImportError:
+        raise BEDexception("This operation requires the numpy package (pip install bedparse[numpy])")
+
+class bedcolumns(object):
+    """Columns of BED records as numpy arrays, keyed by their UCSC name.
+
+    The exon sizes and starts of all the records are concatenated, and those of
+    record i are between offsets[i] and offsets[i+1].
+    """
+    def __init__(self, bedType, data, offsets=None, extra=(), rows=None):
+        """
+        :param bedType: BED type of the records (3, 4, 6 or 12)
+        :type bedType: int
+        :param data: The columns, keyed by name
+        :type data: dict
+        :param offsets: Offsets of the blocks of each record (BED12 only)
+        :type offsets: numpy.ndarray
+        :param extra: Names of the columns after the BED ones
+        :type extra: list
+        :param rows: Index of the record each one derives from (None for the original records)
+        :type rows: numpy.ndarray
+        """
+        self.bedType=bedType
+        self.data=data
+        self.offsets=offsets
+        self.extra=list(extra)
+        self.rows=rows
+
+    def __len__(self):
+        return len(self.data["chromStart"])
+
+    def counts(self):
+        return _numpy().diff(self.offsets)
+
+    def blockRecords(self):
+        # Index of the record of each block
+        np=_numpy()
+        return np.repeat(np.arange(len(self)), self.counts())
+
+    def names(self):
+        if(self.bedType>=4):
+            return self.data["name"]
+        np=_numpy()
+        return np.full(len(self), "NoName", dtype=object)
+
+    def derive(self, bedType, rows, coords, offsets=None, name=None):
+        # New table with the records derived from the given rows. coords are the start,
+        # end, thickStart, thickEnd, blockSizes and blockStarts of the new records
+        data={"chrom": self.data["chrom"][rows]}
+        data["chromStart"], data["chromEnd"] = coords[0], coords[1]
+        if(bedType>=4):
+            data["name"]=self.names()[rows] if name is None else name
+        if(bedType>=6):
+            data["score"]=self.data["score"][rows]
+            data["strand"]=self.data["strand"][rows]
+        if(bedType==12):
+            data["thickStart"], data["thickEnd"] = coords[2], coords[3]
+            data["itemRgb"]=self.data["itemRgb"][rows]
+            data["blockCount"]=_numpy().diff(offsets)
+            data["blockSizes"], data["blockStarts"] = coords[4], coords[5]
+        for column in self.extra:
+            data[column]=self.data[column][rows]
+        return bedcolumns(bedType, data, offsets, self.extra, rows)
+
+def _segmentRank(flags, offsets, records):
+    # Number of True flags before each element within its record
+    np=_numpy()
+    total=np.concatenate(([0], np.cumsum(flags)))
+    return total[:-1]-total[offsets[:-1]][records]
+
+def fromBatch(batch):
+    """ Converts a bedbatch to numpy columns
+
+    Args:
+        batch (bedbatch): Records, all of the same BED type
+    Returns:
+        bedcolumns: The records
+    """
+    np=_numpy()
+    n=len(batch)
+    bedType=batch.bedType[0] if n else 3
+    if(any(x!=bedType for x in batch.bedType)):
+        raise BEDexception("All the records must be of the same BED type to be stored in a DataFrame")
+    data={"chrom": np.array(batch.chr, dtype=object),
+          "chromStart": np.array(batch.start, dtype=np.int64),
+          "chromEnd": np.array(batch.end, dtype=np.int64)}
+    offsets=None
+    if(bedType>=4):
+        data["name"]=np.array(batch.name, dtype=object)
+    if(bedType>=6):
+        data["score"]=np.array(batch.score, dtype=object)
+        data["strand"]=np.array(batch.strand, dtype=object)
+    if(bedType==12):
+        offsets=np.array(batch.exOffsets, dtype=np.int64)
+        data["thickStart"]=np.array(batch.cdsStart, dtype=np.int64)
+        data["thickEnd"]=np.array(batch.cdsEnd, dtype=np.int64)
+        data["itemRgb"]=np.array(batch.color, dtype=object)
+        data["blockCount"]=np.diff(offsets)
+        data["blockSizes"]=np.array(batch.exLengths, dtype=np.int64)
+        data["blockStarts"]=np.array(batch.exStarts, dtype=np.int64)
+    return bedcolumns(bedType, data, offsets)
+
+def toBatch(table):
+    """ Converts numpy columns to a bedbatch
+
+    Args:
+        table (bedcolumns): The records
+    Returns:
+        bedbatch: The records. Their source array holds the rows of the records they derive from
+    """
+    from array import array
+    from bedparse.bedbatch import bedbatch
+    np=_numpy()
+    n=len(table)
+    data=table.data
+    batch=bedbatch()
+    batch.bedType=array('b', [table.bedType])*n
+    batch.source=array('q', range(n)) if table.rows is None else array('q', table.rows.astype(np.int64).tobytes())
+    batch.chr=data["chrom"].tolist()
+    batch.start=array('q', data["chromStart"].astype(np.int64).tobytes())
+    batch.end=array('q', data["chromEnd"].astype(np.int64).tobytes())
+    batch.name=table.names().tolist()
+    batch.score=data["score"].tolist() if table.bedType>=6 else [None]*n
+    batch.strand=data["strand"].tolist() if table.bedType>=6 else [""]*n
+    if(table.bedType==12):
+        batch.cdsStart=array('q', data["thickStart"].astype(np.int64).tobytes())
+        batch.cdsEnd=array('q', data["thickEnd"].astype(np.int64).tobytes())
+        batch.color=data["itemRgb"].tolist()
+        batch.exOffsets=array('q', table.offsets.astype(np.int64).tobytes())
+        batch.exStarts=array('q', data["blockStarts"].astype(np.int64).tobytes())
+        batch.exLengths=array('q', data["blockSizes"].astype(np.int64).tobytes())
+    else:
+        batch.cdsStart=array('q', batch.start)
+        batch.cdsEnd=array('q', batch.start)
+        batch.color=[None]*n
+        batch.exOffsets=array('q', [0])*(n+1)
+    return batch
+
+def _firstError(errors, messages, names):
+    # Raises the message of the first record with an error, as bedbatch does
+    np=_numpy()
+    rows=[np.flatnonzero(x) for x in errors]
+    first=[x[0] if len(x) else None for x in rows]
+    if(all(x is None for x in first)):
+        return
+    row=min(x for x in first if x is not None)
+    raise BEDexception(messages[first.index(row)] % names[row])
+
+def promoter(table, up, down, strand):
+    """ Column-wise version of :meth:`bedparse.bedbatch.promoter`
+
+    Returns:
+        bedcolumns: The promoters as BED4 records
+    """
+    np=_numpy()
+    n=len(table)
+    data=table.data
+    start=data["chromStart"]
+    end=data["chromEnd"]
+    if(strand and n and table.bedType<6):
+        raise BEDexception("You requested stranded promoters, but the BED file appears to be unstranded")
+    if(strand and n):
+        plus=data["strand"]=="+"
+        minus=data["strand"]=="-"
+    else:
+        plus=np.ones(n, dtype=bool)
+        minus=np.zeros(n, dtype=bool)
+    newStart=np.where(plus, np.maximum(start-up, 0), np.maximum(end-down, 0))
+    newEnd=np.where(plus, start+down, end+up)
+    unknown=~(plus | minus)
+    _firstError([unknown, ~unknown & (newStart > newEnd)], ["Strand not recognised for transcript %s", "Start is greater than End for transcript %s"], table.names())
+    return table.derive(4, np.arange(n), (newStart, newEnd))
+
+def _check12(table, what):
+    # Errors of the operations that require stranded BED12 records
+    np=_numpy()
+    n=len(table)
+    stranded=(table.data["strand"]=="+") | (table.data["strand"]=="-") if table.bedType>=6 else np.zeros(n, dtype=bool)
+    _firstError([~stranded, np.full(n, table.bedType!=12)], [what, "Only BED12 lines are supported by this operation. %s is not"], table.names())
+
+def utr(table, which):
+    """ Column-wise version of :meth:`bedparse.bedbatch.utr`
+
+    Returns:
+        bedcolumns: The UTRs as BED12 records
+    """
+    np=_numpy()
+    if(which!=5 and which!=3):
+        raise BEDexception("'which' needs to be 3 or 5")
+    _check12(table, "UTRs for an unstranded transcript make little sense: %s")
+    if(len(table)==0):
+        return empty(table, 12)
+    data=table.data
+    start, end, cdsStart, cdsEnd = data["chromStart"], data["chromEnd"], data["thickStart"], data["thickEnd"]
+    offsets=table.offsets
+    records=table.blockRecords()
+    sizes=data["blockSizes"]
+    starts=data["blockStarts"]
+    ends=starts+sizes
+    coding=(cdsStart!=cdsEnd) & ~((cdsStart==start) & (cdsEnd==end))
+    # The first UTR is the 5'UTR of + transcripts and the 3'UTR of - transcripts
+    first=((data["strand"]=="+") & (which==5)) | ((data["strand"]=="-") & (which==3))
+    # First UTR: the blocks before relEnd, the last one clipped
+    relEnd=(cdsStart-start)[records]
+    clipped=relEnd <= ends
+    before=_segmentRank(clipped, offsets, records)==0
+    firstBlocks=(coding & first & (start!=cdsStart))[records] & before & (~clipped | (relEnd > starts))
+    firstSizes=np.where(clipped, relEnd-starts, sizes)
+    # Second UTR: the blocks after relStart, which moves to the start of the
+    # next block if the CDS ends at the end of a block
+    relStart=cdsEnd-start
+    atEnd=np.flatnonzero((ends==relStart[records]) & coding[records])
+    atEnd=atEnd[np.unique(records[atEnd], return_index=True)[1]]
+    atEnd=atEnd[atEnd+1 < offsets[records[atEnd]+1]]
+    relStart[records[atEnd]]=starts[atEnd+1]
+    relStart=relStart[records]
+    secondBlocks=(coding & ~first & (end!=cdsEnd))[records] & (ends > relStart)
+    inside=starts <= relStart
+    secondStarts=np.where(inside, 0, starts-relStart)
+    secondSizes=np.where(inside, ends-relStart, sizes)
+    blocks=firstBlocks | secondBlocks
+    firstRecords=first[records]
+    newStarts=np.where(firstRecords, starts, secondStarts)
+    newSizes=np.where(firstRecords, firstSizes, secondSizes)
+    counts=np.bincount(records[blocks], minlength=len(table))
+    last=np.flatnonzero(blocks)[np.maximum(np.cumsum(counts)-1, 0)] if blocks.any() else np.zeros(len(table), dtype=np.int64)
+    newStart=np.where(first, start, end-(newStarts[last]+newSizes[last]))
+    newEnd=np.where(first, start+newStarts[last]+newSizes[last], end)
+    rows=np.flatnonzero((counts > 0) & (newStart!=newEnd))
+    blocks&=np.isin(records, rows)
+    newOffsets=np.concatenate(([0], np.cumsum(counts[rows])))
+    return table.derive(12, rows, (newStart[rows], newEnd[rows], newStart[rows], newStart[rows], newSizes[blocks], newStarts[blocks]), newOffsets)
+
+def cds(table, ignoreCDSonly):
+    """ Column-wise version of :meth:`bedparse.bedbatch.cds`
+
+    Returns:
+        bedcolumns: The CDSs as BED12 records
+    """
+    np=_numpy()
+    _check12(table, "CDS for an unstranded transcript makes little sense: %s")
+    if(len(table)==0):
+        return empty(table, 12)
+    data=table.data
+    start, end, cdsStart, cdsEnd = data["chromStart"], data["chromEnd"], data["thickStart"], data["thickEnd"]
+    coding=cdsStart!=cdsEnd
+    if(ignoreCDSonly):
+        coding&=~((cdsStart==start) & (cdsEnd==end))
+    offsets=table.offsets
+    records=table.blockRecords()
+    sizes=data["blockSizes"]
+    starts=data["blockStarts"]
+    ends=starts+sizes
+    relStart=(cdsStart-start)[records]
+    relEnd=(cdsEnd-start)[records]
+    # The blocks from the one containing relStart to the one containing relEnd
+    last=(ends >= relEnd) & (ends >= relStart)
+    blocks=coding[records] & (ends >= relStart) & (_segmentRank(last, offsets, records)==0)
+    inside=starts < relStart
+    newStarts=np.where(inside, 0, starts-relStart)
+    newSizes=np.where(inside, ends-relStart, sizes)-np.where(last, ends-relEnd, 0)
+    rows=np.flatnonzero(coding)
+    counts=np.bincount(records[blocks], minlength=len(table))[rows]
+    newOffsets=np.concatenate(([0], np.cumsum(counts)))
+    return table.derive(12, rows, (cdsStart[rows], cdsEnd[rows], cdsStart[rows], cdsEnd[rows], newSizes[blocks], newStarts[blocks]), newOffsets)
+
+def introns(table):
+    """ Column-wise version of :meth:`bedparse.bedbatch.introns`
+
+    Returns:
+        bedcolumns: The introns as BED12 records
+    """
+    np=_numpy()
+    if(table.bedType<12 or len(table)==0):
+        return empty(table, 12)
+    data=table.data
+    offsets=table.offsets
+    counts=table.counts()
+    records=table.blockRecords()
+    sizes=data["blockSizes"]
+    starts=data["blockStarts"]
+    firstSize=sizes[offsets[:-1]]
+    lastSize=sizes[offsets[1:]-1]
+    # One intron after each block except the last of its record
+    blocks=np.flatnonzero(np.arange(len(sizes))!=offsets[1:][records]-1)
+    newStarts=starts[blocks]+sizes[blocks]-firstSize[records[blocks]]
+    newSizes=starts[blocks+1]-starts[blocks]-sizes[blocks]
+    rows=np.flatnonzero(counts >= 2)
+    newStart=data["chromStart"][rows]+firstSize[rows]
+    newOffsets=np.concatenate(([0], np.cumsum(counts[rows]-1)))
+    return table.derive(12, rows, (newStart, data["chromEnd"][rows]-lastSize[rows], newStart, newStart, newSizes, newStarts), newOffsets)
+
+def bed12tobed6(table, appendExN, whichExon):
+    """ Column-wise version of :meth:`bedparse.bedbatch.bed12tobed6`
+
+    Returns:
+        bedcolumns: The exons as BED6 records
+    """
+    np=_numpy()
+    if whichExon not in ("all", "first", "last"):
+        raise BEDexception("whichExon has to be one of [all, first, last]")
+    if(len(table)==0):
+        return empty(table, 6)
+    if(table.bedType!=12):
+        raise BEDexception("Only BED12 lines can be coverted to BED6")
+    data=table.data
+    offsets=table.offsets
+    if(whichExon=="all"):
+        blocks=np.arange(len(data["blockSizes"]))
+        rows=table.blockRecords()
+    else:
+        plus=data["strand"]=="+"
+        stranded=plus | (data["strand"]=="-")
+        _firstError([~stranded], ["whichExon is only allowed if the transcripts are stranded. %s is not"], table.names())
+        rows=np.arange(len(table))
+        blocks=np.where(plus==(whichExon=="first"), offsets[:-1], offsets[1:]-1)
+    name=None
+    if(appendExN):
+        numbers=blocks-offsets[:-1][rows]+1
+        name=table.names()[rows]+np.array(["_Exon%03d" % x for x in numbers], dtype=object)
+    newStart=data["chromStart"][rows]+data["blockStarts"][blocks]
+    return table.derive(6, rows, (newStart, newStart+data["blockSizes"][blocks]), name=name)
+
+def empty(table, bedType):
+    # No records, with the columns of the given BED type and the extra columns of table
+    np=_numpy()
+    data={}
+    for name in columns[:bedType]+table.extra:
+        numeric=name in ("chromStart", "chromEnd", "thickStart", "thickEnd", "blockCount", "blockSizes", "blockStarts")
+        data[name]=np.zeros(0, dtype=np.int64 if numeric else object)
+    return bedcolumns(bedType, data, np.zeros(1, dtype=np.int64) if bedType==12 else None, table.extra, np.zeros(0, dtype=np.int64))
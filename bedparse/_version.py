@@ -0,0 +1,3 @@
+# Version of bedparse. This is the only place where it is defined:
+# setup.py and the command line tool read it from here.
+__version__ = "0.2.3"
@@ -0,0 +1,281 @@
+import io
+import os
+import sys
+from bedparse import BEDexception
+from bedparse.tokenizer import tokenizeColumns, isHeader
+
+# Names of the BED columns, as in the UCSC specification
+columns=["chrom", "chromStart", "chromEnd", "name", "score", "strand",
+         "thickStart", "thickEnd", "itemRgb", "blockCount", "blockSizes", "blockStarts"]
+# Number of lines converted into each record batch
+batchLines=100000
+_bedTypes=(12, 6, 4, 3)
+_partitionColumn="chrom"
+
+def _pyarrow():
+    try:
+        import pyarrow
+        return pyarrow
+    except ImportError:
+        raise BEDexception("Arrow and Parquet files require the pyarrow package (pip install bedparse[arrow])")
+
+def bedType(nFields):
+    """ Returns the BED type of a line from its number of fields
+
+    The fields after the BED columns (e.g. the extra fields of gtf2bed)
+    are stored as string columns.
+
+    Args:
+        nFields (int): Number of fields of the line
+    Returns:
+        int: The largest BED type (3, 4, 6 or 12) with at most nFields columns
+    """
+    for n in _bedTypes:
+        if(n <= nFields):
+            return n
+    raise BEDexception("BED lines must have at least 3 fields")
+
+def schema(nFields, extraColumns=None):
+    """ Returns the Arrow schema of BED lines with a given number of fields
+
+    Coordinates are stored as int64, exon sizes and starts as list<int32>,
+    and the other fields as strings.
+
+    Args:
+        nFields (int): Number of fields of the lines
+        extraColumns (list): Names of the columns after the BED ones (default extra1, extra2...)
+    Returns:
+        pyarrow.Schema: The schema
+    """
+    pa=_pyarrow()
+    types={"chromStart": pa.int64(), "chromEnd": pa.int64(), "thickStart": pa.int64(), "thickEnd": pa.int64(),
+           "blockCount": pa.int32(), "blockSizes": pa.list_(pa.int32()), "blockStarts": pa.list_(pa.int32())}
+    n=bedType(nFields)
+    names=columns[:n]+_extraNames(nFields-n, extraColumns)
+    return pa.schema([pa.field(name, types.get(name, pa.string())) for name in names])
+
+def _extraNames(n, extraColumns):
+    extraColumns=[x for x in (extraColumns or []) if x]
+    return [extraColumns[i] if i < len(extraColumns) else "extra%d" % (i+1) for i in range(n)]
+
+def toTable(lines, extraColumns=None):
+    """ Converts BED lines to an Arrow table
+
+    All the lines must have the same number of fields. The BED fields are validated as
+    by :func:`bedparse.tokenizer.tokenize`.
+
+    Args:
+        lines (list): Lines of a BED file (bytes, without line terminator)
+        extraColumns (list): Names of the columns after the BED ones (default extra1, extra2...)
+    Returns:
+        pyarrow.Table: The table. See :func:`schema`
+    """
+    pa=_pyarrow()
+    values, offsets = tokenizeColumns(lines)[1:]
+    fileSchema=schema(len(values), extraColumns)
+    arrays=[]
+    for i, field in enumerate(fileSchema):
+        if(field.name=="blockSizes" or field.name=="blockStarts"):
+            flat=pa.array(values[i], type=pa.int32())
+            arrays.append(pa.ListArray.from_arrays(pa.array(offsets, type=pa.int32()), flat))
+        elif(pa.types.is_string(field.type)):
+            arrays.append(pa.array([x.decode() for x in values[i]], type=field.type))
+        else:
+            arrays.append(pa.array(values[i], type=field.type))
+    return pa.Table.from_arrays(arrays, schema=fileSchema)
+
+def formatBatch(batch):
+    """ Formats an Arrow record batch or table with BED columns as BED lines
+
+    The columns are matched by name (see :data:`columns`), so they can be in any order,
+    and the other columns are appended after the BED ones in the order of the table.
+
+    Args:
+        batch (pyarrow.RecordBatch): The records
+    Returns:
+        bytes: The BED lines, each terminated by a new line
+    """
+    names=batch.schema.names
+    bed=[name for name in columns if name in names]
+    if(bed!=columns[:len(bed)] or bedType(len(bed))!=len(bed)):
+        raise BEDexception("The table doesn't have the columns of a BED file: "+", ".join(names))
+    order=bed+[name for name in names if name not in columns]
+    data=[batch.column(names.index(name)).to_pylist() for name in order]
+    for i, name in enumerate(order):
+        if(name=="blockSizes" or name=="blockStarts"):
+            data[i]=[''.join("%d," % x for x in blocks) for blocks in data[i]]
+    lines=['\t'.join("." if x is None else str(x) for x in record) for record in zip(*data)]
+    if(not lines):
+        return b''
+    return ('\n'.join(lines)+'\n').encode()
+
+def readBatches(path):
+    """ Reads the record batches of an Arrow IPC file, a Parquet file or a directory of Parquet files partitioned by chromosome
+
+    Arrow IPC files are memory mapped, so their columns are not copied.
+
+    Args:
+        path (str): Path to the file or directory, or - for a Parquet or Arrow file on stdin
+    Returns:
+        generator: pyarrow.RecordBatch objects
+    """
+    pa=_pyarrow()
+    if(os.path.isdir(path)):
+        import pyarrow.dataset as ds
+        # Chromosome names are strings even if they look like numbers
+        partitioning=ds.partitioning(pa.schema([(_partitionColumn, pa.string())]), flavor="hive")
+        for batch in ds.dataset(path, format="parquet", partitioning=partitioning).to_batches(batch_size=batchLines):
+            yield batch
+        return
+    from bedparse.compressed import detectFormat
+    source=pa.BufferReader(sys.stdin.buffer.read()) if path=='-' else pa.memory_map(path)
+    with source:
+        fmt=detectFormat(source.read(16))
+        source.seek(0)
+        if(fmt=="arrow"):
+            reader=pa.ipc.open_file(source)
+            for i in range(reader.num_record_batches):
+                yield reader.get_batch(i)
+        elif(fmt=="parquet"):
+            import pyarrow.parquet as pq
+            for batch in pq.ParquetFile(source).iter_batches(batch_size=batchLines):
+                yield batch
+        else:
+            raise BEDexception(path+" is not an Arrow IPC or Parquet file")
+
+def readTable(path):
+    """ Reads an Arrow IPC or Parquet file (or partitioned directory) into a single table
+
+    Args:
+        path (str): Path to the file or directory
+    Returns:
+        pyarrow.Table: The table
+    """
+    pa=_pyarrow()
+    batches=list(readBatches(path))
+    if(not batches):
+        raise BEDexception(path+" doesn't contain any record")
+    return pa.Table.from_batches(batches)
+
+class _tablereader(io.RawIOBase):
+    # Presents an Arrow or Parquet file as the text of the corresponding BED file
+    def __init__(self, path):
+        self.batches=readBatches(path)
+        self.current=memoryview(b'')
+        self.name=None
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while(not self.current):
+            batch=next(self.batches, None)
+            if(batch is None):
+                return 0
+            self.current=memoryview(formatBatch(batch))
+        size=min(len(buffer), len(self.current))
+        buffer[:size]=self.current[:size]
+        self.current=self.current[size:]
+        return size
+
+def openTable(path, mode='rb'):
+    """ Opens an Arrow IPC or Parquet file (or a partitioned directory) as a BED text file
+
+    Args:
+        path (str): Path to the file or directory, or - for stdin
+        mode (str): rb for binary or r for text
+    Returns:
+        file: The file object
+    """
+    data=io.BufferedReader(_tablereader(path), 1<<20)
+    if(mode=='rb'):
+        return data
+    return io.TextIOWrapper(data)
+
+class _tablewriter(object):
+    # Parses the BED text written to it and stores it in an Arrow IPC or Parquet
+    # file, or in a directory of Parquet files with one subdirectory per chromosome
+    def __init__(self, path, fmt, partition=False, extraColumns=None):
+        if(partition and fmt!="parquet"):
+            raise BEDexception("Only Parquet output can be partitioned by chromosome")
+        if(path=='-'):
+            raise BEDexception("Arrow and Parquet output must be written to a file")
+        _pyarrow()
+        self.path=path
+        self.fmt=fmt
+        self.partition=partition
+        self.extraColumns=extraColumns
+        self.writers=dict()
+        self.pending=[]
+        self.lines=0
+        self.closed=False
+        if(partition):
+            os.makedirs(path)
+
+    def write(self, data):
+        lines=data.split(b'\n')
+        if(self.pending):
+            lines[0]=self.pending.pop()+lines[0]
+        self.pending.extend(lines)
+        self.lines+=len(lines)
+        if(self.lines > batchLines):
+            self._flushLines(complete=False)
+        return len(data)
+
+    def _flushLines(self, complete):
+        lines=self.pending
+        # The last element is an incomplete line (empty if the data ended with a new line)
+        self.pending=[] if complete else [lines.pop()]
+        self.lines=len(self.pending)
+        lines=[x for x in lines if not isHeader(x)]
+        if(not lines):
+            return
+        if(not self.partition):
+            self._write(None, toTable(lines, self.extraColumns))
+            return
+        groups=dict()
+        for line in lines:
+            groups.setdefault(line[:line.find(b'\t')], []).append(line)
+        for chrom, group in groups.items():
+            table=toTable(group, self.extraColumns)
+            self._write(chrom.decode(), table.remove_column(0))
+
+    def _write(self, key, table):
+        writer=self.writers.get(key)
+        if(writer is None):
+            pa=_pyarrow()
+            if(self.fmt=="arrow"):
+                writer=pa.ipc.new_file(self.path, table.schema)
+            else:
+                import pyarrow.parquet as pq
+                path=self.path
+                if(key is not None):
+                    from urllib.parse import quote
+                    directory=os.path.join(self.path, "%s=%s" % (_partitionColumn, quote(key, safe='')))
+                    os.makedirs(directory)
+                    path=os.path.join(directory, "part-0.parquet")
+                writer=pq.ParquetWriter(path, table.schema)
+            self.writers[key]=writer
+        elif(not writer.schema.equals(table.schema)):
+            raise BEDexception("All the lines must have the same number of fields to be stored in Arrow or Parquet files")
+        writer.write_table(table)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        if(self.closed):
+            return
+        self.closed=True
+        try:
+            self._flushLines(complete=True)
+        finally:
+            for writer in self.writers.values():
+                writer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
@@ -0,0 +1,567 @@
+import sys
+from array import array
+from bedparse import BEDexception
+from bedparse.bedline import bedline
+from bedparse.exonmap import exonmap
+from bedparse.tokenizer import tokenize
+
+# The functions below are the per-record kernels shared by all the
+# bedbatch methods. They work on plain integers and on the exon starts
+# and lengths of a single transcript, and return None whenever the
+# equivalent bedline method would return None.
+
+def _utr(start, end, cdsStart, cdsEnd, strand, which, exStarts, exLens):
+    nEx=len(exStarts)
+    # This block return the first UTR, i.e. the 5'UTR of + transcripts
+    # or the 3' UTR of - transcripts
+    if((strand=="+" and which==5) or (strand=="-" and which==3)):
+        if(start == cdsStart):
+            return None
+        relEnd=cdsStart-start
+        newStarts=[]
+        newLens=[]
+        for i in range(0, nEx):
+            exEnd=exStarts[i]+exLens[i]
+            if(relEnd <= exEnd):
+                if(relEnd > exStarts[i]):
+                    newStarts.append(exStarts[i])
+                    newLens.append(relEnd-exStarts[i])
+                break
+            newStarts.append(exStarts[i])
+            newLens.append(exLens[i])
+        if(not newStarts):
+            return None
+        end=start+newStarts[-1]+newLens[-1]
+    # This block returns the second UTR, i.e the 3'UTR of + transcripts
+    # or the 5'UTR of - transcripts
+    else:
+        if(end == cdsEnd):
+            return None
+        relStart=cdsEnd-start
+        newStarts=[]
+        newLens=[]
+        for i in range(0, nEx):
+            exEnd=exStarts[i]+exLens[i]
+            if(relStart > exEnd):
+                continue
+            elif(relStart == exEnd):
+                relStart=exStarts[i+1]
+            elif(exStarts[i] <= relStart):
+                newStarts.append(0)
+                newLens.append(exEnd-relStart)
+            else:
+                newStarts.append(exStarts[i]-relStart)
+                newLens.append(exLens[i])
+        if(not newStarts):
+            return None
+        start=end-(newStarts[-1]+newLens[-1])
+    if(start == end):
+        return None
+    return (start, end, start, start, newStarts, newLens)
+
+def _cds(start, cdsStart, cdsEnd, exStarts, exLens):
+    relStart=cdsStart-start
+    relEnd=cdsEnd-start
+    newStarts=[]
+    newLens=[]
+    for i in range(0, len(exStarts)):
+        exEnd=exStarts[i]+exLens[i]
+        # Skip the exons that end before the start of the CDS
+        if(relStart > exEnd):
+            continue
+        elif(exStarts[i] < relStart):
+            newStarts.append(0)
+            newLens.append(exEnd-relStart)
+        else:
+            newStarts.append(exStarts[i]-relStart)
+            newLens.append(exLens[i])
+        # Trim the last exon at the end of the CDS
+        if(relEnd <= exEnd):
+            newLens[-1]=newLens[-1]-(exEnd-relEnd)
+            break
+    return (cdsStart, cdsEnd, cdsStart, cdsEnd, newStarts, newLens)
+
+def _introns(start, end, exStarts, exLens):
+    nEx=len(exStarts)
+    if(nEx < 2):
+        return None
+    first=exLens[0]
+    newStarts=[exStarts[n]+exLens[n]-first for n in range(0, nEx-1)]
+    newLens=[exStarts[n+1]-exStarts[n]-exLens[n] for n in range(0, nEx-1)]
+    return (start+first, end-exLens[-1], start+first, start+first, newStarts, newLens)
+
+class bedbatch(object):
+    """The bedbatch class holds a collection of BED[3,4,6,12] lines in columnar form.
+
+    Coordinates are stored in typed arrays (one element per record), while the exon
+    blocks of all records are concatenated in two flat arrays (exStarts and exLengths).
+    The blocks of record i are those between exOffsets[i] and exOffsets[i+1].
+    The methods of this class mirror those of :class:`bedparse.bedline`, but operate
+    on all the records at once and return a new bedbatch. Records for which the
+    corresponding bedline method returns None are omitted from the result, and the
+    `source` array reports, for each output record, the index of the input record it
+    derives from.
+
+    When numpy is installed, promoter, utr, cds, introns and bed12tobed6 work on
+    whole columns with numpy (the same functions are used by :mod:`bedparse.dataframe`).
+    Without numpy, or when the records have different BED types, they process one
+    record at a time with the kernels shared with :class:`bedparse.compactbedline`.
+    """
+    def __init__(self, lines=None):
+        """
+        :param lines: Iterable where each element is a list corresponding to the fields of a BED line
+        :type lines: iterable
+        """
+        self.bedType=array('b')
+        self.chr=[]
+        self.start=array('q')
+        self.end=array('q')
+        self.name=[]
+        self.score=[]
+        self.strand=[]
+        self.cdsStart=array('q')
+        self.cdsEnd=array('q')
+        self.color=[]
+        self.exOffsets=array('q', [0])
+        self.exStarts=array('q')
+        self.exLengths=array('q')
+        self.source=array('q')
+        if(lines is not None):
+            for line in lines:
+                self.append(bedline(line))
+
+    @classmethod
+    def fromLines(cls, lines):
+        """ Parses a list of BED lines into a bedbatch
+
+        Args:
+            lines (list): Lines of a BED file (bytes or str)
+        Returns:
+            bedbatch: The parsed records
+        """
+        batch=cls()
+        for line in lines:
+            if(isinstance(line, str)):
+                line=line.encode()
+            batch.appendFields(tokenize(line))
+        return batch
+
+    @classmethod
+    def fromFile(cls, bedfile, size=None):
+        """ Reads a BED file into bedbatch objects
+
+        Args:
+            bedfile (file): BED file, preferably opened in binary mode
+            size (int): Maximum number of records per batch. If None the whole file is read in a single batch.
+        Returns:
+            generator: bedbatch objects, in the same order as the lines of the file
+        """
+        batch=cls()
+        for line in bedfile:
+            if(isinstance(line, str)):
+                line=line.encode()
+            batch.appendFields(tokenize(line))
+            if(size is not None and len(batch) >= size):
+                yield batch
+                batch=cls()
+        if(len(batch) > 0 or size is None):
+            yield batch
+
+    def __len__(self):
+        return len(self.start)
+
+    def __getitem__(self, i):
+        return bedline(self.fields(i))
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def __eq__(self, other):
+        return self.__dict__ == other.__dict__
+
+    def append(self, record, source=None):
+        """ Appends a bedline object to the batch
+
+        Args:
+            record (bedline): The record to add
+            source (int): Index of the record this one derives from. Defaults to its own index.
+        """
+        self.source.append(len(self) if source is None else source)
+        self.bedType.append(record.bedType)
+        self.chr.append(record.chr)
+        self.start.append(record.start)
+        self.end.append(record.end)
+        self.name.append(record.name)
+        self.score.append(record.score if record.bedType>=6 else None)
+        self.strand.append(record.strand if record.bedType>=6 else "")
+        if(record.bedType==12):
+            self.cdsStart.append(record.cdsStart)
+            self.cdsEnd.append(record.cdsEnd)
+            self.color.append(record.color)
+            self.exStarts.extend(int(x) for x in record.exStarts.split(","))
+            self.exLengths.extend(int(x) for x in record.exLengths.split(","))
+        else:
+            self.cdsStart.append(record.start)
+            self.cdsEnd.append(record.start)
+            self.color.append(None)
+        self.exOffsets.append(len(self.exStarts))
+
+    def appendFields(self, fields, source=None):
+        """ Appends a record to the batch from its tokenized fields
+
+        Args:
+            fields (list): The fields of a BED line, as returned by :func:`bedparse.tokenizer.tokenize`
+            source (int): Index of the record this one derives from. Defaults to its own index.
+        """
+        bedType=len(fields)
+        self.source.append(len(self) if source is None else source)
+        self.bedType.append(bedType)
+        self.chr.append(fields[0].decode())
+        self.start.append(fields[1])
+        self.end.append(fields[2])
+        self.name.append(fields[3].decode() if bedType>=4 else "NoName")
+        if(bedType>=6):
+            self.score.append(fields[4].decode())
+            self.strand.append(fields[5].decode())
+        else:
+            self.score.append(None)
+            self.strand.append("")
+        if(bedType==12):
+            self.cdsStart.append(fields[6])
+            self.cdsEnd.append(fields[7])
+            self.color.append(fields[8].decode())
+            self.exStarts.extend(fields[11])
+            self.exLengths.extend(fields[10])
+        else:
+            self.cdsStart.append(fields[1])
+            self.cdsEnd.append(fields[1])
+            self.color.append(None)
+        self.exOffsets.append(len(self.exStarts))
+
+    def _add(self, source, bedType, coords):
+        # Appends the coordinates of a new record derived from record
+        # number source. coords is a tuple as returned by the kernels
+        start, end, cdsStart, cdsEnd, exStarts, exLens = coords
+        self.source.append(source)
+        self.bedType.append(bedType)
+        self.start.append(start)
+        self.end.append(end)
+        self.cdsStart.append(cdsStart)
+        self.cdsEnd.append(cdsEnd)
+        self.exStarts.extend(exStarts)
+        self.exLengths.extend(exLens)
+        self.exOffsets.append(len(self.exStarts))
+
+    def _copyMeta(self, other, i, name=None):
+        # Copies the non-coordinate fields of record i of other
+        self.chr.append(other.chr[i])
+        self.name.append(other.name[i] if name is None else name)
+        self.score.append(other.score[i])
+        self.strand.append(other.strand[i])
+        self.color.append(other.color[i])
+
+    def extend(self, other):
+        """ Appends all the records of another bedbatch to this one
+
+        Args:
+            other (bedbatch): The records to add. Their source indices are kept unchanged.
+        """
+        for i in range(len(other)):
+            starts, lens = other.blocks(i)
+            self._add(other.source[i], other.bedType[i], (other.start[i], other.end[i], other.cdsStart[i], other.cdsEnd[i], starts, lens))
+            self._copyMeta(other, i)
+
+    def take(self, indices):
+        """ Returns a new bedbatch with a subset of the records
+
+        Args:
+            indices (iterable): Indices of the records to report, in the desired order
+        Returns:
+            bedbatch: The selected records
+        """
+        result=bedbatch()
+        for i in indices:
+            starts, lens = self.blocks(i)
+            result._add(self.source[i], self.bedType[i], (self.start[i], self.end[i], self.cdsStart[i], self.cdsEnd[i], starts, lens))
+            result._copyMeta(self, i)
+        return result
+
+    def blocks(self, i):
+        """ Returns the exon starts and lengths of a record
+
+        Args:
+            i (int): Index of the record
+        Returns:
+            tuple: Two arrays with the exon starts and exon lengths
+        """
+        return (self.exStarts[self.exOffsets[i]:self.exOffsets[i+1]], self.exLengths[self.exOffsets[i]:self.exOffsets[i+1]])
+
+    def exonMap(self, i):
+        """ Returns the map between transcript and genome coordinates of a record
+
+        Args:
+            i (int): Index of the record
+        Returns:
+            exonmap: The map of the record. See :class:`bedparse.exonmap`
+        """
+        exStarts, exLengths = self.blocks(i)
+        if(self.bedType[i] < 12):
+            exStarts, exLengths = [0], [self.end[i]-self.start[i]]
+        return exonmap(self.start[i], exStarts, exLengths, self.strand[i] if self._stranded(i) else ".")
+
+    def fields(self, i):
+        """ Returns the fields of a record as a list, as they would be printed in a BED file
+
+        Args:
+            i (int): Index of the record
+        Returns:
+            list: One element per BED field
+        """
+        bedType=self.bedType[i]
+        if(bedType==12):
+            starts, lens = self.blocks(i)
+            return [self.chr[i], self.start[i], self.end[i], self.name[i], self.score[i], self.strand[i],
+                    self.cdsStart[i], self.cdsEnd[i], self.color[i], len(starts),
+                    ''.join(str(x)+"," for x in lens), ''.join(str(x)+"," for x in starts)]
+        out=[self.chr[i], self.start[i], self.end[i], self.name[i], self.score[i], self.strand[i]]
+        return out[:bedType]
+
+    def format(self, end='\n'):
+        """Formats all the records of the batch as BED lines
+
+        :param end: Line terminator character
+        :returns: str
+        """
+        out=[]
+        exOffsets=self.exOffsets
+        exStarts=self.exStarts
+        exLengths=self.exLengths
+        for i in range(len(self)):
+            bedType=self.bedType[i]
+            if(bedType==12):
+                first=exOffsets[i]
+                last=exOffsets[i+1]
+                out.append("%s\t%d\t%d\t%s\t%s\t%s\t%d\t%d\t%s\t%d\t%s,\t%s,%s" % (self.chr[i], self.start[i], self.end[i],
+                           self.name[i], self.score[i], self.strand[i], self.cdsStart[i], self.cdsEnd[i], self.color[i], last-first,
+                           ','.join(map(str, exLengths[first:last])), ','.join(map(str, exStarts[first:last])), end))
+            elif(bedType==6):
+                out.append("%s\t%d\t%d\t%s\t%s\t%s%s" % (self.chr[i], self.start[i], self.end[i], self.name[i], self.score[i], self.strand[i], end))
+            else:
+                out.append('\t'.join(str(x) for x in self.fields(i)))
+                out.append(end)
+        return ''.join(out)
+
+    def print(self, end='\n'):
+        """Prints all the records of the batch
+
+        :param end: Line terminator character
+        """
+        sys.stdout.write(self.format(end=end))
+
+    def _columnar(self):
+        # The records as numpy columns for the column-wise operations, or
+        # None if numpy is not installed or the records have different BED types
+        if(len(self)==0 or self.bedType.count(self.bedType[0])!=len(self)):
+            return None
+        try:
+            import numpy
+        except ImportError:
+            return None
+        from bedparse import _kernels
+        return _kernels.fromBatch(self)
+
+    def _check12(self, i):
+        if(self.bedType[i]!=12):
+            raise BEDexception("Only BED12 lines are supported by this operation. "+self.name[i]+" is not")
+
+    def _stranded(self, i):
+        return self.strand[i]=="+" or self.strand[i]=="-"
+
+    def promoter(self, up=500, down=500, strand=True):
+        """ Returns the promoters of all records. See :meth:`bedparse.bedline.promoter`
+
+        Args:
+            up (int): Number of upstream bases
+            down (int): Number of donwstream bases
+            strand (bool): If false strandedness is ignored
+        Returns:
+            bedbatch: The promoters as a BED4 bedbatch
+        """
+        table=self._columnar()
+        if(table is not None):
+            from bedparse import _kernels
+            return _kernels.toBatch(_kernels.promoter(table, up, down, strand))
+        result=bedbatch()
+        for i in range(len(self)):
+            if(strand and self.bedType[i]<6):
+                raise BEDexception("You requested stranded promoters, but the BED file appears to be unstranded")
+            if(not strand or self.strand[i]=="+"):
+                start=self.start[i]-up if self.start[i]-up>0 else 0
+                end=self.start[i]+down
+            elif(self.strand[i]=="-"):
+                start=self.end[i]-down if self.end[i]-down>0 else 0
+                end=self.end[i]+up
+            else:
+                raise BEDexception("Strand not recognised for transcript "+self.name[i])
+            if(start>end):
+                raise BEDexception("Start is greater than End for transcript "+self.name[i])
+            result._add(i, 4, (start, end, start, start, (), ()))
+            result.chr.append(self.chr[i])
+            result.name.append(self.name[i])
+            result.score.append(None)
+            result.strand.append("")
+            result.color.append(None)
+        return result
+
+    def utr(self, which=None):
+        """ Returns the UTRs of coding transcripts. See :meth:`bedparse.bedline.utr`
+
+        Args:
+            which (int): Which UTR to return: 3 for 3'UTR or 5 for 5' UTR
+        Returns:
+            bedbatch: The UTRs as a BED12 bedbatch
+        """
+        if(which!=5 and which!=3):
+            raise BEDexception("'which' needs to be 3 or 5")
+        table=self._columnar()
+        if(table is not None):
+            from bedparse import _kernels
+            return _kernels.toBatch(_kernels.utr(table, which))
+        result=bedbatch()
+        for i in range(len(self)):
+            if(not self._stranded(i)):
+                raise BEDexception("UTRs for an unstranded transcript make little sense: "+self.name[i])
+            self._check12(i)
+            start=self.start[i]
+            end=self.end[i]
+            cdsStart=self.cdsStart[i]
+            cdsEnd=self.cdsEnd[i]
+            if(cdsStart==cdsEnd or (cdsStart==start and cdsEnd==end)):
+                continue
+            starts, lens = self.blocks(i)
+            coords=_utr(start, end, cdsStart, cdsEnd, self.strand[i], which, starts, lens)
+            if(coords is not None):
+                result._add(i, 12, coords)
+                result._copyMeta(self, i)
+        return result
+
+    def cds(self, ignoreCDSonly=False):
+        """ Returns the CDS of coding transcripts. See :meth:`bedparse.bedline.cds`
+
+        Args:
+            ignoreCDSonly (bool): If True skip transcripts that entirely consist of CDS
+        Returns:
+            bedbatch: The CDSs as a BED12 bedbatch
+        """
+        table=self._columnar()
+        if(table is not None):
+            from bedparse import _kernels
+            return _kernels.toBatch(_kernels.cds(table, ignoreCDSonly))
+        result=bedbatch()
+        for i in range(len(self)):
+            if(not self._stranded(i)):
+                raise BEDexception("CDS for an unstranded transcript makes little sense: "+self.name[i])
+            self._check12(i)
+            start=self.start[i]
+            cdsStart=self.cdsStart[i]
+            cdsEnd=self.cdsEnd[i]
+            if(cdsStart==cdsEnd):
+                continue
+            if(ignoreCDSonly and cdsStart==start and cdsEnd==self.end[i]):
+                continue
+            starts, lens = self.blocks(i)
+            result._add(i, 12, _cds(start, cdsStart, cdsEnd, starts, lens))
+            result._copyMeta(self, i)
+        return result
+
+    def introns(self):
+        """ Returns the introns of all transcripts. See :meth:`bedparse.bedline.introns`
+
+        Returns:
+            bedbatch: The introns as a BED12 bedbatch
+        """
+        table=self._columnar()
+        if(table is not None):
+            from bedparse import _kernels
+            return _kernels.toBatch(_kernels.introns(table))
+        result=bedbatch()
+        for i in range(len(self)):
+            if(self.bedType[i]<12):
+                continue
+            starts, lens = self.blocks(i)
+            coords=_introns(self.start[i], self.end[i], starts, lens)
+            if(coords is not None):
+                result._add(i, 12, coords)
+                result._copyMeta(self, i)
+        return result
+
+    def translateChr(self, assembly, target, suppress=False, ignore=False, patches=False):
+        """ Converts the chromosome names of all records. See :meth:`bedparse.bedline.translateChr`
+
+        Each distinct chromosome name is converted only once.
+
+        Args:
+            assembly (str): Assembly of the BED file (either hg38 or mm10).
+            target (str): Desidered chromosome name convention (ucsc or ens).
+            suppress (bool): Do not report records whose chromosome can't be converted
+            ignore (bool): Set the chromosomes that can't be converted to 'NA'
+            patches (bool): Allows conversion of all patches up to p11 for hg38 and p4 for mm10
+        Returns:
+            bedbatch: The records with the converted chromosomes
+        """
+        from bedparse.translator import getTranslator
+        translator=getTranslator(assembly, target, patches)
+        if(ignore and suppress):
+            raise BEDexception("Only one of allowMissing and suppressMissing is allowed")
+        names=translator.translateNames(self.chr)
+        result=bedbatch()
+        for i in range(len(self)):
+            if(names[i] is None):
+                if(suppress):
+                    continue
+                if(not ignore):
+                    raise BEDexception("The chromosome of transcript %s (%s) can't be found in the DB." % (self.name[i], self.chr[i]))
+            starts, lens = self.blocks(i)
+            result._add(i, self.bedType[i], (self.start[i], self.end[i], self.cdsStart[i], self.cdsEnd[i], starts, lens))
+            result._copyMeta(self, i)
+            result.chr[-1]="NA" if names[i] is None else names[i]
+        return result
+
+    def bed12tobed6(self, appendExN=False, whichExon="all"):
+        """ Returns the exons of all transcripts. See :meth:`bedparse.bedline.bed12tobed6`
+
+        Args:
+            appendExN (bool): Appends the exon number to the transcript name
+            whichExon (str): Which exon to return. One of ["all", "first", "last"].
+        Returns:
+            bedbatch: The exons as a BED6 bedbatch
+        """
+        if whichExon not in ("all", "first", "last"):
+            raise BEDexception("whichExon has to be one of [all, first, last]")
+        table=self._columnar()
+        if(table is not None):
+            from bedparse import _kernels
+            return _kernels.toBatch(_kernels.bed12tobed6(table, appendExN, whichExon))
+        result=bedbatch()
+        for i in range(len(self)):
+            if(self.bedType[i]!=12):
+                raise BEDexception("Only BED12 lines can be coverted to BED6")
+            if(whichExon!="all" and not self._stranded(i)):
+                raise BEDexception("whichExon is only allowed if the transcripts are stranded. %s is not"%self.name[i])
+            start=self.start[i]
+            first=self.exOffsets[i]
+            last=self.exOffsets[i+1]
+            if(whichExon=="all"):
+                exons=range(first, last)
+            elif((whichExon=="first") == (self.strand[i]=="+")):
+                exons=(first,)
+            else:
+                exons=(last-1,)
+            for n in exons:
+                name=self.name[i]
+                if(appendExN): name+="_Exon"+'%03d'%(n-first+1)
+                exStart=start+self.exStarts[n]
+                result._add(i, 6, (exStart, exStart+self.exLengths[n], exStart, exStart, (), ()))
+                result._copyMeta(self, i, name=name)
+        return result
@@ -0,0 +1,323 @@
+import os
+import re
+import sys
+import mmap
+import struct
+from array import array
+from bisect import bisect_left
+from bedparse import BEDexception
+from bedparse.tokenizer import isHeader
+from bedparse.bedline import bedline
+from bedparse.compressed import detectFormat
+
+# Layout of the index file:
+#   magic string
+#   length of the header (unsigned 64 bit, little endian)
+#   header (JSON), padded with spaces to a multiple of 8 bytes
+#   for each chromosome, five arrays of signed 64 bit little endian integers:
+#   bin IDs, index of the first record of each bin, and start, end and
+#   byte offset of each record. Records are sorted by bin and start.
+_magic=b'BEDPIDX\x01'
+_itemSize=8
+# Positions up to 2^29 are binned with the same scheme used by BAM and tabix.
+# Larger positions are all assigned to bin 0.
+_maxPosition=1<<29
+_levels=((1, 26), (9, 23), (73, 20), (585, 17), (4681, 14))
+_regionPattern=re.compile(r'^(.+?)(?::([0-9,]+)(?:-([0-9,]+))?)?$')
+
+def _reg2bin(start, end):
+    # Smallest bin fully containing [start, end)
+    end-=1
+    if(end >= _maxPosition):
+        return 0
+    for offset, shift in reversed(_levels):
+        if(start>>shift == end>>shift):
+            return offset+(start>>shift)
+    return 0
+
+def _reg2bins(start, end):
+    # All the bins that may contain records overlapping [start, end)
+    bins=[0]
+    if(start >= _maxPosition):
+        return bins
+    end=min(end, _maxPosition)-1
+    for offset, shift in _levels:
+        bins.extend(range(offset+(start>>shift), offset+(end>>shift)+1))
+    return bins
+
+def _toBytes(values):
+    values=array('q', values)
+    if(sys.byteorder=='big'):
+        values.byteswap()
+    return values.tobytes()
+
+def parseRegion(region):
+    """ Parses a region in the format chr:start-end
+
+    Start and end are 1-based and inclusive (as in genome browsers, samtools and tabix)
+    and can contain commas. If end is omitted the region extends to the end of the
+    chromosome, and if start is also omitted it covers the whole chromosome.
+
+    Args:
+        region (str): The region
+    Returns:
+        tuple: Chromosome, start and end of the region, in BED coordinates (0-based, half open)
+    Examples:
+        >>> parseRegion("chr1:1,001-2,000")
+        ('chr1', 1000, 2000)
+    """
+    match=_regionPattern.match(region)
+    if(match is None):
+        raise BEDexception("Region not valid: "+region)
+    chrom, start, end = match.groups()
+    start=0 if start is None else max(int(start.replace(',', ''))-1, 0)
+    end=_maxPosition<<8 if end is None else int(end.replace(',', ''))
+    if(end <= start):
+        raise BEDexception("Region not valid: "+region)
+    return (chrom, start, end)
+
+class _chromosome(object):
+    # Arrays of the records of one chromosome
+    def __init__(self, bins, firsts, starts, ends, offsets):
+        self.starts=starts
+        self.ends=ends
+        self.offsets=offsets
+        lasts=list(firsts[1:])+[len(starts)]
+        self.bins=dict(zip(bins, zip(firsts, lasts)))
+
+class bedindex(object):
+    """The bedindex class gives random access to the records of a BED file overlapping a region.
+
+    The index is a separate file (by default the BED file name followed by .bpi) that
+    stores the coordinates and the position in the file of each record, grouped by
+    chromosome in the bins used by BAM and tabix. The BED file doesn't need to be sorted.
+    Both files are memory mapped, and the data of each chromosome is only
+    loaded when it is first queried, so opening an index is fast regardless of its size.
+    Records of length 0 (e.g. insertion sites) are considered 1 nt long.
+
+    Examples:
+        >>> bedindex.build("transcripts.bed").close()
+        >>> with bedindex("transcripts.bed") as index:
+        ...     for tx in index.query("chr1", 1000, 2000):
+        ...         tx.print()
+    """
+    def __init__(self, bedfile, index=None):
+        """
+        :param bedfile: Path to the BED file
+        :type bedfile: str
+        :param index: Path to the index (defaults to bedfile followed by .bpi)
+        :type index: str
+        """
+        if(index is None):
+            index=bedfile+".bpi"
+        self.bedfile=bedfile
+        self.index=index
+        self.__chromosomes=dict()
+        self.__views=[]
+        try:
+            import json
+            with open(index, 'rb') as f:
+                if(f.read(len(_magic))!=_magic):
+                    raise BEDexception("Not a valid bedparse index: "+index)
+                headerSize=struct.unpack('<Q', f.read(8))[0]
+                self.__header=json.loads(f.read(headerSize).decode())
+                self.__dataStart=len(_magic)+8+headerSize
+                self.__data=mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if self.__header['records'] else b''
+        except (IOError, OSError):
+            raise BEDexception("Can't open the index "+index+". Create it with bedparse index.")
+        stat=os.stat(bedfile)
+        if(stat.st_size!=self.__header['bedSize'] or stat.st_mtime_ns!=self.__header['bedMtime']):
+            raise BEDexception("The BED file "+bedfile+" was modified after the index was created. Rebuild it with bedparse index.")
+        with open(bedfile, 'rb') as f:
+            self.__bed=mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if stat.st_size else b''
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def close(self):
+        """ Closes the BED file and the index
+        """
+        # The arrays of the chromosomes point to the memory map of the index
+        for view in reversed(self.__views):
+            view.release()
+        self.__views=[]
+        self.__chromosomes=dict()
+        for data in (self.__bed, self.__data):
+            if(isinstance(data, mmap.mmap)):
+                data.close()
+
+    @classmethod
+    def build(cls, bedfile, index=None):
+        """ Indexes a BED file
+
+        Only the first three columns of each line are parsed. Empty lines,
+        comments and track or browser lines are skipped.
+
+        Args:
+            bedfile (str): Path to the BED file
+            index (str): Path of the index (defaults to bedfile followed by .bpi)
+        Returns:
+            bedindex: The index
+        """
+        if(index is None):
+            index=bedfile+".bpi"
+        chromosomes=dict()
+        offset=0
+        with open(bedfile, 'rb') as f:
+            if(detectFormat(f.peek(16)[:16]) is not None):
+                raise BEDexception("Only uncompressed text BED files can be indexed. Convert "+bedfile+" to plain text first.")
+            for n, line in enumerate(f):
+                if(not isHeader(line)):
+                    fields=line.split(b'\t', 3)
+                    try:
+                        start=int(fields[1])
+                        end=int(fields[2])
+                    except (IndexError, ValueError):
+                        raise BEDexception("Line %s of the BED file is not valid: %s" % (n+1, line.decode().rstrip()))
+                    if(start<0 or end<start):
+                        raise BEDexception("Line %s of the BED file is not valid: %s" % (n+1, line.decode().rstrip()))
+                    end=max(end, start+1)
+                    records=chromosomes.get(fields[0])
+                    if(records is None):
+                        records=chromosomes[fields[0]]=(array('q'), array('q'), array('q'), array('q'))
+                    records[0].append(_reg2bin(start, end))
+                    records[1].append(start)
+                    records[2].append(end)
+                    records[3].append(offset)
+                offset+=len(line)
+
+        import json
+        header={'bedSize': 0, 'bedMtime': 0, 'records': 0, 'chromosomes': dict()}
+        data=[]
+        position=0
+        for chrom, (bins, starts, ends, offsets) in chromosomes.items():
+            order=sorted(range(len(bins)), key=lambda i: (bins[i], starts[i]))
+            binIds=[]
+            firsts=[]
+            for i, j in enumerate(order):
+                if(not binIds or binIds[-1]!=bins[j]):
+                    binIds.append(bins[j])
+                    firsts.append(i)
+            header['chromosomes'][chrom.decode()]={'records': len(order), 'bins': len(binIds), 'offset': position}
+            header['records']+=len(order)
+            for values in (binIds, firsts, (starts[i] for i in order), (ends[i] for i in order), (offsets[i] for i in order)):
+                data.append(_toBytes(values))
+                position+=len(data[-1])
+
+        stat=os.stat(bedfile)
+        header['bedSize']=stat.st_size
+        header['bedMtime']=stat.st_mtime_ns
+        # The arrays start after the header, at a multiple of 8 bytes
+        header=json.dumps(header).encode()
+        headerSize=len(header)+(-(len(_magic)+8+len(header)) % _itemSize)
+        header=header.ljust(headerSize)
+        with open(index, 'wb') as f:
+            f.write(_magic)
+            f.write(struct.pack('<Q', headerSize))
+            f.write(header)
+            for values in data:
+                f.write(values)
+        return cls(bedfile, index)
+
+    @property
+    def chromosomes(self):
+        """ The names of the chromosomes of the BED file
+        """
+        return list(self.__header['chromosomes'].keys())
+
+    def __len__(self):
+        return self.__header['records']
+
+    def __chromosome(self, chrom):
+        if(chrom in self.__chromosomes):
+            return self.__chromosomes[chrom]
+        info=self.__header['chromosomes'].get(chrom)
+        if(info is None):
+            return None
+        position=self.__dataStart+info['offset']
+        arrays=[]
+        if(not self.__views):
+            self.__views.append(memoryview(self.__data))
+        for size in (info['bins'], info['bins'], info['records'], info['records'], info['records']):
+            data=self.__views[0][position:position+size*_itemSize]
+            if(sys.byteorder=='big'):
+                values=array('q', data.tobytes())
+                values.byteswap()
+                data.release()
+                arrays.append(values)
+            else:
+                self.__views.append(data)
+                self.__views.append(data.cast('q'))
+                arrays.append(self.__views[-1])
+            position+=size*_itemSize
+        self.__chromosomes[chrom]=_chromosome(*arrays)
+        return self.__chromosomes[chrom]
+
+    def offsets(self, chrom, start, end):
+        """ Finds the records overlapping a region
+
+        Args:
+            chrom (str): Chromosome
+            start (int): Start of the region (0-based)
+            end (int): End of the region (not included)
+        Returns:
+            list: The byte offsets in the BED file of the overlapping records, in the order they appear in the file
+        """
+        if(end <= start):
+            raise BEDexception("The end of the region must be greater than its start")
+        records=self.__chromosome(chrom)
+        if(records is None):
+            return []
+        starts=records.starts
+        ends=records.ends
+        offsets=records.offsets
+        hits=[]
+        for b in _reg2bins(start, end):
+            interval=records.bins.get(b)
+            if(interval is None):
+                continue
+            first, last = interval
+            # Within a bin records are sorted by start
+            last=bisect_left(starts, end, first, last)
+            for i in range(first, last):
+                if(ends[i] > start):
+                    hits.append(offsets[i])
+        hits.sort()
+        return hits
+
+    def queryLines(self, chrom, start, end):
+        """ Returns the lines of the BED file overlapping a region
+
+        Args:
+            chrom (str): Chromosome
+            start (int): Start of the region (0-based)
+            end (int): End of the region (not included)
+        Returns:
+            list: The lines (bytes, including the line terminator), in the order they appear in the file
+        """
+        bed=self.__bed
+        lines=[]
+        for offset in self.offsets(chrom, start, end):
+            lineEnd=bed.find(b'\n', offset)
+            lines.append(bed[offset:] if lineEnd==-1 else bed[offset:lineEnd+1])
+        return lines
+
+    def query(self, chrom, start, end):
+        """ Returns the records of the BED file overlapping a region
+
+        Args:
+            chrom (str): Chromosome
+            start (int): Start of the region (0-based)
+            end (int): End of the region (not included)
+        Returns:
+            list: A :class:`bedparse.bedline` object for each overlapping record, in the order they appear in the file
+        Examples:
+            >>> index = bedindex("transcripts.bed")
+            >>> [tx.name for tx in index.query("chr1", 11000, 12000)]
+            ['ENST00000456328.2', 'ENST00000450305.2']
+        """
+        return [bedline(line.decode().rstrip('\r\n').split('\t')) for line in self.queryLines(chrom, start, end)]
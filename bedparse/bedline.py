@@ -1,6 +1,6 @@
 import re
 from bedparse import BEDexception
-from bedparse import chrnames
+from bedparse.exonmap import exonmap
 
 class bedline(object):
     """The bedline class defines an object that represents a single BED[3,4,6,12] line
@@ -106,9 +106,10 @@ class bedline(object):
         """
         out=[]
         for key in self.__fields[:self.bedType]:
-            if key=="exLengths": self.exLengths+=","
-            if key=="exStarts": self.exStarts+=","
-            out.append(self.__dict__[key])
+            if key=="exLengths" or key=="exStarts":
+                out.append(self.__dict__[key]+",")
+            else:
+                out.append(self.__dict__[key])
         return print(*out, sep="\t", end=end)
 
     def pprint(self):
@@ -392,38 +393,32 @@ class bedline(object):
         
         if stranded and not self.stranded:
             raise BEDexception("The standed option only makes sense for stranded transcripts")
-        
-        # If the bed record if not type 12 set exStarts
-        # and exLens to the whole transcript
-        if self.bedType < 12:
-            exStarts=[0]
-            exLens=[self.end-self.start]
-            nEx=1
-        else:
-            exStarts = [ int(i) for i in self.exStarts.split(',') if i!='' ] 
-            exLens = [ int(i) for i in self.exLengths.split(',')if i!='' ]
-            nEx=self.nEx
-        
-        if stranded and self.strand == "-":
-            coord = sum(exLens)-coord-1
-
-        # Throw an exception is the coordinate is invalid
-        if(coord<0 or coord>=sum(exLens)):
-            raise BEDexception("This coordinate doesn't exist in the transcript")
-        elif(coord == 0):
-            startGenome=self.start
-        else:
-            cumLen=0
-            i=0 
-            while cumLen <= coord: 
-                cumLen+=exLens[i]
-                i+=1
-                if(i>=nEx):
-                    break
-            startEx=i-1
-            exonStartOffset=exLens[startEx]-(cumLen-coord)
-            startGenome=self.start+exStarts[startEx]+exonStartOffset
-        return startGenome
+
+        return exonmap.fromBedline(self).tx2genome([coord], stranded)[0]
+
+    def genome2tx(self, coord, stranded=False):
+        """ Given a position in genome coordinates returns the equivalent in transcript coordinates.
+            This is the inverse of :meth:`tx2genome`. To convert many positions on the same transcript
+            use :class:`bedparse.exonmap`.
+
+            Args:
+                coord (int): Coordinate to convert from genome-space to transcript space
+                stranded (bool): If True use the rightmost base of negative strand trascripts as 0
+            Returns:
+                int: Coordinate in transcript-space
+            Examples:
+                >>> bl = bedline(['chr1', 1000, 2000, 'Tx1', '0', '-'])
+                >>> bl.genome2tx(1010)
+                10
+                >>> bl.genome2tx(1989, stranded=True)
+                10
+            """
+        if not isinstance(coord, int):
+            raise BEDexception("coord must be of type integer")
+        result=exonmap.fromBedline(self).genome2tx([coord], stranded)[0]
+        if(result<0):
+            raise BEDexception("This coordinate is not in an exon of the transcript")
+        return result
 
 
     def bed12tobed6(self, appendExN=False, whichExon="all"):
@@ -490,32 +485,13 @@ class bedline(object):
                 ['CHR_HSCHR19KIR_RP5_B_HAP_CTG3_1', 1000, 2000, 'Tx1', '0', '-']
         """
 
-        if(assembly not in ("hg38", "mm10")):
-            raise BEDexception("The specified assembly is not supported")
-        if(target not in ("ucsc", "ens")):
-            raise BEDexception("The specified target naming convention is not supported")
+        from bedparse.translator import getTranslator
+        translator=getTranslator(assembly, target, patches)
         if(ignore and suppress):
             raise BEDexception("Only one of allowMissing and suppressMissing is allowed")
 
-        if(assembly=="hg38" and target=="ucsc"):
-            convDict=chrnames.hg38_ensembl2ucsc
-            if(patches): convDict.update(chrnames.hg38_ensembl2ucsc_patches)
-
-        elif(assembly=="hg38" and target=="ens"):
-            convDict=chrnames.hg38_ucsc2ensembl
-            if(patches): convDict.update(chrnames.hg38_ucsc2ensembl_patches)
-
-        elif(assembly=="mm10" and target=="ucsc"):
-            convDict=chrnames.mm10_ensembl2ucsc
-            if(patches): convDict.update(chrnames.mm10_ensembl2ucsc_patches)
-
-        elif(assembly=="mm10" and target=="ens"):
-            convDict=chrnames.mm10_ucsc2ensembl
-            if(patches): convDict.update(chrnames.mm10_ucsc2ensembl_patches)
-
-        
-        if(self.chr in convDict.keys()):
-                self.chr=convDict[self.chr]
+        if(self.chr in translator):
+                self.chr=translator.translate(self.chr)
         elif(ignore):
             self.chr="NA"
         elif(suppress):
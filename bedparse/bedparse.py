@@ -2,143 +2,374 @@
 import signal
 import argparse
 import sys
-import csv
 import re
-from pkg_resources import get_distribution
+from array import array
 from bedparse import bedline
+from bedparse import bedbatch
 from bedparse import gtf2bed
+from bedparse import bedindex, parseRegion
+from bedparse import exonmap
 from bedparse import BEDexception
+from bedparse.tokenizer import tokenize, isHeader
+from bedparse.parallel import mapChunks
+from bedparse.writer import bedwriter, formatRecord
+from bedparse.reader import bedreader
+from bedparse.compressed import openInput, openOutput
+from bedparse._version import __version__
 # This allows using the program in a pipe
 # The program is killed when it receives a sigpipe
 signal.signal(signal.SIGPIPE, signal.SIG_DFL)
-__version__ = get_distribution('bedparse').version
 
-def introns(args):
-    with args.bedfile as tsvfile:
-        for line in tsvfile:
-            introns=bedline(line.split('\t')).introns()
-            if(introns): introns.print()
+# Number of records processed at once by the subcommands
+# that work on bedbatch objects
+batchSize=100000
+
+def _options(args):
+    # Picklable copy of the command line arguments for the worker processes
+    return argparse.Namespace(**{k: v for k, v in vars(args).items() if k not in ('bedfile', 'func', 'output')})
+
+def _inputFile(mode):
+    # argparse type of the input files, which can be compressed
+    def opener(path):
+        try:
+            return openInput(path, mode)
+        except (IOError, OSError) as error:
+            raise argparse.ArgumentTypeError("can't open '%s': %s" % (path, error))
+        except BEDexception as error:
+            raise argparse.ArgumentTypeError(str(error))
+    return opener
+
+def _positive(value):
+    # argparse type of the options that must be positive integers
+    try:
+        number=int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError("invalid int value: '%s'" % value)
+    if(number <= 0):
+        raise argparse.ArgumentTypeError("must be a positive integer: '%s'" % value)
+    return number
+
+def _run(args, processor):
+    # Applies processor to chunks of the input file, possibly in parallel,
+    # and prints the results in the same order as the input
+    with args.bedfile as tsvfile, bedwriter(args.output) as writer:
+        for out in mapChunks(tsvfile, processor, _options(args), threads=args.threads, lines=batchSize):
+            writer.writeText(out)
     tsvfile.close()
 
+def _introns(lines, args):
+    return bedbatch.fromLines(lines).introns().format()
+
+def _threeP(lines, args):
+    return bedbatch.fromLines(lines).utr(which=3).format()
+
+def _fiveP(lines, args):
+    return bedbatch.fromLines(lines).utr(which=5).format()
+
+def _cds(lines, args):
+    return bedbatch.fromLines(lines).cds(ignoreCDSonly=args.ignoreCDSonly).format()
+
+def _prom(lines, args):
+    return bedbatch.fromLines(lines).promoter(up=args.up, down=args.down, strand=(not args.unstranded)).format()
+
+def _bed12tobed6(lines, args):
+    batch = bedbatch.fromLines(lines)
+    exons = batch.bed12tobed6(appendExN=args.appendExN, whichExon=args.whichExon)
+    if(args.keepIntrons):
+        nameSub=re.compile("_Exon([0-9]+)")
+        introns = batch.introns()
+        intronExons = introns.bed12tobed6(appendExN=args.appendExN)
+        intronExons.name = [nameSub.sub(r"_Intron\1", name) for name in intronExons.name]
+        # Refer the introns to the transcripts of the original batch
+        # and report them right after the exons of the same transcript
+        intronExons.source = array('q', (introns.source[i] for i in intronExons.source))
+        exons.extend(intronExons)
+        exons = exons.take(sorted(range(len(exons)), key=lambda i: exons.source[i]))
+    return exons.format()
+
+def _convertChr(lines, args):
+    return bedbatch.fromLines(lines).translateChr(assembly=args.assembly, target=args.target, suppress=args.suppressMissing, ignore=args.allowMissing, patches=args.patches).format()
+
+# Lines of the transcripts of tx2genome indexed by name, read once per process
+_transcriptIndex=dict()
+
+def _transcripts(path):
+    index=_transcriptIndex.get(path)
+    if(index is None):
+        try:
+            bed=openInput(path)
+        except (IOError, OSError):
+            raise BEDexception("Can't open the transcripts file "+path)
+        lines=dict()
+        with bedreader(bed) as reader:
+            for line, name in reader.column(3):
+                # Only the first transcript with each name is used
+                if(name is not None and name not in lines and not isHeader(line)):
+                    lines[name]=line
+        # The transcripts are only parsed when an interval refers to them
+        index=_transcriptIndex[path]=(lines, dict())
+    return index
+
+def _exonMap(line):
+    # Chromosome, strand and exonmap of a transcript line
+    fields=tokenize(line)
+    start=fields[1]
+    strand=fields[5].decode() if len(fields)>=6 and fields[5] in (b"+", b"-") else "."
+    if(len(fields)==12):
+        exons=exonmap(start, fields[11], fields[10], strand)
+    else:
+        exons=exonmap(start, [0], [fields[2]-start], strand)
+    return (fields[0].decode(), strand, exons)
+
+def _tx2genome(lines, args):
+    transcripts, maps = _transcripts(args.transcripts)
+    out=[]
+    for line in lines:
+        if(isHeader(line)):
+            continue
+        fields=line.rstrip().split(b'\t')
+        try:
+            tx=fields[0]
+            start=int(fields[1])
+            end=int(fields[2])
+        except (IndexError, ValueError):
+            raise BEDexception("Interval not valid: "+line.decode())
+        transcript=maps.get(tx)
+        if(transcript is None):
+            if(tx not in transcripts):
+                if(args.skipMissing):
+                    continue
+                raise BEDexception("Transcript "+tx.decode()+" not found in "+args.transcripts)
+            transcript=maps[tx]=_exonMap(transcripts[tx])
+        chrom, strand, exons = transcript
+        try:
+            start, end, blockStarts, blockLengths = exons.tx2genomeInterval(start, end, args.stranded)
+        except BEDexception as error:
+            raise BEDexception(str(error)+": "+line.decode())
+        name=fields[3].decode() if len(fields)>3 else tx.decode()
+        score=fields[4].decode() if len(fields)>4 else "0"
+        out.append("%s\t%d\t%d\t%s\t%s\t%s\t%d\t%d\t0\t%d\t%s\t%s\n" % (chrom, start, end, name, score, strand, start, start, len(blockStarts),
+                                                                            ''.join(["%d," % x for x in blockLengths]), ''.join(["%d," % x for x in blockStarts])))
+    return ''.join(out)
+
+# TSS indices of closest, built once per process
+_tssIndex=dict()
+
+def _tssindex(path):
+    index=_tssIndex.get(path)
+    if(index is None):
+        from bedparse.closest import tssindex
+        try:
+            index=_tssIndex[path]=tssindex.fromFile(path)
+        except (IOError, OSError):
+            raise BEDexception("Can't open the reference file "+path)
+    return index
+
+def _closest(lines, args):
+    index=_tssindex(args.reference)
+    names=index.names
+    strands=index.strands
+    out=[]
+    for line in lines:
+        if(isHeader(line)):
+            continue
+        line=line.rstrip()
+        fields=line.split(b'\t', 3)
+        try:
+            start=int(fields[1])
+            end=max(int(fields[2]), start+1)
+        except (IndexError, ValueError):
+            raise BEDexception("Line not valid: "+line.decode(errors='replace'))
+        hits=index._closest(fields[0], start, end, not args.first)
+        if(not hits):
+            out.append(line+b'\t.\t-1\t-1\t.\t0\t.\t.\n')
+        for i, tss, distance in hits:
+            out.append(line+b'\t%s\t%d\t%d\t%s\t0\t%s\t%d\n' % (fields[0], tss, tss+1, names[i], strands[i], distance))
+    return b''.join(out)
+
+def introns(args):
+    _run(args, _introns)
+
 def threeP(args):
-    with args.bedfile as tsvfile:
-        for line in tsvfile:
-            utr=bedline(line.split('\t')).utr(which=3)
-            if(utr): utr.print()
-    tsvfile.close()
+    _run(args, _threeP)
 
 def fiveP(args):
-    with args.bedfile as tsvfile:
-        for line in tsvfile:
-            utr=bedline(line.split('\t')).utr(which=5)
-            if(utr): utr.print()
-    tsvfile.close()
+    _run(args, _fiveP)
 
 def cds(args):
-    with args.bedfile as tsvfile:
-        for line in tsvfile:
-            utr=bedline(line.split('\t')).cds(ignoreCDSonly=args.ignoreCDSonly)
-            if(utr): utr.print()
-    tsvfile.close()
+    _run(args, _cds)
 
 def prom(args):
-    with args.bedfile as tsvfile:
-        for line in tsvfile:
-            bedline(line.split('\t')).promoter(up=args.up, down=args.down, strand=(not args.unstranded)).print()
-    tsvfile.close()
+    _run(args, _prom)
 
 def bed12tobed6(args):
-    if args.whichExon is not "all" and args.keepIntrons:
+    if args.whichExon != "all" and args.keepIntrons:
         raise BEDexception("--keepIntrons is only allowed with --whichExon all")
-    with args.bedfile as tsvfile:
-        for line in tsvfile:
-            tx = bedline(line.split('\t'))
-            exon_list = tx.bed12tobed6(appendExN=args.appendExN, whichExon=args.whichExon)
-            for el in exon_list:
-                el.print()
-            if(args.keepIntrons):
-                nameSub=re.compile("_Exon([0-9]+)")
-                for el in tx.introns().bed12tobed6(appendExN=args.appendExN):
-                    el.name=nameSub.sub(r"_Intron\1", el.name)
-                    el.print()
-    tsvfile.close()
+    _run(args, _bed12tobed6)
 
 def filter(args):
+    from bedparse.keyset import keyset
     col=args.column-1
-    inverse=args.inverse
-    filterset=set()
+    import csv
     try:
-        annotation=open(args.annotation)
+        annotation=openInput(args.annotation, 'r')
     except:
         raise BEDexception("Annotation file not valid")
-    annotationReader = csv.reader(annotation, delimiter="\t")
-    for line in annotationReader:
-        filterset.add(line[col])
-    annotation.close()
-    with args.bedfile as tsvfile:
-        for line in tsvfile:
-            if(line.split('\t')[3] in filterset and not inverse):
-                print(line.rstrip())
-            elif(line.split('\t')[3] not in filterset and inverse):
-                print(line.rstrip())
-    tsvfile.close()
+    with annotation:
+        annotationReader = csv.reader(annotation, delimiter="\t")
+        filterset=keyset((line[col].encode() for line in annotationReader), compact=args.compact)
+    with bedreader(args.bedfile) as reader, bedwriter(args.output) as writer:
+        for lines in reader.blocks():
+            selected=filterset.select(lines, inverse=args.inverse)
+            if(selected):
+                writer.writeText(b''.join([line.rstrip()+b'\n' for line in selected]))
 
 def join(args):
-    col=args.column-1
-    annot=dict()
+    from bedparse.joiner import readAnnotation, hashJoin, mergeJoin
     try:
-        annotation=open(args.annotation)
+        annotation=openInput(args.annotation, 'r')
     except:
         raise BEDexception("Annotation file not valid")
-    annotationReader = csv.reader(annotation, delimiter=args.separator)
-    for line in annotationReader:
-        if(len(line)<=col):
-            raise BEDexception("Some lines don't contain the annotation column")
-        annot.setdefault(line[col], []).append(line[0:col]+line[col+1:])
-    annotation.close()
-    with args.bedfile as tsvfile:
-        for line in tsvfile:
-            line=line.split('\t')
-            if(args.noUnmatched==False or line[3] in annot.keys()):
-                record=bedline(line)
-                if(record):
-                        nrec=len(annot.setdefault(record.name, []))
-                        if(nrec==0):
-                            if(args.empty==''):
-                                record.print()
-                            else:
-                                record.print(end='')
-                                print('',args.empty,sep="\t")
-                        else:
-                            for i in range(0,nrec):
-                                record.print(end='')
-                                print('',*annot[record.name][i], sep='\t')
-    tsvfile.close()
+    empty=b'' if args.empty=='' else ("\t"+args.empty).encode()
+    with annotation, bedreader(args.bedfile) as reader, bedwriter(args.output) as writer:
+        rows=readAnnotation(annotation, args.column-1, args.separator)
+        if(args.sorted):
+            joined=mergeJoin(reader.column(3), rows)
+        else:
+            joined=hashJoin(reader.column(3), rows, memory=args.memory<<20, tmpdir=args.tmpDir)
+        for line, matches in joined:
+            if(args.noUnmatched and not matches):
+                continue
+            record=bedline(line.decode().split('\t'))
+            if(record):
+                out=formatRecord(record, end='').encode()
+                if(not matches):
+                    writer.writeText(out+empty+b'\n')
+                for annot in matches:
+                    writer.writeText(out+annot+b'\n')
 
 def convertChr(args):
-    with args.bedfile as tsvfile:
-        for line in tsvfile:
-            translatedLine=bedline(line.split('\t')).translateChr(assembly=args.assembly, target=args.target, suppress=args.suppressMissing, ignore=args.allowMissing, patches=args.patches)
-            if(translatedLine):
-               translatedLine.print()
-    tsvfile.close()
+    if(args.aliasFile is not None):
+        from bedparse.chromalias import registerAssembly
+        registerAssembly(args.assembly, args.aliasFile)
+    _run(args, _convertChr)
 
 def validateFormat(args):
-    with args.bedfile as tsvfile:
+    with args.bedfile as tsvfile, bedwriter(args.output) as writer:
+        batch=bedbatch()
         for n,line in enumerate(tsvfile):
             if args.fixSeparators:
-                line=re.sub(r'^\s+', '', line)
-                line=re.sub(r'\s+', '\t', line)
-                line=re.sub(r'\s+$', '', line)
+                line=re.sub(rb'^\s+', b'', line)
+                line=re.sub(rb'\s+', b'\t', line)
+                line=re.sub(rb'\s+$', b'', line)
             try:
-                validatedLine=bedline(line.split('\t'))
+                fields=tokenize(line)
             except BEDexception as formatException:
+                writer.write(batch)
                 raise BEDexception("\nThis doesn't appear to be a valid BED file. There was an error at line %s:\n\t\"%s\"" %(n+1, formatException))
-                tsvfile.close()
-            else:
-                validatedLine.print()
+            batch.appendFields(fields)
+            if(len(batch) >= batchSize):
+                writer.write(batch)
+                batch=bedbatch()
+        writer.write(batch)
     tsvfile.close()
 
+def tx2genome(args):
+    # Fail before reading the intervals if the transcripts are not valid
+    _transcripts(args.transcripts)
+    _run(args, _tx2genome)
+
+def sort(args):
+    from bedparse.extsort import sortBed
+    with args.bedfile as bedfile, bedwriter(args.output) as writer:
+        for line in sortBed(bedfile, memory=args.memory<<20, threads=args.threads, tmpdir=args.tmpDir):
+            writer.writeText(line)
+
+def merge(args):
+    from bedparse.merger import mergeIntervals
+    with bedreader(args.bedfile) as reader, bedwriter(args.output) as writer:
+        for chrom, start, end, strand, names in mergeIntervals(reader, stranded=args.stranded, distance=args.distance, names=args.names):
+            out="%s\t%d\t%d" % (chrom.decode(), start, end)
+            if(args.names or args.stranded):
+                out+="\t"+(b','.join(names).decode() if names else ".")
+            if(args.stranded):
+                out+="\t0\t"+strand.decode()
+            writer.writeText(out+"\n")
+
+def intersect(args):
+    from bedparse.intersect import sweepIntersect, indexedIntersect, intersectionLines
+    strand="same" if args.sameStrand else "opposite" if args.oppositeStrand else None
+    other=None
+    tmpdir=None
+    try:
+        if(args.sorted):
+            other=bedreader(openInput(args.b))
+        else:
+            try:
+                other=bedindex(args.b)
+            except BEDexception:
+                # Without an up to date index of B, a temporary one is built.
+                # Compressed, Arrow and Parquet files are first converted to text
+                import os
+                import shutil
+                import tempfile
+                from bedparse.compressed import detectFormat
+                tmpdir=tempfile.mkdtemp(dir=args.tmpDir)
+                path=args.b
+                if(not os.path.isdir(path)):
+                    with open(path, 'rb') as f:
+                        head=f.read(16)
+                if(os.path.isdir(path) or detectFormat(head) is not None):
+                    path=os.path.join(tmpdir, "b.bed")
+                    with openInput(args.b) as source, open(path, 'wb') as copy:
+                        shutil.copyfileobj(source, copy, 1<<20)
+                other=bedindex.build(path, os.path.join(tmpdir, "b.bpi"))
+        with bedreader(args.bedfile) as reader, bedwriter(args.output) as writer:
+            if(args.sorted):
+                results=sweepIntersect(reader, other, strand)
+            else:
+                results=indexedIntersect(reader, other, strand)
+            for record, matches in results:
+                if(args.noOverlap or args.unique):
+                    if(bool(matches)!=args.noOverlap):
+                        writer.writeText(record.line+b'\n')
+                    continue
+                for match, pieces in matches:
+                    lines=[record.line] if args.writeA else intersectionLines(record, pieces)
+                    for line in lines:
+                        writer.writeText(line+(b'\t'+match.line if args.writeB else b'')+b'\n')
+    finally:
+        if(other is not None):
+            other.close()
+        if(tmpdir is not None):
+            import shutil
+            shutil.rmtree(tmpdir)
+
+def closest(args):
+    # Fail before reading the queries if the reference is not valid
+    _tssindex(args.reference)
+    _run(args, _closest)
+
+def coverage(args):
+    from bedparse.coverage import coverage
+    from itertools import islice
+    with bedreader(args.bedfile) as reader, bedwriter(args.output) as writer:
+        intervals=coverage(reader, strand=args.strand)
+        while True:
+            lines=[b'%s\t%d\t%d\t%d\n' % x for x in islice(intervals, batchSize)]
+            if(not lines):
+                break
+            writer.writeText(b''.join(lines))
+
+def index(args):
+    bedindex.build(args.bedfile, args.index).close()
+
+def query(args):
+    with bedindex(args.bedfile, args.index) as idx, bedwriter(args.output) as writer:
+        for region in args.region:
+            for line in idx.queryLines(*parseRegion(region)):
+                writer.writeText(line)
+
 def main(args=None):
     desc_threep="Report the 3'UTR of each coding transcript (i.e. transcripts with distinct values of thickStart and thickEnd). Transcripts without CDS are not reported."
     desc_fivep="Report the 5'UTR of each coding transcript (i.e. transcripts with distinct values of thickStart and thickEnd). Transcripts without CDS are not reported."
@@ -157,7 +388,35 @@ def main(args=None):
                        The conversion supports the hg38 assembly up to patch 11 and the mm10 assembly up to patch 4. By default patches
                        are not converted (because the UCSC genome browser does not support them), but can be enabled using the -p flag.
                        When the BED file contains a chromosome that is not recognised, by default the program stops and throws an error. Alternatively,
-                       unrecognised chromosomes can be suppressed (-s) or artificially set to 'NA' (-a)."""
+                       unrecognised chromosomes can be suppressed (-s) or artificially set to 'NA' (-a).
+                       Other assemblies (e.g. hg19, mm39 or hs1) can be converted by providing their UCSC chromAlias.txt file or NCBI assembly report with --aliasFile."""
+    desc_sort="""Sorts a BED file by chromosome, start and end, as LC_ALL=C sort -k1,1 -k2,2n -k3,3n. Files larger than the memory budget are sorted in chunks
+                 that are written to temporary files and merged. Comment, track and browser lines are reported first."""
+    desc_merge="""Merges overlapping and book-ended records of a BED file sorted by chromosome and start (e.g. with bedparse sort) into BED3 intervals.
+                  With --names the distinct names of the merged records are reported in column 4, and with --stranded only records on the same strand
+                  are merged and the output is in BED6 format."""
+    desc_intersect="""Reports the overlaps between the records of two BED files. BED12 records only overlap in their exons. By default, for each pair of overlapping
+                       records the part of the record of A covered by the record of B is reported (as a BED12 record whose blocks are the overlapping intervals if A is
+                       a BED12 file, otherwise as one line per overlapping interval). With --sorted both files must be sorted by chromosome and start (e.g. with bedparse sort)
+                       and they are read in parallel in a single pass. Otherwise B must be an uncompressed file, which is indexed unless it already has an up to date
+                       index created with bedparse index, and the output is in the order of A."""
+    desc_closest="""Reports the transcription start site (TSS) closest to each record of a BED file (e.g. peaks), among the transcripts of a reference BED file.
+                     Each line of the input is followed by the position of the TSS (as a 1 nt BED6 record with the name and strand of the transcript) and
+                     by the signed distance: positive if the record is downstream of the TSS with respect to the strand of the transcript, negative if it is upstream
+                     and 0 if it contains the TSS. Records on chromosomes without transcripts are reported with '.' and -1 in place of the TSS."""
+    desc_coverage="""Reports the number of records covering each base of a BED file sorted by chromosome and start (e.g. with bedparse sort) in bedGraph format.
+                      Only the exons (blocks) of BED12 records are counted, so the input can be a set of transcripts or of spliced long reads.
+                      Regions that are not covered are not reported. With --strand only the records on one strand are counted."""
+    desc_index="""Creates an index of a BED file, which allows to quickly retrieve the records overlapping a region with bedparse query.
+                   The BED file doesn't need to be sorted. By default the index is saved as the name of the BED file followed by .bpi."""
+    desc_query="""Prints the records of an indexed BED file that overlap one or more regions, in the order in which they appear in the file.
+                   Regions are in the format chr:start-end, with 1-based and inclusive coordinates (e.g. chr1:1000-2000). The start and end
+                   can be omitted to select a whole chromosome (e.g. chr1) or everything after a position (e.g. chr1:1000)."""
+    desc_tx2genome="""Converts intervals in transcript coordinates (e.g. motif hits, ORFs or modified sites) to BED12 records in genome coordinates,
+                      split in blocks at the exon junctions. The intervals file has the name of the transcript, and the start and end of the
+                      interval in transcript coordinates (0-based, end not included) in the first 3 columns, and optionally the name and score of
+                      the interval in columns 4 and 5. The transcripts are read from a BED file and matched by name (column 4).
+                      The strand of the output is that of the transcript."""
     desc_validateFormat="Checks whether the BED file provided adheres to the BED format specifications. Optionally, it can fix field speration errors."
     if args is None:
         args = sys.argv[1:]
@@ -170,27 +429,32 @@ def main(args=None):
     subparsers.required = True
     
     parser_3pUTR = subparsers.add_parser('3pUTR', help="Prints the 3' of coding genes.", description=desc_threep)
-    parser_3pUTR.add_argument("bedfile", type=argparse.FileType('r'), nargs='?', default=sys.stdin, help="Path to the BED file.")
+    parser_3pUTR.add_argument("bedfile", type=_inputFile('rb'), nargs='?', default='-', help="Path to the BED file.")
+    parser_3pUTR.add_argument("--threads", "-j", type=int, default=1, help="Number of worker processes (default 1).")
     parser_3pUTR.set_defaults(func=threeP)
     
     parser_5pUTR = subparsers.add_parser('5pUTR', help="Prints the 5' of coding genes.", description=desc_fivep)
-    parser_5pUTR.add_argument("bedfile", type=argparse.FileType('r'), nargs='?', default=sys.stdin, help="Path to the BED file.")
+    parser_5pUTR.add_argument("bedfile", type=_inputFile('rb'), nargs='?', default='-', help="Path to the BED file.")
+    parser_5pUTR.add_argument("--threads", "-j", type=int, default=1, help="Number of worker processes (default 1).")
     parser_5pUTR.set_defaults(func=fiveP)
     
     parser_cds = subparsers.add_parser('cds', help="Prints the CDS of coding genes.", description=desc_cds)
     parser_cds.add_argument("--ignoreCDSonly",action="store_true", help="Ignore transcripts that only consist of CDS.")
-    parser_cds.add_argument("bedfile", type=argparse.FileType('r'), nargs='?', default=sys.stdin, help="Path to the BED file.")
+    parser_cds.add_argument("bedfile", type=_inputFile('rb'), nargs='?', default='-', help="Path to the BED file.")
+    parser_cds.add_argument("--threads", "-j", type=int, default=1, help="Number of worker processes (default 1).")
     parser_cds.set_defaults(func=cds)
     
     parser_prom = subparsers.add_parser('promoter', help="Prints the promoters of transcripts.", description=desc_prom)
     parser_prom.add_argument("--up",type=int, default=500, help="Get this many nt upstream of each feature.")
     parser_prom.add_argument("--down",type=int, default=500, help="Get this many nt downstream of each feature.")
     parser_prom.add_argument("--unstranded",action="store_true", help="Do not consider strands.")
-    parser_prom.add_argument("bedfile", type=argparse.FileType('r'), nargs='?', default=sys.stdin, help="Path to the BED file.")
+    parser_prom.add_argument("bedfile", type=_inputFile('rb'), nargs='?', default='-', help="Path to the BED file.")
+    parser_prom.add_argument("--threads", "-j", type=int, default=1, help="Number of worker processes (default 1).")
     parser_prom.set_defaults(func=prom)
     
     parser_introns = subparsers.add_parser('introns', help="Prints BED records corresponding to the introns of each transcript in the original file.", description=desc_intron)
-    parser_introns.add_argument("bedfile", type=argparse.FileType('r'), nargs='?', default=sys.stdin, help="Path to the BED file.")
+    parser_introns.add_argument("bedfile", type=_inputFile('rb'), nargs='?', default='-', help="Path to the BED file.")
+    parser_introns.add_argument("--threads", "-j", type=int, default=1, help="Number of worker processes (default 1).")
     parser_introns.set_defaults(func=introns)
     
     parser_filter = subparsers.add_parser('filter', 
@@ -198,8 +462,9 @@ def main(args=None):
     parser_filter.add_argument("--annotation", "-a", type=str, help="Path to the annotation file.", required=True)
     parser_filter.add_argument("--column","-c",type=int, default=1, help="Column of the annotation file (1-based, default=1).")
     parser_filter.add_argument("--inverse", "-v" ,action="store_true", help="Only report BED entries absent from the annotation file.")
+    parser_filter.add_argument("--compact", action="store_true", help="Store the names of the annotation in a sorted array, which uses a fraction of the memory of the default hash table but is about twice as slow. For annotations with many millions of names.")
     parser_filter.set_defaults(func=filter)
-    parser_filter.add_argument("bedfile", type=argparse.FileType('r'), nargs='?', default=sys.stdin,
+    parser_filter.add_argument("bedfile", type=_inputFile('rb'), nargs='?', default='-',
     help="Path to the BED file.")
     
     parser_join = subparsers.add_parser('join', 
@@ -210,44 +475,137 @@ def main(args=None):
     parser_join.add_argument("--separator","-s",type=str, default='\t', help="Field separator for the annotation file (default tab)")
     parser_join.add_argument("--empty","-e",type=str, default='.', help="String to append to empty records (default '.').")
     parser_join.add_argument("--noUnmatched", "-n" ,action="store_true", help="Do not print unmatched lines.")
+    parser_join.add_argument("--sorted", action="store_true", help="Join with a merge of the two files, which must both be sorted by name in byte order (e.g. with LC_ALL=C sort). Uses constant memory.")
+    parser_join.add_argument("--memory", "-m", type=_positive, default=1024, help="Memory budget of the annotation table in MB (default 1024). Larger annotations are partitioned in temporary files.")
+    parser_join.add_argument("--tmpDir", type=str, default=None, help="Directory for the temporary files (default: system temporary directory).")
     parser_join.set_defaults(func=join)
-    parser_join.add_argument("bedfile", type=argparse.FileType('r'), nargs='?', default=sys.stdin,
+    parser_join.add_argument("bedfile", type=_inputFile('rb'), nargs='?', default='-',
     help="Path to the BED file.")
  
  
     parser_gtf2bed = subparsers.add_parser('gtf2bed', 
             help="Converts a GTF file to BED12 format.", description=desc_gtf2bed)
-    parser_gtf2bed.add_argument("gtf", type=argparse.FileType('r'), nargs='?', default=sys.stdin, help="Path to the GTF file.")
+    parser_gtf2bed.add_argument("gtf", type=_inputFile('r'), nargs='?', default='-', help="Path to the GTF file.")
     parser_gtf2bed.add_argument("--extraFields",type=str, default='', help="Comma separated list of extra GTF fields to be added after col 12 (e.g. gene_id,gene_name).")
     parser_gtf2bed.add_argument("--filterKey", type=str, default='transcript_biotype', help="GTF extra field on which to apply the filtering")
     parser_gtf2bed.add_argument("--filterType",type=str, default='', help="Comma separated list of filterKey field values to retain.")
     parser_gtf2bed.add_argument("--transcript_feature_name",type=str, default='transcript', help="Transcript feature name. Features with this string in field 3 of the GTF file will be considered transcripts. (default 'transcript')")
-    parser_gtf2bed.set_defaults(func=lambda args: gtf2bed(args.gtf, extra=args.extraFields.split(','), filterKey=args.filterKey, filterType=args.filterType.split(','), transcript_feature_name=args.transcript_feature_name))
+    parser_gtf2bed.add_argument("--stream", action="store_true", help="Report each transcript as soon as all its features have been read. Requires a GTF file where the lines of each chromosome and transcript are consecutive (e.g. Ensembl or Gencode). Greatly reduces memory usage.")
+    parser_gtf2bed.add_argument("--sort", action="store_true", help="Group the GTF lines by transcript with an external sort before converting them (implies --stream). Use for GTF files that are not grouped by transcript. Transcripts are reported sorted by chromosome and start.")
+    parser_gtf2bed.add_argument("--tmpDir", type=str, default=None, help="Directory for the temporary files created by --sort (default: system temporary directory).")
+    parser_gtf2bed.add_argument("--threads", "-j", type=int, default=1, help="Number of worker processes (default 1). Each chromosome is converted by a separate process. Requires a GTF file (not a stream).")
+    parser_gtf2bed.set_defaults(func=lambda args: gtf2bed(args.gtf, extra=args.extraFields.split(','), filterKey=args.filterKey, filterType=args.filterType.split(','), transcript_feature_name=args.transcript_feature_name, stream=args.stream, sort=args.sort, tmpdir=args.tmpDir, threads=args.threads, output=args.output))
  
     parser_bed12tobed6 = subparsers.add_parser('bed12tobed6', 
             help="Converts a BED12 file to BED6 format", description=desc_bed12tobed6)
-    parser_bed12tobed6.add_argument("bedfile", type=argparse.FileType('r'), nargs='?', default=sys.stdin, help="Path to the GTF file.")
+    parser_bed12tobed6.add_argument("bedfile", type=_inputFile('rb'), nargs='?', default='-', help="Path to the GTF file.")
     parser_bed12tobed6.add_argument("--appendExN", action="store_true", help="Appends the exon number to the transcript name.")
     parser_bed12tobed6.add_argument("--whichExon",type=str, default='all', choices=["all", "first", "last"], help="Which exon to return. First and last respectively report the first or last exon relative to the TSS (i.e. taking strand into account).")
     parser_bed12tobed6.add_argument("--keepIntrons", action="store_true", help="Add records for introns as well. Only allowed if --whichExon all")
+    parser_bed12tobed6.add_argument("--threads", "-j", type=int, default=1, help="Number of worker processes (default 1).")
     parser_bed12tobed6.set_defaults(func=bed12tobed6)
     
     parser_convertChr = subparsers.add_parser('convertChr', help="Convert chromosome names between UCSC and Ensembl formats", description=desc_convertChr)
-    parser_convertChr.add_argument("bedfile", type=argparse.FileType('r'), nargs='?', default=sys.stdin, help="Path to the BED file.")
-    parser_convertChr.add_argument("--assembly", type=str, help="Assembly of the BED file (either hg38 or mm10).", required=True)
-    parser_convertChr.add_argument("--target", type=str, help="Desidered chromosome name convention (ucsc or ens).", required=True)
+    parser_convertChr.add_argument("bedfile", type=_inputFile('rb'), nargs='?', default='-', help="Path to the BED file.")
+    parser_convertChr.add_argument("--assembly", type=str, help="Assembly of the BED file (hg38, mm10 or an assembly registered with --aliasFile).", required=True)
+    parser_convertChr.add_argument("--target", type=str, help="Desidered chromosome name convention (ucsc or ens, or any other convention listed in the alias file of the assembly, e.g. genbank or refseq).", required=True)
+    parser_convertChr.add_argument("--aliasFile", type=str, default=None, help="""Chromosome alias table for the assembly (a UCSC chromAlias.txt file or a NCBI assembly report). The table is compiled and
+                                   saved in the user cache directory, so later conversions only need --assembly.""")
     parser_convertChr.add_argument("--allowMissing", "-a" ,action="store_true", help="""When a chromosome name can't be matched between USCS and Ensembl set it to 'NA' (by default thrown as error).""")
     parser_convertChr.add_argument("--suppressMissing", "-s" ,action="store_true", help="""When a chromosome name can't be matched between USCS and Ensembl do not report it in the output (by default throws an error).""")
     parser_convertChr.add_argument("--patches", "-p" ,action="store_true", help="""Allows conversion of all patches up to p11 for hg38 and p4 for mm10. Without this option, if the BED file contains contigs added by a patch the conversion terminates with an error (unless the -a or -s flags are present).""")
+    parser_convertChr.add_argument("--threads", "-j", type=int, default=1, help="Number of worker processes (default 1).")
     parser_convertChr.set_defaults(func=convertChr)
     
     parser_validateFormat = subparsers.add_parser('validateFormat', help="Check whether the BED file adheres to the BED format specifications", description=desc_validateFormat)
-    parser_validateFormat.add_argument("bedfile", type=argparse.FileType('r'), nargs='?', default=sys.stdin, help="Path to the BED file.")
+    parser_validateFormat.add_argument("bedfile", type=_inputFile('rb'), nargs='?', default='-', help="Path to the BED file.")
     parser_validateFormat.add_argument("--fixSeparators", "-f" ,action="store_true", help="""If the fields are separated by multiple spaces (e.g. when copy-pasting BED files), replace them into tabs.""")
     parser_validateFormat.set_defaults(func=validateFormat)
  
+    parser_tx2genome = subparsers.add_parser('tx2genome', help="Converts intervals from transcript to genome coordinates", description=desc_tx2genome)
+    parser_tx2genome.add_argument("bedfile", type=_inputFile('rb'), nargs='?', default='-', help="Path to the intervals file.")
+    parser_tx2genome.add_argument("--transcripts", "-t", type=str, required=True, help="Path to the BED file of the transcripts.")
+    parser_tx2genome.add_argument("--stranded", action="store_true", help="Transcript coordinates start from the 5' end of the transcript, i.e. the rightmost base of negative strand transcripts is 0.")
+    parser_tx2genome.add_argument("--skipMissing", action="store_true", help="Skip the intervals of transcripts that are not in the BED file, instead of stopping with an error.")
+    parser_tx2genome.add_argument("--threads", "-j", type=int, default=1, help="Number of worker processes (default 1).")
+    parser_tx2genome.set_defaults(func=tx2genome)
+
+    parser_sort = subparsers.add_parser('sort', help="Sorts a BED file by chromosome and start", description=desc_sort)
+    parser_sort.add_argument("bedfile", type=_inputFile('rb'), nargs='?', default='-', help="Path to the BED file.")
+    parser_sort.add_argument("--memory", "-m", type=int, default=1024, help="Approximate memory budget in MB (default 1024).")
+    parser_sort.add_argument("--threads", "-j", type=int, default=1, help="Number of worker processes sorting the chunks of the file (default 1).")
+    parser_sort.add_argument("--tmpDir", type=str, default=None, help="Directory for the temporary files (default: system temporary directory).")
+    parser_sort.set_defaults(func=sort)
+
+    parser_merge = subparsers.add_parser('merge', help="Merges the overlapping records of a sorted BED file", description=desc_merge)
+    parser_merge.add_argument("bedfile", type=_inputFile('rb'), nargs='?', default='-', help="Path to the BED file, sorted by chromosome and start.")
+    parser_merge.add_argument("--stranded", "-s", action="store_true", help="Only merge records on the same strand.")
+    parser_merge.add_argument("--distance", "-d", type=int, default=0, help="Maximum distance between merged records (default 0, i.e. book-ended records are merged).")
+    parser_merge.add_argument("--names", "-n", action="store_true", help="Report the distinct names of the merged records, separated by commas.")
+    parser_merge.set_defaults(func=merge)
+
+    parser_intersect = subparsers.add_parser('intersect', help="Reports the overlaps between two BED files", description=desc_intersect)
+    parser_intersect.add_argument("-a", dest="bedfile", type=_inputFile('rb'), default='-', help="Path to the BED file A (default stdin).")
+    parser_intersect.add_argument("-b", type=str, required=True, help="Path to the BED file B.")
+    parser_intersect.add_argument("--sorted", action="store_true", help="Both files are sorted by chromosome and start: find the overlaps in a single pass with bounded memory.")
+    parser_intersect.add_argument("-s", dest="sameStrand", action="store_true", help="Only report overlaps between records on the same strand.")
+    parser_intersect.add_argument("-S", dest="oppositeStrand", action="store_true", help="Only report overlaps between records on opposite strands.")
+    parser_intersect.add_argument("-u", dest="unique", action="store_true", help="Report each record of A that overlaps B once.")
+    parser_intersect.add_argument("-v", dest="noOverlap", action="store_true", help="Report the records of A that don't overlap B.")
+    parser_intersect.add_argument("-wa", dest="writeA", action="store_true", help="Report the whole record of A for each overlap.")
+    parser_intersect.add_argument("-wb", dest="writeB", action="store_true", help="Append the record of B to each overlap.")
+    parser_intersect.add_argument("--tmpDir", type=str, default=None, help="Directory for the temporary index of B (default: system temporary directory).")
+    parser_intersect.set_defaults(func=intersect)
+
+    parser_closest = subparsers.add_parser('closest', help="Reports the TSS closest to each record of a BED file", description=desc_closest)
+    parser_closest.add_argument("bedfile", type=_inputFile('rb'), nargs='?', default='-', help="Path to the BED file of the queries.")
+    parser_closest.add_argument("--reference", "-r", type=str, required=True, help="Path to the BED file of the transcripts.")
+    parser_closest.add_argument("--first", action="store_true", help="Only report the first transcript when several TSSs are at the same distance.")
+    parser_closest.add_argument("--threads", "-j", type=int, default=1, help="Number of worker processes (default 1).")
+    parser_closest.set_defaults(func=closest)
+
+    parser_coverage = subparsers.add_parser('coverage', help="Reports the coverage of a sorted BED file in bedGraph format", description=desc_coverage)
+    parser_coverage.add_argument("bedfile", type=_inputFile('rb'), nargs='?', default='-', help="Path to the BED file, sorted by chromosome and start.")
+    parser_coverage.add_argument("--strand", "-s", choices=["+", "-"], default=None, help="Only count the records on this strand.")
+    parser_coverage.set_defaults(func=coverage)
+
+    parser_index = subparsers.add_parser('index', help="Indexes a BED file for bedparse query", description=desc_index)
+    parser_index.add_argument("bedfile", type=str, help="Path to the BED file.")
+    parser_index.add_argument("--index", "-i", type=str, default=None, help="Path of the index (default: BED file name followed by .bpi).")
+    parser_index.set_defaults(func=index)
+
+    parser_query = subparsers.add_parser('query', help="Prints the records of an indexed BED file overlapping a region", description=desc_query)
+    parser_query.add_argument("bedfile", type=str, help="Path to the BED file.")
+    parser_query.add_argument("region", type=str, nargs='+', help="Region in the format chr:start-end.")
+    parser_query.add_argument("--index", "-i", type=str, default=None, help="Path of the index (default: BED file name followed by .bpi).")
+    parser_query.set_defaults(func=query)
+
+    # Only the sub-commands whose output is BED records can write it in the
+    # columnar formats, partitioned by chromosome or not
+    for name, subparser in subparsers.choices.items():
+        if(name in ('index', 'validateFormat', 'query')):
+            subparser.set_defaults(output=None)
+        else:
+            subparser.add_argument("--output", "-o", type=str, default=None, help="Path of the output file (default stdout). Files ending in .gz or .bgz are compressed with BGZF, files ending in .zst with zstd, and files ending in .arrow or .parquet are written in the Arrow IPC or Parquet format.")
+            subparser.add_argument("--partitionByChr", action="store_true", help="Write the output as a directory of Parquet files, one subdirectory per chromosome (requires --output).")
+
     args = parser.parse_args()
-    args.func(args)
+    output=getattr(args, 'output', None)
+    if(getattr(args, 'partitionByChr', False) and output is None):
+        parser.error("--partitionByChr requires --output")
+    if(output is not None):
+        extraColumns=args.extraFields.split(',') if getattr(args, 'sub-command')=='gtf2bed' else None
+        try:
+            args.output=openOutput(output, partitionByChr=args.partitionByChr, extraColumns=extraColumns)
+        except (IOError, OSError) as error:
+            parser.error("can't open '%s': %s" % (output, error))
+        except BEDexception as error:
+            parser.error(str(error))
+    try:
+        args.func(args)
+    finally:
+        if(output is not None):
+            args.output.close()
 
 if __name__ == "__main__":
     main()
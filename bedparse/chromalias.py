@@ -0,0 +1,184 @@
+import os
+from bedparse import BEDexception
+
+# Version of the format of the compiled tables
+_formatVersion=1
+# Columns of NCBI assembly reports and the corresponding naming conventions
+_reportColumns={"Sequence-Name": "assembly", "GenBank-Accn": "genbank", "RefSeq-Accn": "refseq", "UCSC-style-name": "ucsc"}
+# Alternative names of the naming conventions
+_conventionAliases={"ens": "ensembl"}
+
+def cacheDir():
+    """ Returns the directory where the compiled alias tables are stored
+
+    This is the BEDPARSE_CACHE environment variable if set, otherwise
+    the bedparse directory in the user cache directory (XDG_CACHE_HOME or ~/.cache).
+
+    Returns:
+        str: The path of the cache directory
+    """
+    path=os.environ.get("BEDPARSE_CACHE")
+    if(not path):
+        path=os.path.join(os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache"), "bedparse")
+    return path
+
+def _cachePath(assembly):
+    if(not assembly or os.sep in assembly or assembly.startswith(".")):
+        raise BEDexception("Assembly name not valid: "+str(assembly))
+    return os.path.join(cacheDir(), assembly+".chromAlias.pickle")
+
+def _clean(name):
+    name=name.strip()
+    if(name in ("", "na", "NA", "n/a")):
+        return None
+    return name
+
+def parseAliasFile(lines):
+    """ Parses a table of chromosome aliases
+
+    Three formats are supported:
+
+    * UCSC chromAlias.txt files with a header line naming the convention of each column (e.g. ``# ucsc  assembly  genbank  refseq``)
+    * UCSC chromAlias.txt files without header, with columns alias, UCSC name and comma separated list of the conventions of the alias
+    * NCBI assembly reports. The Ensembl name is derived from them as the sequence name for assembled molecules and the GenBank accession for the other sequences
+
+    Args:
+        lines (iterable): The lines of the file
+    Returns:
+        dict: A dictionary with the list of conventions (key "conventions") and a list of tuples with the names of each sequence in each convention (key "names")
+    """
+    conventions=None
+    header=None
+    rows=[]
+    aliases=dict()
+    report=False
+    for line in lines:
+        line=line.rstrip("\r\n")
+        if(line.startswith("#")):
+            header=line.lstrip("#").strip().split("\t")
+            continue
+        if(not line.strip()):
+            continue
+        fields=line.split("\t")
+        if(conventions is None):
+            if(header is not None and "Sequence-Name" in header):
+                report=True
+                columns=[header.index(column) for column in _reportColumns if column in header]
+                conventions=[_reportColumns[header[i]] for i in columns]+["ensembl"]
+                role=header.index("Sequence-Role") if "Sequence-Role" in header else None
+            elif(header is not None and len(header)==len(fields) and len(header)>1 and "source" not in [x.lower() for x in header]):
+                conventions=[_conventionAliases.get(x.lower(), x.lower()) for x in header]
+            elif(len(fields)==3):
+                conventions=[]
+            else:
+                raise BEDexception("Format of the chromosome alias file not recognised")
+        if(report):
+            names=[_clean(fields[i]) if i<len(fields) else None for i in columns]
+            isMolecule=(role is not None and fields[role]=="assembled-molecule")
+            names.append(names[0] if isMolecule else names[conventions.index("genbank")] if "genbank" in conventions else None)
+            rows.append(tuple(names))
+        elif(conventions):
+            if(len(fields)!=len(conventions)):
+                raise BEDexception("The line of the chromosome alias file has the wrong number of columns: "+line)
+            rows.append(tuple(_clean(x) for x in fields))
+        else:
+            # Alias, UCSC name, conventions of the alias
+            if(len(fields)!=3):
+                raise BEDexception("The line of the chromosome alias file has the wrong number of columns: "+line)
+            alias, ucsc, sources = fields
+            names=aliases.setdefault(ucsc.strip(), {"ucsc": ucsc.strip()})
+            for source in sources.split(","):
+                source=source.strip().lower()
+                names.setdefault(_conventionAliases.get(source, source), _clean(alias))
+    if(conventions is None):
+        raise BEDexception("The chromosome alias file is empty")
+    if(not conventions):
+        conventions=sorted(set(x for names in aliases.values() for x in names))
+        rows=[tuple(names.get(x) for x in conventions) for names in aliases.values()]
+    return {"conventions": conventions, "names": rows}
+
+def registerAssembly(assembly, aliasFile):
+    """ Compiles a chromosome alias file and stores it in the cache
+
+    The assembly can then be used by :meth:`bedparse.bedline.translateChr` and
+    by convertChr in all later sessions, without reading the alias file again.
+
+    Args:
+        assembly (str): Name of the assembly (e.g. hg19, mm39, hs1)
+        aliasFile (str): Path to a chromAlias.txt file or NCBI assembly report
+    Returns:
+        list: The naming conventions available for the assembly
+    """
+    import pickle
+    import tempfile
+    try:
+        with open(aliasFile) as f:
+            table=parseAliasFile(f)
+    except (IOError, OSError):
+        raise BEDexception("Can't read the chromosome alias file "+aliasFile)
+    table["version"]=_formatVersion
+    path=_cachePath(assembly)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Write to a temporary file first, so that the table is never seen half-written
+    fd, tmp=tempfile.mkstemp(dir=os.path.dirname(path))
+    with os.fdopen(fd, "wb") as f:
+        pickle.dump(table, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, path)
+    # Translators built before the registration are outdated
+    from bedparse.translator import _translators
+    for key in [key for key in _translators if key[0]==assembly]:
+        del _translators[key]
+    return list(table["conventions"])
+
+def isRegistered(assembly):
+    """ Checks whether an assembly was registered with :func:`registerAssembly`
+
+    Args:
+        assembly (str): Name of the assembly
+    Returns:
+        bool: True if the assembly is in the cache
+    """
+    try:
+        return os.path.isfile(_cachePath(assembly))
+    except BEDexception:
+        return False
+
+def registeredAssemblies():
+    """ Lists the assemblies registered with :func:`registerAssembly`
+
+    Returns:
+        list: The names of the assemblies
+    """
+    suffix=".chromAlias.pickle"
+    try:
+        files=os.listdir(cacheDir())
+    except (IOError, OSError):
+        return []
+    return sorted(x[:-len(suffix)] for x in files if x.endswith(suffix))
+
+def aliasTable(assembly, target):
+    """ Returns the conversion table of a registered assembly
+
+    Args:
+        assembly (str): Name of the assembly
+        target (str): Naming convention of the converted names (e.g. ucsc, ens, genbank, refseq)
+    Returns:
+        dict: The name in the target convention of each alias
+    """
+    import pickle
+    with open(_cachePath(assembly), "rb") as f:
+        table=pickle.load(f)
+    if(table.get("version")!=_formatVersion):
+        raise BEDexception("The alias table of "+assembly+" was created by a different version of bedparse. Register it again.")
+    target=_conventionAliases.get(target.lower(), target.lower())
+    if(target not in table["conventions"]):
+        raise BEDexception("The specified target naming convention is not supported")
+    column=table["conventions"].index(target)
+    converted=dict()
+    for names in table["names"]:
+        if(names[column] is None):
+            continue
+        for name in names:
+            if(name is not None):
+                converted.setdefault(name, names[column])
+    return converted
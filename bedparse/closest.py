@@ -0,0 +1,133 @@
+from array import array
+from bisect import bisect_left, bisect_right
+from bedparse import BEDexception
+from bedparse.tokenizer import isHeader
+
+class _chromosome(object):
+    # TSSs of one chromosome sorted by position, with the index of their transcript and
+    # the sign of the distances (-1 for the - strand). Positions and signs are kept in
+    # lists, on which bisect and indexing are faster than on arrays
+    __slots__=('positions', 'transcripts', 'signs')
+
+    def __init__(self, positions, transcripts, signs):
+        order=sorted(range(len(positions)), key=positions.__getitem__)
+        self.positions=[positions[i] for i in order]
+        self.transcripts=array('q', [transcripts[i] for i in order])
+        self.signs=[signs[i] for i in order]
+
+class tssindex(object):
+    """The tssindex class finds the transcription start sites (TSSs) closest to a position or interval
+
+    The TSSs of the reference transcripts (the start of transcripts on the + strand or
+    without strand, the last base of transcripts on the - strand) are stored in a sorted
+    array per chromosome, built once, and each query is a binary search.
+
+    Distances are signed with respect to the strand of the transcript: they are positive
+    if the query is downstream of the TSS, negative if it is upstream, and 0 if it contains
+    the TSS. Queries adjacent to the TSS are at distance 1 or -1.
+
+    Examples:
+        >>> index = tssindex([b"chr1\\t1000\\t2000\\tTx1\\t0\\t+", b"chr1\\t5000\\t8000\\tTx2\\t0\\t-"])
+        >>> index.closest("chr1", 1500, 1600)
+        [('chr1', 1000, 'Tx1', '+', 500)]
+        >>> index.closest("chr1", 8500, 8600)
+        [('chr1', 7999, 'Tx2', '-', -501)]
+    """
+    def __init__(self, lines):
+        """
+        :param lines: Lines of the BED file of the transcripts (BED4 or more, bytes)
+        :type lines: iterable
+        """
+        self.names=[]
+        self.strands=[]
+        chromosomes=dict()
+        for line in lines:
+            if(isHeader(line)):
+                continue
+            fields=line.split(b'\t', 6)
+            try:
+                start=int(fields[1])
+                end=int(fields[2])
+                name=fields[3].rstrip()
+            except (IndexError, ValueError):
+                raise BEDexception("The transcripts must be valid BED4 or longer records: "+line.decode(errors='replace').rstrip())
+            strand=fields[5].rstrip() if len(fields)>5 else b'.'
+            positions=chromosomes.get(fields[0])
+            if(positions is None):
+                positions=chromosomes[fields[0]]=([], [], [])
+            positions[0].append(end-1 if strand==b'-' else start)
+            positions[1].append(len(self.names))
+            positions[2].append(-1 if strand==b'-' else 1)
+            self.names.append(name)
+            self.strands.append(strand if strand==b'+' or strand==b'-' else b'.')
+        self.chromosomes={chrom: _chromosome(*positions) for chrom, positions in chromosomes.items()}
+
+    @classmethod
+    def fromFile(cls, path):
+        """ Builds the index of the transcripts of a BED file
+
+        Args:
+            path (str): Path to the BED file, which can be compressed
+        Returns:
+            tssindex: The index
+        """
+        from bedparse.compressed import openInput
+        from bedparse.reader import bedreader
+        with bedreader(openInput(path)) as reader:
+            return cls(reader)
+
+    def __len__(self):
+        return len(self.names)
+
+    def _closest(self, chrom, start, end, ties=True):
+        # Index of the transcripts with the closest TSS, position of the TSS and signed distance
+        records=self.chromosomes.get(chrom)
+        if(records is None):
+            return []
+        positions=records.positions
+        n=len(positions)
+        i=bisect_left(positions, start)
+        if(i < n and positions[i] < end):
+            # The query contains one or more TSSs
+            first=i
+            last=bisect_left(positions, end, i) if ties else i+1
+        else:
+            left=start-positions[i-1] if i > 0 else None
+            right=positions[i]-end+1 if i < n else None
+            if(right is None or (left is not None and (left < right or (left==right and not ties)))):
+                first=bisect_left(positions, positions[i-1], 0, i-1)
+                last=i if ties else first+1
+            elif(left is None or right < left):
+                first=i
+                last=bisect_right(positions, positions[i], i) if ties else i+1
+            else:
+                # Equidistant TSSs on both sides
+                first=bisect_left(positions, positions[i-1], 0, i-1)
+                last=bisect_right(positions, positions[i], i)
+        transcripts=records.transcripts
+        signs=records.signs
+        hits=[]
+        for j in range(first, last):
+            position=positions[j]
+            # Positive if the query is to the right of the TSS
+            distance=start-position if position < start else end-1-position if position >= end else 0
+            hits.append((transcripts[j], position, signs[j]*distance))
+        return hits
+
+    def closest(self, chrom, start, end=None, ties=True):
+        """ Finds the transcripts with the TSS closest to a position or interval
+
+        Args:
+            chrom (str): Chromosome
+            start (int): Start of the query (0-based)
+            end (int): End of the query (not included). Defaults to start+1
+            ties (bool): Report all the transcripts at the minimum distance instead of only the first
+        Returns:
+            list: Tuples of chromosome, TSS position, name, strand and signed distance of each transcript, in order of position. Empty if there are no transcripts on the chromosome
+        """
+        if(end is None):
+            end=start+1
+        if(end <= start):
+            raise BEDexception("The end of the query must be greater than its start")
+        hits=self._closest(chrom.encode(), start, end, ties)
+        return [(chrom, tss, self.names[i].decode(), self.strands[i].decode(), distance) for i, tss, distance in hits]
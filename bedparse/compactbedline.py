@@ -0,0 +1,394 @@
+import sys
+from array import array
+from bedparse import BEDexception
+from bedparse.bedline import bedline
+from bedparse.bedbatch import _utr, _cds, _introns
+from bedparse.tokenizer import tokenize
+
+def _decode(field):
+    if(isinstance(field, bytes)):
+        return field.decode()
+    return field
+
+def _pack(values):
+    # Stores the coordinates as 32 bit integers unless they don't fit
+    try:
+        return array('i', values)
+    except OverflowError:
+        return array('q', values)
+
+def _intern(field):
+    # Chromosome names, strands and other low cardinality fields
+    # are shared between all the records
+    field=_decode(field)
+    if(type(field) is str):
+        return sys.intern(field)
+    return field
+
+def _blocks(field):
+    # Parses the content of fields 11 or 12 into a list of strings
+    field=_decode(field)
+    if(field.endswith(",")):
+        field=field[:-1]
+    return field.split(",")
+
+class compactbedline(object):
+    """The compactbedline class is a memory efficient alternative to :class:`bedparse.bedline`.
+
+    It stores its fields in slots rather than in a dictionary, and all the
+    coordinates (start, end, thickStart, thickEnd, followed by the exon starts
+    and lengths) in a single array of integers, which is parsed once when the
+    object is created and reused by all the methods. Chromosome names and
+    strands are interned, so they are shared by all records. Score and color are kept
+    as found in the input line (either str or bytes) and only decoded when read.
+    The methods return compactbedline objects, so they can be chained without
+    re-parsing the exon blocks.
+    """
+    __slots__ = ("bedType", "chr", "name", "_score", "strand", "_color", "_coords")
+    __fields = ("chr", "start", "end", "name", "score", "strand", "cdsStart", "cdsEnd", "color", "nEx", "exLengths", "exStarts")
+    def __init__(self, line=None):
+        """
+        :param line: List where each element corresponds to one field of a BED file. Elements can be str or bytes.
+        :type line: list
+        """
+        if(line is None):
+            return None
+        elif(type(line) is not list):
+            raise BEDexception("Can't instantiate a compactbedline from an object other than a list")
+
+        bedType=len(line)
+        last=line[bedType-1]
+        if(isinstance(last, (str, bytes))):
+            line[bedType-1]=last.rstrip()
+
+        self.bedType=bedType
+        self.chr=_intern(line[0])
+        self.name=_decode(line[3]) if bedType>=4 else "NoName"
+        if(not bedType in (3,4,6,12)):
+            raise BEDexception("Only BED3,4,6,12 are supported. "+self.name+" is neither.")
+
+        try:
+            coords=[int(line[1]), int(line[2])]
+        except:
+            raise BEDexception("Start or End are not an int for transcript "+self.name)
+        if(coords[0]>coords[1]):
+            raise BEDexception("Start is greater than End for transcript "+self.name)
+
+        if(bedType>=6):
+            self._score=line[4]
+            self.strand=_intern(line[5])
+            if(self.strand not in ("+", "-", "", ".")):
+                raise BEDexception("The strand is not any of '+', '-', '.' or '' for transcript: "+self.name)
+        else:
+            self._score=None
+            self.strand=None
+
+        if(bedType==12):
+            try:
+                nEx=int(line[9])
+            except:
+                raise BEDexception("Number of exons is not an int for transcript "+self.name)
+            try:
+                coords.extend((int(line[6]), int(line[7])))
+            except:
+                raise BEDexception("CDSstart or CDSend are not int for transcript "+self.name)
+            if(coords[2]>coords[3]):
+                raise BEDexception("CDSstart is greater than CDSend for transcript "+self.name)
+            if(coords[2]<coords[0] or coords[3]>coords[1]):
+                raise BEDexception("The CDS range is bigger than the transcript for transcript "+self.name)
+            self._color=line[8]
+            exLengths=_blocks(line[10])
+            exStarts=_blocks(line[11])
+            if(len(exLengths)!=nEx):
+                raise BEDexception("Exon lengths and number of exons mismatch for transcript "+self.name)
+            if(len(exStarts)!=nEx):
+                raise BEDexception("Exon starts and number of exons mismatch for transcript "+self.name)
+            # The exon starts are followed by the exon lengths
+            try:
+                coords.extend([int(x) for x in exStarts])
+            except ValueError:
+                raise BEDexception("Exon starts are not int for transcript "+self.name)
+            try:
+                coords.extend([int(x) for x in exLengths])
+            except ValueError:
+                raise BEDexception("Exon lengths are not int for transcript "+self.name)
+        else:
+            self._color=None
+        self._coords=_pack(coords)
+
+    @classmethod
+    def _fromCoords(cls, template, bedType, coords, name=None):
+        # Builds a new record from the coordinates returned by the
+        # kernel functions, copying the other fields from template
+        new=cls.__new__(cls)
+        new.bedType=bedType
+        new.chr=template.chr
+        start, end, cdsStart, cdsEnd, exStarts, exLengths = coords
+        new.name=template.name if name is None else name
+        new._score=template._score if bedType>=6 else None
+        new.strand=template.strand if bedType>=6 else None
+        if(bedType==12):
+            new._color=template._color
+            new._coords=_pack([start, end, cdsStart, cdsEnd]+list(exStarts)+list(exLengths))
+        else:
+            new._color=None
+            new._coords=_pack((start, end))
+        return new
+
+    @classmethod
+    def fromBytes(cls, line):
+        """ Parses a BED line with :func:`bedparse.tokenizer.tokenize`
+
+        Args:
+            line (bytes): A line of a BED file
+        Returns:
+            compactbedline: The parsed record
+        """
+        fields=tokenize(line)
+        bedType=len(fields)
+        new=cls.__new__(cls)
+        new.bedType=bedType
+        new.chr=_intern(fields[0])
+        new.name=fields[3].decode() if bedType>=4 else "NoName"
+        new._score=fields[4] if bedType>=6 else None
+        new.strand=_intern(fields[5]) if bedType>=6 else None
+        if(bedType==12):
+            new._color=fields[8]
+            new._coords=_pack([fields[1], fields[2], fields[6], fields[7]]+fields[11]+fields[10])
+        else:
+            new._color=None
+            new._coords=_pack((fields[1], fields[2]))
+        return new
+
+    @classmethod
+    def fromBedline(cls, record):
+        """ Converts a bedline into a compactbedline
+
+        Args:
+            record (bedline): The bedline to convert
+        Returns:
+            compactbedline: The converted record
+        """
+        return cls([record.__dict__[key] for key in record._bedline__fields[:record.bedType]])
+
+    def toBedline(self):
+        """ Converts a compactbedline into a bedline
+
+        Returns:
+            bedline: The converted record
+        """
+        return bedline(self.fields())
+
+    @property
+    def score(self):
+        if(isinstance(self._score, bytes)):
+            self._score=self._score.decode()
+        return self._score
+
+    @property
+    def color(self):
+        if(isinstance(self._color, bytes)):
+            self._color=self._color.decode()
+        return self._color
+
+    @property
+    def start(self):
+        return self._coords[0]
+
+    @property
+    def end(self):
+        return self._coords[1]
+
+    @property
+    def cdsStart(self):
+        return self._coords[2] if self.bedType==12 else None
+
+    @property
+    def cdsEnd(self):
+        return self._coords[3] if self.bedType==12 else None
+
+    @property
+    def nEx(self):
+        return (len(self._coords)-4)//2 if self.bedType==12 else None
+
+    @property
+    def exStarts(self):
+        if(self.bedType<12):
+            return None
+        return memoryview(self._coords)[4:4+self.nEx]
+
+    @property
+    def exLengths(self):
+        if(self.bedType<12):
+            return None
+        return memoryview(self._coords)[4+self.nEx:]
+
+    @property
+    def stranded(self):
+        return self.strand=="+" or self.strand=="-"
+
+    @property
+    def hasORF(self):
+        if(self.bedType<12):
+            return None
+        return 0 if self.cdsStart==self.cdsEnd else 1
+
+    def fields(self):
+        """ Returns the fields of the record as a list, as they would be printed in a BED file
+
+        Returns:
+            list: One element per BED field
+        """
+        out=[]
+        for key in self.__fields[:self.bedType]:
+            if key=="exLengths" or key=="exStarts":
+                out.append(''.join(str(x)+"," for x in getattr(self, key)))
+            else:
+                out.append(getattr(self, key))
+        return out
+
+    def __str__(self):
+        out=self.fields()
+        if(self.bedType==12):
+            out[10]=out[10][:-1]
+            out[11]=out[11][:-1]
+        return str(out)
+
+    def print(self, end='\n'):
+        """Prints a compactbedline object
+
+        :param end: Line terminator character
+        """
+        return print(*self.fields(), sep="\t", end=end)
+
+    def __eq__(self, other):
+        return type(self) is type(other) and self.fields()==other.fields()
+
+    def promoter(self, up=500, down=500, strand=True):
+        """ Returns the promoter of the record. See :meth:`bedparse.bedline.promoter`
+
+        Returns:
+            compactbedline: The promoter as a BED4 record
+        """
+        if strand and self.bedType<6:
+            raise BEDexception("You requested stranded promoters, but the BED file appears to be unstranded")
+        if not strand or self.strand=="+":
+            start = self.start-up if self.start-up>0 else 0
+            end = self.start+down
+        elif self.strand=="-":
+            start= self.end-down if self.end-down>0 else 0
+            end=self.end+up
+        else:
+            raise BEDexception("Strand not recognised for transcript "+self.name)
+        if(start>end):
+            raise BEDexception("Start is greater than End for transcript "+self.name)
+        return self._fromCoords(self, 4, (start, end, None, None, None, None))
+
+    def utr(self, which=None):
+        """ Returns the UTR of coding transcripts. See :meth:`bedparse.bedline.utr`
+
+        Returns:
+            compactbedline: The UTR as a BED12 record
+        """
+        if(not self.stranded):
+            raise BEDexception("UTRs for an unstranded transcript make little sense: "+self.name)
+        if(which!=5 and which!=3):
+            raise BEDexception("'which' needs to be 3 or 5")
+        if(self.bedType<12):
+            raise BEDexception("Only BED12 lines are supported by this operation. "+self.name+" is not")
+        if(self.cdsStart==self.cdsEnd or (self.cdsStart == self.start and self.cdsEnd == self.end)):
+            return None
+        coords=_utr(self.start, self.end, self.cdsStart, self.cdsEnd, self.strand, which, self.exStarts, self.exLengths)
+        if(coords is None):
+            return None
+        return self._fromCoords(self, 12, coords)
+
+    def cds(self, ignoreCDSonly=False):
+        """ Returns the CDS of a coding transcript. See :meth:`bedparse.bedline.cds`
+
+        Returns:
+            compactbedline: The CDS as a BED12 record
+        """
+        if(not self.stranded):
+            raise BEDexception("CDS for an unstranded transcript makes little sense: "+self.name)
+        if(self.bedType<12):
+            raise BEDexception("Only BED12 lines are supported by this operation. "+self.name+" is not")
+        if(self.cdsStart==self.cdsEnd):
+            return None
+        if(ignoreCDSonly and (self.cdsStart == self.start and self.cdsEnd == self.end)):
+            return None
+        return self._fromCoords(self, 12, _cds(self.start, self.cdsStart, self.cdsEnd, self.exStarts, self.exLengths))
+
+    def introns(self):
+        """ Returns the introns of a transcript. See :meth:`bedparse.bedline.introns`
+
+        Returns:
+            compactbedline: The introns as a BED12 record
+        """
+        if(self.bedType<12):
+            return None
+        coords=_introns(self.start, self.end, self.exStarts, self.exLengths)
+        if(coords is None):
+            return None
+        return self._fromCoords(self, 12, coords)
+
+    def tx2genome(self, coord, stranded=False):
+        """ Converts a transcript coordinate to genome coordinates. See :meth:`bedparse.bedline.tx2genome`
+
+        Returns:
+            int: Coordinate in genome-space
+        """
+        if not isinstance(coord, int):
+            raise BEDexception("coord must be of type integer")
+        if stranded and not self.stranded:
+            raise BEDexception("The standed option only makes sense for stranded transcripts")
+        if(self.bedType<12):
+            exStarts=(0,)
+            exLens=(self.end-self.start,)
+        else:
+            exStarts=self.exStarts
+            exLens=self.exLengths
+        txLen=sum(exLens)
+        if stranded and self.strand == "-":
+            coord = txLen-coord-1
+        if(coord<0 or coord>=txLen):
+            raise BEDexception("This coordinate doesn't exist in the transcript")
+        for i in range(len(exLens)):
+            if(coord<exLens[i]):
+                break
+            coord-=exLens[i]
+        return self.start+exStarts[i]+coord
+
+    def bed12tobed6(self, appendExN=False, whichExon="all"):
+        """ Returns a list of BED6 records corresponding to the exons. See :meth:`bedparse.bedline.bed12tobed6`
+
+        Returns:
+            list: list of compactbedline objects, one per exon
+        """
+        if(self.bedType!=12): raise BEDexception("Only BED12 lines can be coverted to BED6")
+        if whichExon not in ("all", "first", "last"):
+            raise BEDexception("whichExon has to be one of [all, first, last]")
+        if whichExon != "all" and not self.stranded:
+            raise BEDexception("whichExon is only allowed if the transcripts are stranded. %s is not"%self.name)
+        exons=list()
+        exStarts=self.exStarts
+        exLengths=self.exLengths
+        for n in range(0, len(exStarts)):
+            name=self.name
+            if(appendExN): name+="_Exon"+'%03d'%(n+1)
+            start=self.start+exStarts[n]
+            exons.append(self._fromCoords(self, 6, (start, start+exLengths[n], None, None, None, None), name=name))
+        if whichExon == "all":
+            return exons
+        elif (whichExon == "first") == (self.strand == "+"):
+            return [exons[0]]
+        else:
+            return [exons[-1]]
+
+    def translateChr(self, assembly, target, suppress=False, ignore=False, patches=False):
+        """ Convert the chromosome name to Ensembl or UCSC. See :meth:`bedparse.bedline.translateChr`
+
+        Returns:
+            compactbedline: The record with the converted chromosome
+        """
+        return bedline.translateChr(self, assembly, target, suppress=suppress, ignore=ignore, patches=patches)
@@ -0,0 +1,322 @@
+import io
+import os
+import sys
+import zlib
+import struct
+from bedparse import BEDexception
+
+_gzipMagic=b'\x1f\x8b'
+_zstdMagic=b'\x28\xb5\x2f\xfd'
+_arrowMagic=b'ARROW1'
+_parquetMagic=b'PAR1'
+# Size of the blocks passed between the main thread and the codec threads
+blockBytes=1<<20
+# Number of blocks that can be waiting in each direction
+queueBlocks=4
+# Uncompressed size of BGZF blocks. Even if the data can't be compressed
+# the blocks stay below the 64 KiB limit of the format.
+_bgzfBlock=65280
+_bgzfEOF=bytes.fromhex('1f8b08040000000000ff0600424302001b0003000000000000000000')
+_bgzfExtensions=('.gz', '.bgz', '.bgzf')
+_zstdExtensions=('.zst', '.zstd')
+_arrowExtensions=('.arrow', '.feather', '.ipc')
+_parquetExtensions=('.parquet', '.pq')
+
+def detectFormat(head):
+    """ Detects the compression format of a file from its first bytes
+
+    Args:
+        head (bytes): The first bytes of the file (at least 16 to tell BGZF from gzip)
+    Returns:
+        str: "bgzf", "gzip", "zstd", "arrow" (Arrow IPC file), "parquet" or None if the data is not compressed
+    """
+    if(head.startswith(_gzipMagic)):
+        # BGZF files are gzip files with a BC extra subfield in each member
+        if(len(head)>=14 and head[3] & 4 and head[12:14]==b'BC'):
+            return "bgzf"
+        return "gzip"
+    if(head.startswith(_zstdMagic)):
+        return "zstd"
+    if(head.startswith(_arrowMagic)):
+        return "arrow"
+    if(head.startswith(_parquetMagic)):
+        return "parquet"
+    return None
+
+def _zstdModule():
+    # zstd is in the standard library from Python 3.14, and
+    # is otherwise provided by the optional zstandard package
+    try:
+        from compression import zstd
+        return zstd
+    except ImportError:
+        pass
+    try:
+        import zstandard
+        return zstandard
+    except ImportError:
+        raise BEDexception("zstd compressed files require the zstandard package (pip install bedparse[zstd])")
+
+def _decoder(fmt, raw):
+    # File object with the decompressed content of raw
+    if(fmt=="zstd"):
+        zstd=_zstdModule()
+        if(hasattr(zstd, "ZstdFile")):
+            return zstd.ZstdFile(raw)
+        return zstd.ZstdDecompressor().stream_reader(raw, read_across_frames=True)
+    # gzip files can have several members, and BGZF files always do
+    import gzip
+    return gzip.GzipFile(fileobj=raw)
+
+class _bgzfencoder(object):
+    # Splits the data in BGZF blocks, each compressed as a separate gzip member
+    def __init__(self, level=6):
+        self.level=level
+        self.pending=b''
+
+    def _block(self, data):
+        compressor=zlib.compressobj(self.level, zlib.DEFLATED, -15)
+        cdata=compressor.compress(data)+compressor.flush()
+        header=struct.pack('<4BI2BH2BHH', 0x1f, 0x8b, 8, 4, 0, 0, 0xff, 6, ord('B'), ord('C'), 2, len(cdata)+25)
+        return header+cdata+struct.pack('<II', zlib.crc32(data) & 0xffffffff, len(data))
+
+    def compress(self, data):
+        data=self.pending+data
+        end=len(data)-len(data) % _bgzfBlock
+        self.pending=data[end:]
+        return b''.join(self._block(data[i:i+_bgzfBlock]) for i in range(0, end, _bgzfBlock))
+
+    def flush(self):
+        out=self._block(self.pending) if self.pending else b''
+        self.pending=b''
+        return out+_bgzfEOF
+
+def _encoder(fmt, level=None):
+    if(fmt=="bgzf"):
+        return _bgzfencoder(6 if level is None else level)
+    zstd=_zstdModule()
+    if(hasattr(zstd, "ZstdFile")):
+        return zstd.ZstdCompressor(level=level)
+    return zstd.ZstdCompressor(level=3 if level is None else level).compressobj()
+
+class _threadedreader(io.RawIOBase):
+    # Reads a decoder in a background thread, so that decompression
+    # overlaps with the processing of the data already decompressed
+    def __init__(self, decoder, raw):
+        import queue
+        import threading
+        self.decoder=decoder
+        self.raw=raw
+        self.blocks=queue.Queue(queueBlocks)
+        self.stopped=threading.Event()
+        self.current=memoryview(b'')
+        self.finished=False
+        self.thread=threading.Thread(target=self._decode, daemon=True)
+        self.thread.start()
+
+    def _decode(self):
+        try:
+            while(not self.stopped.is_set()):
+                data=self.decoder.read(blockBytes)
+                if(not data):
+                    break
+                self.blocks.put(data)
+            self.blocks.put(None)
+        except Exception as error:
+            self.blocks.put(error)
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while(not self.current and not self.finished):
+            data=self.blocks.get()
+            if(isinstance(data, Exception)):
+                self.finished=True
+                raise BEDexception("Error while decompressing the input: "+str(data))
+            if(data is None):
+                self.finished=True
+            else:
+                self.current=memoryview(data)
+        size=min(len(buffer), len(self.current))
+        buffer[:size]=self.current[:size]
+        self.current=self.current[size:]
+        return size
+
+    def close(self):
+        if(self.closed):
+            return
+        self.stopped.set()
+        # Unblock the background thread if it is waiting for space in the queue
+        while(self.thread.is_alive()):
+            try:
+                self.blocks.get(timeout=0.1)
+            except Exception:
+                pass
+        self.decoder.close()
+        self.raw.close()
+        super(_threadedreader, self).close()
+
+class _threadedwriter(object):
+    # Compresses and writes the data in a background thread
+    def __init__(self, encoder, raw):
+        import queue
+        import threading
+        self.encoder=encoder
+        self.raw=raw
+        self.blocks=queue.Queue(queueBlocks)
+        self.error=None
+        self.pending=[]
+        self.size=0
+        self.closed=False
+        self.thread=threading.Thread(target=self._encode, daemon=True)
+        self.thread.start()
+
+    def _encode(self):
+        while True:
+            data=self.blocks.get()
+            if(self.error is not None):
+                continue
+            try:
+                if(data is None):
+                    self.raw.write(self.encoder.flush())
+                    self.raw.flush()
+                    return
+                self.raw.write(self.encoder.compress(data))
+            except Exception as error:
+                self.error=error
+                if(data is None):
+                    return
+
+    def _check(self):
+        if(self.error is not None):
+            raise BEDexception("Error while compressing the output: "+str(self.error))
+
+    def write(self, data):
+        self._check()
+        self.pending.append(data)
+        self.size+=len(data)
+        if(self.size >= blockBytes):
+            self.blocks.put(b''.join(self.pending))
+            self.pending=[]
+            self.size=0
+        return len(data)
+
+    def flush(self):
+        # Blocks are sent to the compression thread as soon as they are full
+        self._check()
+
+    def close(self):
+        if(self.closed):
+            return
+        self.closed=True
+        if(self.pending):
+            self.blocks.put(b''.join(self.pending))
+            self.pending=[]
+        self.blocks.put(None)
+        self.thread.join()
+        if(self.raw is not sys.stdout.buffer):
+            self.raw.close()
+        self._check()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+def openInput(path, mode='rb'):
+    """ Opens a file, decompressing it if needed
+
+    gzip, BGZF and zstd files are detected from their first bytes, independently
+    of their name, and are decompressed in a background thread. zstd requires
+    Python 3.14 or the zstandard package. Arrow IPC and Parquet files, and
+    directories of Parquet files partitioned by chromosome, are read as the
+    corresponding BED text (see :mod:`bedparse.arrowio`), which requires pyarrow.
+
+    Args:
+        path (str): Path to the file or directory, or - for stdin
+        mode (str): rb for binary or r for text
+    Returns:
+        file: The file object
+    Examples:
+        >>> with openInput("transcripts.bed.gz", "r") as bed:
+        ...     for line in bed:
+        ...         print(line.split("\\t")[3])
+    """
+    if(mode not in ('r', 'rb')):
+        raise BEDexception("Mode not valid: "+str(mode))
+    if(path!='-' and os.path.isdir(path)):
+        from bedparse.arrowio import openTable
+        return openTable(path, mode)
+    raw=sys.stdin.buffer if path=='-' else open(path, 'rb')
+    fmt=detectFormat(raw.peek(16)[:16])
+    if(fmt=="arrow" or fmt=="parquet"):
+        from bedparse.arrowio import openTable
+        if(path!='-'):
+            raw.close()
+        return openTable(path, mode)
+    if(fmt is None):
+        if(mode=='rb'):
+            return raw
+        if(path=='-'):
+            return sys.stdin
+        return io.TextIOWrapper(raw)
+    data=io.BufferedReader(_threadedreader(_decoder(fmt, raw), raw), blockBytes)
+    if(mode=='rb'):
+        return data
+    return io.TextIOWrapper(data)
+
+def outputFormat(path):
+    """ Returns the compression format of an output file from its extension
+
+    Args:
+        path (str): Path to the file
+    Returns:
+        str: "bgzf" for .gz, .bgz and .bgzf files, "zstd" for .zst and .zstd files, "arrow" for .arrow, .feather and .ipc files, "parquet" for .parquet and .pq files and None otherwise
+    """
+    extension=os.path.splitext(path)[1].lower()
+    if(extension in _bgzfExtensions):
+        return "bgzf"
+    if(extension in _zstdExtensions):
+        return "zstd"
+    if(extension in _arrowExtensions):
+        return "arrow"
+    if(extension in _parquetExtensions):
+        return "parquet"
+    return None
+
+def openOutput(path, fmt=None, level=None, partitionByChr=False, extraColumns=None):
+    """ Opens a file for writing, compressing its content if needed
+
+    Compression runs in a background thread. gzip output is always written in the
+    BGZF format, which can be read by any gzip reader and indexed by tabix.
+    BED lines written to Arrow IPC and Parquet files are stored as columns
+    (see :mod:`bedparse.arrowio`), which requires pyarrow.
+
+    Args:
+        path (str): Path to the file, or - for stdout
+        fmt (str): Format ("bgzf", "zstd", "arrow", "parquet" or "none"). By default it is chosen from the extension of the file
+        level (int): Compression level (by default 6 for BGZF and 3 for zstd)
+        partitionByChr (bool): Write Parquet output as a directory with one subdirectory per chromosome
+        extraColumns (list): Names of the Arrow and Parquet columns after the BED ones
+    Returns:
+        file: A file object opened in binary mode. It must be closed to complete the file.
+    """
+    if(fmt is None):
+        fmt=None if path=='-' else outputFormat(path)
+        if(partitionByChr and fmt is None):
+            fmt="parquet"
+    elif(fmt=="none"):
+        fmt=None
+    elif(fmt not in ("bgzf", "zstd", "arrow", "parquet")):
+        raise BEDexception("Format not supported: "+str(fmt))
+    if(fmt=="arrow" or fmt=="parquet" or partitionByChr):
+        from bedparse.arrowio import _tablewriter
+        return _tablewriter(path, fmt, partitionByChr, extraColumns)
+    encoder=None if fmt is None else _encoder(fmt, level)
+    raw=sys.stdout.buffer if path=='-' else open(path, 'wb')
+    if(encoder is None):
+        return raw
+    return _threadedwriter(encoder, raw)
@@ -1,36 +1,198 @@
 #!/usr/bin/python3
-import csv
+import io
 import re
+from bedparse import BEDexception
 from bedparse import bedline
+from bedparse.writer import bedwriter, formatRecord
+from bedparse.parallel import mapOrdered, _isRegularFile
 
-def gtf2bed(gtf, extra=[''], filterKey="transcript_biotype", filterType=[''], transcript_feature_name= "transcript"):
-    gtfRecords={'exon':list(), 'transcript': list(), 'cds':list()}
+_cdsFeatures = ('CDS', 'start_codon', 'stop_codon')
+
+# A key-value pair of the attributes field (column 9) of a GTF line.
+# Values can be quoted or not, and the last pair may lack the semicolon
+_attributePattern = re.compile(r'\s*([^\s;]+)\s+("[^"]*"|[^;]*?)\s*(?:;|$)')
+_transcriptIdPattern = re.compile(r'(?:^|;)\s*transcript_id\s+"?([^";]*)"?')
+
+def parseAttributes(attributes):
+    """ Parses the attributes field (column 9) of a GTF line
+
+    The field is scanned only once. If a key appears more than once
+    (e.g. tag) the last value is retained.
+
+    Args:
+        attributes (str): The attributes field
+    Returns:
+        dict: The value of each attribute, without quotes
+    Examples:
+        >>> parseAttributes('gene_id "G1"; transcript_id "T1"; exon_number 2;')
+        {'gene_id': 'G1', 'transcript_id': 'T1', 'exon_number': '2'}
+    """
+    return {key: value.strip('"') for key, value in _attributePattern.findall(attributes)}
+
+def _txName(attributes):
+    match=_transcriptIdPattern.search(attributes)
+    if(match is None):
+        return attributes
+    return match.group(1)
+
+def _extraInfo(attributes, extra, filterKey, filterType):
+    # Parses the extra fields and the filter field of a transcript.
+    # Missing fields are set to '.'
+    extrainfo=dict()
+    keys=[] if extra==[''] else list(extra)
+    if filterType!=[''] and filterKey not in extra:
+        keys.append(filterKey)
+    if(keys):
+        values=parseAttributes(attributes)
+        for key in keys:
+            extrainfo[key]=values.get(key) or "."
+    return extrainfo
+
+def _formatTranscript(transcript, exons, cds, extrainfo, extra, filterKey, filterType):
+    # Builds the BED12 line of a transcript from its GTF features.
+    # Returns None if the transcript doesn't pass the filter
+    if(filterType!=['']):
+        if extrainfo[filterKey] not in filterType:
+            return None
+    if(cds is not None):
+        cdsStart=int(cds[0])-1
+        cdsEnd = int(cds[1])
+    else:
+        cdsStart=transcript[2]
+        cdsEnd=transcript[2]
+
+    transcript=transcript+[cdsStart, cdsEnd, '0', len(exons)]
+    # Sort the [start, length] pairs by start position
+    exons.sort(key=lambda x: x[0])
+    starts=""
+    lens=""
+    for exon in exons:
+        starts=starts+str(exon[0]-int(transcript[1]))+","
+        lens=lens+str(exon[1]+1)+","
+    transcript.append(lens)
+    transcript.append(starts)
+    # Convert to bedline for format validation
+    bed = bedline(transcript)
+    out = formatRecord(bed, end='')
+    if(extra!=['']):
+        for field in extra:
+            out += "\t"+extrainfo[field]
+    return out+"\n"
+
+def _readGTF(gtf):
+    import csv
+    return csv.reader((row for row in gtf if not row.startswith('#')), delimiter="\t")
+
+def gtf2bed(gtf, extra=[''], filterKey="transcript_biotype", filterType=[''], transcript_feature_name= "transcript", stream=False, sort=False, tmpdir=None, threads=1, output=None):
+    """ Converts a GTF file to BED12 and prints the result
+
+    By default all the features of the file are loaded in memory before printing.
+    With stream=True transcripts are printed as soon as all their features have been
+    read, which requires the GTF to be grouped by chromosome and transcript (i.e. all
+    the lines of a chromosome, and of a transcript, are consecutive, as in Ensembl and
+    Gencode GTFs). If the GTF is not grouped, sort=True first groups its features
+    with an external sort on the transcript ID. In this case transcripts are reported
+    sorted by chromosome and start (see :func:`bedparse.extsort.bedSortKey`).
+
+    With more than one thread the file is split by chromosome (column 1) and each
+    chromosome is converted by a separate worker process. Chromosomes are reported
+    in order of first appearance in the file, or in sorted order with sort=True, so
+    the output is the same as with a single thread when the lines of each chromosome
+    are consecutive. Parallel conversion requires a regular file: streams are always
+    converted on a single thread.
+
+    Args:
+        gtf (file): GTF file opened in text mode
+        extra (list): Extra GTF fields to add after column 12
+        filterKey (str): GTF field on which to apply the filtering
+        filterType (list): Values of filterKey to retain
+        transcript_feature_name (str): Feature name (column 3) of transcripts
+        stream (bool): Print each transcript as soon as it is complete
+        sort (bool): Sort the GTF by transcript before converting it (implies stream)
+        tmpdir (str): Directory for the temporary files used by sort
+        threads (int): Number of worker processes
+        output (file): Output stream (default stdout)
+    """
+    options=(extra, filterKey, filterType, transcript_feature_name, stream, sort, tmpdir)
+    with bedwriter(output) as writer:
+        if(threads>1 and _isRegularFile(gtf)):
+            shards=_seqnameRanges(gtf.name)
+            # With sort the shards are sorted by chromosome, so concatenating
+            # them in chromosome order merges them without holding them in memory
+            seqnames=sorted(shards) if sort else list(shards)
+            jobs=((gtf.name, shards[seqname], options) for seqname in seqnames)
+            for out in mapOrdered(_convertShard, jobs, threads):
+                writer.writeText(out)
+        else:
+            for out in _convert(gtf, options):
+                writer.writeText(out)
+    gtf.close()
+
+def _convert(gtf, options):
+    # Returns a generator of the BED12 lines of a GTF
+    extra, filterKey, filterType, transcript_feature_name, stream, sort, tmpdir = options
+    if(sort):
+        from bedparse.extsort import externalSort
+        transcripts=_gtf2bedStream(gtf, extra, filterKey, filterType, transcript_feature_name, sort, tmpdir)
+        return externalSort(transcripts, key=_sortKey, tmpdir=tmpdir)
+    if(stream):
+        return _gtf2bedStream(gtf, extra, filterKey, filterType, transcript_feature_name, sort, tmpdir)
+    return _gtf2bedDict(gtf, extra, filterKey, filterType, transcript_feature_name)
+
+def _sortKey(line):
+    # Chromosome and coordinates of a BED line, as in bedparse.extsort.bedSortKey
+    from bedparse.extsort import bedSortKey
+    return bedSortKey(line.encode())
+
+def _seqnameRanges(path):
+    # Finds the byte ranges of the lines of each chromosome,
+    # in order of first appearance of the chromosomes
+    ranges=dict()
+    current=None
+    start=offset=0
+    with open(path, 'rb') as f:
+        for line in f:
+            if(not line.startswith(b'#')):
+                seqname=line[:line.find(b'\t')]
+                if(seqname!=current):
+                    if(current is not None):
+                        ranges[current].append((start, offset))
+                    ranges.setdefault(seqname, [])
+                    current=seqname
+                    start=offset
+            offset+=len(line)
+    if(current is not None):
+        ranges[current].append((start, offset))
+    return ranges
+
+def _convertShard(job):
+    # Converts the lines of a chromosome, given as a list of byte ranges
+    path, ranges, options = job
+    chunks=[]
+    with open(path, 'rb') as f:
+        for start, end in ranges:
+            f.seek(start)
+            chunks.append(f.read(end-start))
+    lines=io.StringIO(b''.join(chunks).decode())
+    return ''.join(_convert(lines, options))
+
+def _gtf2bedDict(gtf, extra, filterKey, filterType, transcript_feature_name):
     transcripts=dict()
     exons=dict()
     cds=dict()
     extrainfo=dict()
-    gtfReader = csv.reader((row for row in gtf if not row.startswith('#')), delimiter="\t")
-    for line in gtfReader:
+    for line in _readGTF(gtf):
         # Store all transcript lines
         if(line[2]== transcript_feature_name):
-            txName=re.sub('.*transcript_id "([^"]+)";.*', "\\1", line[8])
+            txName=_txName(line[8])
             if(line[6]!="+" and line[6]!="-"):
                 raise BEDexception("Transcript with unrecognized strand: "+txName)
             # Start-1 converts from 1-based to 0-based
             transcripts[txName] = [line[0], int(line[3])-1, int(line[4]), txName, 0, line[6]]
-            # Parse the extra fields
-            if(extra!=['']):
-                for field in extra:
-                    extrainfo.setdefault(txName, dict())[field]=re.sub('.*'+field+' "?([^"]+)"?;.*', "\\1", line[8])
-                    # If no substitution occured, set the extra field to '.'
-                    if(extrainfo[txName][field] == line[8]): extrainfo[txName][field] = "."
-            if filterType!=[''] and filterKey not in extra:
-                extrainfo.setdefault(txName, dict())[filterKey]=re.sub('.*'+filterKey+' "?([^"]+)"?;.*', "\\1", line[8])
-                # If no substitution occured, set the extra field to '.'
-                if(extrainfo[txName][filterKey] == line[8]): extrainfo[txName][field] = "."
+            extrainfo[txName] = _extraInfo(line[8], extra, filterKey, filterType)
         # Parse exon lines
         if(line[2]=='exon'):
-            txName=re.sub('.*transcript_id "([^"]+)";.*', "\\1", line[8])
+            txName=_txName(line[8])
             if(line[6]!=transcripts[txName][5]):
                 raise BEDexception("Exon has different strand from parent transcript: "+txName)
             start=int(line[3])-1
@@ -39,10 +201,10 @@ def gtf2bed(gtf, extra=[''], filterKey="transcript_biotype", filterType=[''], tr
 
         # Start CDS, start and stop codons
         # Any of these features extends the CDS
-        if(line[2] in ['CDS', 'start_codon', 'stop_codon']):
-            txName=re.sub('.*transcript_id "([^"]+)";.*', "\\1", line[8])
+        if(line[2] in _cdsFeatures):
+            txName=_txName(line[8])
             if(line[6]!=transcripts[txName][5]):
-                raise BEDexception(("%s has different strand from parent transcript: %s" % line[2], txName))
+                raise BEDexception("%s has different strand from parent transcript: %s" % (line[2], txName))
             start=int(line[3])
             stop=int(line[4])
             if(txName not in cds.keys()):
@@ -52,41 +214,84 @@ def gtf2bed(gtf, extra=[''], filterKey="transcript_biotype", filterType=[''], tr
                 # the previous one, update cds.
                 if(start < cds[txName][0]): cds[txName][0] = start
                 if(stop > cds[txName][1]):cds[txName][1] = stop
-    gtf.close()
 
     for transcript in transcripts.keys():
-        if(filterType!=['']):
-            if extrainfo[transcript][filterKey] not in filterType:
-                continue
-        if(transcript in cds.keys()):
-            cdsStart=int(cds[transcript][0])-1
-            cdsEnd = int(cds[transcript][1])
+        out = _formatTranscript(transcripts[transcript], exons[transcript], cds.get(transcript), extrainfo[transcript], extra, filterKey, filterType)
+        if(out is not None):
+            yield out
+
+def _gtf2bedStream(gtf, extra, filterKey, filterType, transcript_feature_name, sort, tmpdir):
+    features=(transcript_feature_name, 'exon') + _cdsFeatures
+    if(sort):
+        from bedparse.extsort import externalSort
+        lines=(row for row in gtf if not row.startswith('#'))
+        # Only the relevant features need to be sorted
+        lines=(row for row in lines if row.split('\t', 3)[2] in features)
+        # The transcript line is placed before the other features of the transcript
+        def key(row):
+            row=row.split('\t', 9)
+            return (_txName(row[8]), row[2]!=transcript_feature_name)
+        gtf=externalSort(lines, key=key, tmpdir=tmpdir)
+
+    # Names of the transcripts of the current chromosome already reported, and the
+    # chromosomes already finished. The lines of each chromosome must be consecutive,
+    # so that memory usage is bounded by the largest chromosome rather than by the file.
+    # Sorted files are grouped by transcript by construction and aren't checked
+    done=set()
+    finished=set()
+    seqname=None
+    current=None
+    transcript=None
+    for line in _readGTF(gtf):
+        if(line[2] not in features):
+            continue
+        txName=_txName(line[8])
+        if(txName!=current):
+            # Check the grouping before reporting the previous transcript,
+            # which would be incomplete if the file isn't grouped
+            if(not sort):
+                if(line[0]!=seqname):
+                    if(line[0] in finished):
+                        raise BEDexception("The GTF file is not grouped by chromosome (%s appears in non consecutive lines). Use the sort option." % line[0])
+                    if(seqname is not None):
+                        finished.add(seqname)
+                    done.clear()
+                    seqname=line[0]
+                if(txName in done):
+                    raise BEDexception("The GTF file is not grouped by transcript (%s appears in non consecutive lines). Use the sort option." % txName)
+                done.add(txName)
+            # All the features of the current transcript have been read
+            if(transcript is not None):
+                out = _formatTranscript(transcript, exons, cds, extrainfo, extra, filterKey, filterType)
+                if(out is not None):
+                    yield out
+            current=txName
+            transcript=None
+            exons=[]
+            cds=None
+        if(line[2]==transcript_feature_name):
+            if(line[6]!="+" and line[6]!="-"):
+                raise BEDexception("Transcript with unrecognized strand: "+txName)
+            transcript=[line[0], int(line[3])-1, int(line[4]), txName, 0, line[6]]
+            extrainfo=_extraInfo(line[8], extra, filterKey, filterType)
+            continue
+        if(transcript is None):
+            raise BEDexception("%s found before its parent transcript: %s. The GTF file is not grouped by transcript, use the sort option." % (line[2], txName))
+        if(line[2]=='exon'):
+            if(line[6]!=transcript[5]):
+                raise BEDexception("Exon has different strand from parent transcript: "+txName)
+            exons.append([int(line[3])-1, int(line[4])-int(line[3])])
         else:
-            cdsStart=transcripts[transcript][2]
-            cdsEnd=transcripts[transcript][2]
-
-        transcripts[transcript].append(cdsStart)
-        transcripts[transcript].append(cdsEnd)
-        transcripts[transcript].append('0')
-        # Add the number of exons in field 10
-        transcripts[transcript].append(len(exons[transcript]))
-        # Sort the [start, length] pairs by start position
-        exons[transcript].sort(key=lambda x: x[0])
-        starts=""
-        lens=""
-        for exon in exons[transcript]:
-            starts=starts+str(exon[0]-int(transcripts[transcript][1]))+","
-            lens=lens+str(exon[1]+1)+","
-        transcripts[transcript].append(lens)
-        transcripts[transcript].append(starts)
-	# Convert to bedline for format validation
-        out=list()
-        bed = bedline(transcripts[transcript])
-        for key in bed._bedline__fields[:bed.bedType]:
-            if key=="exLengths": bed.exLengths+=","
-            if key=="exStarts": bed.exStarts+=","
-            out.append(bed.__dict__[key])
-        if(extra!=['']):
-            for field in extra:
-                out.append(extrainfo[bed.name][field])
-        print(*out, sep="\t")
+            if(line[6]!=transcript[5]):
+                raise BEDexception("%s has different strand from parent transcript: %s" % (line[2], txName))
+            start=int(line[3])
+            stop=int(line[4])
+            if(cds is None):
+                cds=[start, stop]
+            else:
+                if(start < cds[0]): cds[0] = start
+                if(stop > cds[1]): cds[1] = stop
+    if(transcript is not None):
+        out = _formatTranscript(transcript, exons, cds, extrainfo, extra, filterKey, filterType)
+        if(out is not None):
+            yield out
@@ -0,0 +1,69 @@
+from bisect import bisect_left
+from bedparse.intersect import _sortedRecords
+
+def _depths(events, chrom, depth, last, intervals):
+    # Applies sorted events (position*2+1 for block starts, position*2 for block ends)
+    # to the depth at position last, extending the last interval if it has the same depth
+    for event in events:
+        position=event>>1
+        if(position!=last):
+            if(depth > 0):
+                previous=intervals[-1] if intervals else None
+                if(previous is not None and previous[2]==last and previous[3]==depth and previous[0]==chrom):
+                    previous[2]=position
+                else:
+                    intervals.append([chrom, last, position, depth])
+            last=position
+        depth+=1 if event&1 else -1
+    return depth, last
+
+def coverage(lines, strand=None, batchSize=100000):
+    """ Computes the number of records covering each base of a sorted BED file
+
+    Only the exons of BED12 records are counted. The start and end of each block are
+    collected as events, which are sorted and summed in batches: since the records are
+    sorted by start, the events before the start of the next record are final. Only
+    the events of a batch and those of the blocks still open are held in memory.
+    The input must be sorted by chromosome and start (e.g. with :func:`bedparse.extsort.sortBed`).
+
+    Args:
+        lines (iterable): Lines of a sorted BED file (bytes)
+        strand (str): If "+" or "-", only count the records on that strand
+        batchSize (int): Number of records whose events are sorted at once
+    Returns:
+        generator: Tuples of chromosome (bytes), start, end and number of records (int), for the regions covered by at least one record. Adjacent regions always have different depths
+    """
+    strand=None if strand is None else strand.encode()
+    events=[]
+    records=0
+    chrom=None
+    depth=0
+    last=None
+    intervals=[]
+    for record in _sortedRecords(lines, "BED file"):
+        if(strand is not None and record.strand!=strand):
+            continue
+        if(record.chrom!=chrom or records >= batchSize):
+            events.sort()
+            if(record.chrom!=chrom):
+                cut=len(events)
+            else:
+                cut=bisect_left(events, record.start<<1)
+            depth, last = _depths(events[:cut], chrom, depth, last, intervals)
+            events=events[cut:]
+            records=0
+            if(record.chrom!=chrom):
+                chrom=record.chrom
+                last=None
+            # The last interval can still be extended by the next batch
+            for interval in intervals[:-1]:
+                yield tuple(interval)
+            intervals=intervals[-1:]
+        for start, end in record.blocks:
+            events.append((start<<1)|1)
+            events.append(end<<1)
+        records+=1
+    events.sort()
+    _depths(events, chrom, depth, last, intervals)
+    for interval in intervals:
+        yield tuple(interval)
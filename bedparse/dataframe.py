@@ -0,0 +1,267 @@
+from bedparse import BEDexception
+from bedparse import _kernels
+from bedparse.arrowio import columns, _extraNames
+
+# Columns that replace blockSizes and blockStarts in exploded DataFrames,
+# which have one row per exon block
+explodedColumns=["blockIndex", "blockSize", "blockStart"]
+
+def _numpy():
+    try:
+        import numpy
+        return numpy
+    except ImportError:
+        raise BEDexception("DataFrames require the numpy package (pip install bedparse[numpy])")
+
+def _library(name):
+    if(name!="pandas" and name!="polars"):
+        raise BEDexception("DataFrame library not supported: "+str(name)+". Use pandas or polars")
+    _numpy()
+    try:
+        import importlib
+        return importlib.import_module(name)
+    except ImportError:
+        raise BEDexception("The "+name+" package is not installed (pip install bedparse["+name+"])")
+
+def _libraryOf(df):
+    name=type(df).__module__.split('.')[0]
+    if(name!="pandas" and name!="polars"):
+        raise BEDexception("Not a pandas or Polars DataFrame: "+type(df).__name__)
+    return name
+
+def _fromColumns(bedType, values, offsets, extraColumns=None):
+    # Table of the columns returned by bedparse.tokenizer.tokenizeColumns
+    np=_numpy()
+    names=columns[:bedType]+_extraNames(len(values)-bedType, extraColumns)
+    data={}
+    for name, column in zip(names, values):
+        if(name in ("chromStart", "chromEnd", "thickStart", "thickEnd", "blockCount", "blockSizes", "blockStarts")):
+            data[name]=np.array(column, dtype=np.int64)
+        else:
+            data[name]=np.array([x.decode() for x in column], dtype=object)
+    if(offsets is not None):
+        offsets=np.array(offsets, dtype=np.int64)
+    return _kernels.bedcolumns(bedType, data, offsets, names[bedType:])
+
+def _listColumn(library, series):
+    # Lengths and concatenated values of a column of lists
+    np=_numpy()
+    if(library=="polars"):
+        return (series.list.len().to_numpy().astype(np.int64), series.explode().drop_nulls().to_numpy().astype(np.int64))
+    values=series.to_numpy()
+    counts=np.fromiter((len(x) for x in values), dtype=np.int64, count=len(values))
+    if(counts.sum()==0):
+        return (counts, np.zeros(0, dtype=np.int64))
+    return (counts, np.concatenate([np.asarray(x, dtype=np.int64) for x in values]))
+
+def _fromFrame(df):
+    # Table of a DataFrame with BED columns, and whether the blocks are exploded
+    np=_numpy()
+    library=_libraryOf(df)
+    names=[str(x) for x in df.columns]
+    exploded=all(x in names for x in explodedColumns)
+    bed=[x for x in columns if x in names]
+    if(exploded):
+        expected=columns[:10]
+    else:
+        expected=columns[:len(bed)] if len(bed) in (3, 4, 6, 12) else None
+    if(bed!=expected):
+        raise BEDexception("The DataFrame doesn't have the columns of a BED file: "+", ".join(names))
+    bedType=12 if exploded else len(bed)
+    extra=[x for x in names if x not in columns and x not in explodedColumns]
+    data={}
+    offsets=None
+    rows=slice(None)
+    if(exploded):
+        index=df["blockIndex"].to_numpy().astype(np.int64)
+        starts=np.flatnonzero(index==0)
+        offsets=np.append(starts, len(index)).astype(np.int64)
+        if(len(index) and (len(starts)==0 or starts[0]!=0 or (index!=np.arange(len(index))-np.repeat(starts, np.diff(offsets))).any())):
+            raise BEDexception("The blocks of each record must be in consecutive rows, with blockIndex starting from 0")
+        rows=starts
+        data["blockSizes"]=df["blockSize"].to_numpy().astype(np.int64)
+        data["blockStarts"]=df["blockStart"].to_numpy().astype(np.int64)
+    elif(bedType==12):
+        counts, data["blockSizes"] = _listColumn(library, df["blockSizes"])
+        startCounts, data["blockStarts"] = _listColumn(library, df["blockStarts"])
+        if((counts!=startCounts).any()):
+            raise BEDexception("blockSizes and blockStarts must have the same number of elements in each row")
+        offsets=np.concatenate(([0], np.cumsum(counts))).astype(np.int64)
+    for name in columns[:10 if bedType==12 else bedType]+extra:
+        values=df[name].to_numpy()[rows]
+        if(name in ("chromStart", "chromEnd", "thickStart", "thickEnd", "blockCount")):
+            data[name]=values.astype(np.int64)
+        else:
+            data[name]=values.astype(object)
+    if(bedType==12 and (data["blockCount"]!=np.diff(offsets)).any()):
+        raise BEDexception("blockCount doesn't match the number of blocks of some records")
+    return (_kernels.bedcolumns(bedType, data, offsets, extra), exploded)
+
+def _toFrame(table, library, explode=False):
+    np=_numpy()
+    module=_library(library)
+    data=table.data
+    out={}
+    if(table.bedType==12 and explode):
+        records=table.blockRecords()
+        for name in columns[:10]:
+            out[name]=data[name][records]
+        out["blockIndex"]=np.arange(len(records))-table.offsets[:-1][records]
+        out["blockSize"]=data["blockSizes"]
+        out["blockStart"]=data["blockStarts"]
+        for name in table.extra:
+            out[name]=data[name][records]
+    else:
+        for name in columns[:table.bedType]+table.extra:
+            out[name]=data[name]
+        if(table.bedType==12):
+            # Each list is a view of the concatenated blocks
+            split=table.offsets[1:-1]
+            out["blockSizes"]=np.split(data["blockSizes"], split) if len(table) else []
+            out["blockStarts"]=np.split(data["blockStarts"], split) if len(table) else []
+    if(library=="polars"):
+        listType=module.List(module.Int64)
+        return module.DataFrame([module.Series(name, values, dtype=listType if name in ("blockSizes", "blockStarts") and not explode else None) for name, values in out.items()])
+    for name in ("blockSizes", "blockStarts"):
+        if(name in out):
+            out[name]=module.Series(out[name], dtype=object)
+    return module.DataFrame(out, copy=False)
+
+def read_dataframe(path, library="pandas", explode=False):
+    """ Reads a BED file into a pandas or Polars DataFrame
+
+    The columns have the UCSC names used by :mod:`bedparse.arrowio`, and the columns
+    after the BED ones are kept (named extra1, extra2... for text files). Text files
+    can be compressed, and Arrow IPC and Parquet files (which require pyarrow) keep the
+    names of their columns. All the lines must have the same number of fields.
+
+    Args:
+        path (str): Path to the file, or - for stdin
+        library (str): pandas or polars
+        explode (bool): Report one row per exon block (with the columns blockIndex, blockSize and blockStart) instead of the list columns blockSizes and blockStarts
+    Returns:
+        DataFrame: The records
+    """
+    import os
+    from bedparse.compressed import openInput, detectFormat
+    from bedparse.tokenizer import tokenizeColumns
+    _library(library)
+    fmt=None
+    if(path!='-' and not os.path.isdir(path)):
+        with open(path, 'rb') as f:
+            fmt=detectFormat(f.read(16))
+    if(fmt=="arrow" or fmt=="parquet" or (path!='-' and os.path.isdir(path))):
+        from bedparse.arrowio import readTable
+        arrowTable=readTable(path)
+        names=arrowTable.schema.names
+        order=[x for x in columns if x in names]+[x for x in names if x not in columns]
+        arrowTable=arrowTable.select(order)
+        if(library=="polars"):
+            import polars
+            df=polars.from_arrow(arrowTable)
+        else:
+            df=arrowTable.to_pandas()
+        if(not explode):
+            return df
+        return _toFrame(_fromFrame(df)[0], library, explode)
+    with openInput(path) as f:
+        bedType, values, offsets = tokenizeColumns(f)
+    if(not values):
+        raise BEDexception(path+" doesn't contain any record")
+    return _toFrame(_fromColumns(bedType, values, offsets), library, explode)
+
+def to_dataframe(records, library="pandas", explode=False):
+    """ Converts BED records to a pandas or Polars DataFrame
+
+    Args:
+        records: A :class:`bedparse.bedbatch`, or an iterable of :class:`bedparse.bedline` objects. All the records must be of the same BED type
+        library (str): pandas or polars
+        explode (bool): Report one row per exon block. See :func:`read_dataframe`
+    Returns:
+        DataFrame: The records, with the columns of :func:`read_dataframe`
+    """
+    from bedparse.bedbatch import bedbatch
+    if(not isinstance(records, bedbatch)):
+        batch=bedbatch()
+        for record in records:
+            batch.append(record)
+        records=batch
+    return _toFrame(_kernels.fromBatch(records), library, explode)
+
+def from_dataframe(df):
+    """ Converts a pandas or Polars DataFrame with BED columns to a bedbatch
+
+    The DataFrame must have the columns of :func:`read_dataframe`, with the blocks either
+    as list columns or exploded. Other columns are ignored.
+
+    Args:
+        df (DataFrame): The records
+    Returns:
+        bedbatch: The records. See :class:`bedparse.bedbatch`
+    """
+    return _kernels.toBatch(_fromFrame(df)[0])
+
+def promoter(df, up=500, down=500, strand=True):
+    """ Returns the promoters of all the records of a DataFrame. See :meth:`bedparse.bedline.promoter`
+
+    Like the other DataFrame operations, it works on whole columns and gives the same
+    records as the :class:`bedparse.bedbatch` method, keeping the extra columns of each record.
+
+    Args:
+        df (DataFrame): pandas or Polars DataFrame with the columns of :func:`read_dataframe`
+        up (int): Number of upstream bases
+        down (int): Number of donwstream bases
+        strand (bool): If false strandedness is ignored
+    Returns:
+        DataFrame: The promoters as BED4 records, in a DataFrame of the same library
+    """
+    table, exploded = _fromFrame(df)
+    return _toFrame(_kernels.promoter(table, up, down, strand), _libraryOf(df), exploded)
+
+def utr(df, which=None):
+    """ Returns the UTRs of the coding transcripts of a DataFrame. See :meth:`bedparse.bedline.utr`
+
+    Args:
+        df (DataFrame): pandas or Polars DataFrame with the columns of :func:`read_dataframe`
+        which (int): Which UTR to return: 3 for 3'UTR or 5 for 5' UTR
+    Returns:
+        DataFrame: The UTRs as BED12 records, with the blocks in the same form as df
+    """
+    table, exploded = _fromFrame(df)
+    return _toFrame(_kernels.utr(table, which), _libraryOf(df), exploded)
+
+def cds(df, ignoreCDSonly=False):
+    """ Returns the CDS of the coding transcripts of a DataFrame. See :meth:`bedparse.bedline.cds`
+
+    Args:
+        df (DataFrame): pandas or Polars DataFrame with the columns of :func:`read_dataframe`
+        ignoreCDSonly (bool): If True skip transcripts that entirely consist of CDS
+    Returns:
+        DataFrame: The CDSs as BED12 records, with the blocks in the same form as df
+    """
+    table, exploded = _fromFrame(df)
+    return _toFrame(_kernels.cds(table, ignoreCDSonly), _libraryOf(df), exploded)
+
+def introns(df):
+    """ Returns the introns of the transcripts of a DataFrame. See :meth:`bedparse.bedline.introns`
+
+    Args:
+        df (DataFrame): pandas or Polars DataFrame with the columns of :func:`read_dataframe`
+    Returns:
+        DataFrame: The introns as BED12 records, with the blocks in the same form as df
+    """
+    table, exploded = _fromFrame(df)
+    return _toFrame(_kernels.introns(table), _libraryOf(df), exploded)
+
+def bed12tobed6(df, appendExN=False, whichExon="all"):
+    """ Returns the exons of the transcripts of a DataFrame. See :meth:`bedparse.bedline.bed12tobed6`
+
+    Args:
+        df (DataFrame): pandas or Polars DataFrame with the columns of :func:`read_dataframe`
+        appendExN (bool): Appends the exon number to the transcript name
+        whichExon (str): Which exon to return. One of ["all", "first", "last"].
+    Returns:
+        DataFrame: The exons as BED6 records
+    """
+    table, exploded = _fromFrame(df)
+    return _toFrame(_kernels.bed12tobed6(table, appendExN, whichExon), _libraryOf(df))
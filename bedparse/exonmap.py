@@ -0,0 +1,146 @@
+from array import array
+from bisect import bisect_right
+from itertools import accumulate
+from bedparse import BEDexception
+
+class exonmap(object):
+    """The exonmap class converts positions between transcript and genome coordinates
+
+    The genomic start and the cumulative length of the exons of the transcript are
+    computed once, when the object is created, and each position is then mapped with
+    a binary search on the exons. Use it instead of :meth:`bedparse.bedline.tx2genome`
+    and :meth:`bedparse.bedline.genome2tx` to map many positions on the same transcript.
+
+    Transcript coordinates are 0-based, and 0 is the leftmost base of the transcript
+    unless stranded is True, in which case it is the rightmost base of negative
+    strand transcripts.
+
+    Examples:
+        >>> tx = bedline(["chr1", 1000, 2000, "Tx1", 0, "+", 1000, 1000, 0, 2, "100,100,", "0,900,"])
+        >>> m = exonmap.fromBedline(tx)
+        >>> list(m.tx2genome([0, 99, 100, 150]))
+        [1000, 1099, 1900, 1950]
+        >>> list(m.genome2tx([1000, 1500, 1950]))
+        [0, -1, 150]
+    """
+    def __init__(self, start, exStarts, exLengths, strand="."):
+        """
+        :param start: Start of the transcript
+        :type start: int
+        :param exStarts: Start of each exon, relative to the start of the transcript
+        :type exStarts: list
+        :param exLengths: Length of each exon
+        :type exLengths: list
+        :param strand: Strand of the transcript
+        :type strand: str
+        """
+        if(len(exStarts)!=len(exLengths) or not exStarts):
+            raise BEDexception("The exon starts and lengths must be non-empty lists of the same length")
+        self.strand=strand
+        self.starts=array('q', [start+x for x in exStarts])
+        self.ends=array('q', [x+l for x, l in zip(self.starts, exLengths)])
+        self.cumulative=array('q', [0])
+        self.cumulative.extend(accumulate(exLengths))
+        self.length=self.cumulative[-1]
+
+    @classmethod
+    def fromBedline(cls, record):
+        """ Creates the exonmap of a bedline. BED3, BED4 and BED6 records are considered to have a single exon.
+
+        Args:
+            record (bedline): The transcript
+        Returns:
+            exonmap: The map of the transcript
+        """
+        strand=record.strand if record.stranded else "."
+        if(record.bedType < 12):
+            return cls(record.start, [0], [record.end-record.start], strand)
+        exStarts=[int(x) for x in record.exStarts.split(',') if x!='']
+        exLengths=[int(x) for x in record.exLengths.split(',') if x!='']
+        return cls(record.start, exStarts, exLengths, strand)
+
+    def _flip(self, stranded):
+        if(stranded and self.strand not in ("+", "-")):
+            raise BEDexception("The standed option only makes sense for stranded transcripts")
+        return stranded and self.strand=="-"
+
+    def tx2genome(self, coords, stranded=False):
+        """ Converts positions from transcript to genome coordinates
+
+        Args:
+            coords (iterable): Positions in transcript coordinates (int)
+            stranded (bool): If True use the rightmost base of negative strand trascripts as 0
+        Returns:
+            array: The positions in genome coordinates
+        """
+        flip=self._flip(stranded)
+        starts=self.starts
+        cumulative=self.cumulative
+        length=self.length
+        result=array('q')
+        for coord in coords:
+            if(flip):
+                coord=length-coord-1
+            if(coord<0 or coord>=length):
+                raise BEDexception("This coordinate doesn't exist in the transcript")
+            i=bisect_right(cumulative, coord)-1
+            result.append(starts[i]+coord-cumulative[i])
+        return result
+
+    def genome2tx(self, coords, stranded=False):
+        """ Converts positions from genome to transcript coordinates
+
+        Args:
+            coords (iterable): Positions in genome coordinates (int)
+            stranded (bool): If True use the rightmost base of negative strand trascripts as 0
+        Returns:
+            array: The positions in transcript coordinates, or -1 for positions outside the exons
+        """
+        flip=self._flip(stranded)
+        starts=self.starts
+        ends=self.ends
+        cumulative=self.cumulative
+        last=self.length-1
+        result=array('q')
+        for coord in coords:
+            i=bisect_right(starts, coord)-1
+            if(i<0 or coord>=ends[i]):
+                result.append(-1)
+            elif(flip):
+                result.append(last-(cumulative[i]+coord-starts[i]))
+            else:
+                result.append(cumulative[i]+coord-starts[i])
+        return result
+
+    def tx2genomeInterval(self, start, end, stranded=False):
+        """ Converts an interval from transcript to genome coordinates
+
+        The interval is split in blocks at the exon junctions, as in BED12 records.
+
+        Args:
+            start (int): Start of the interval in transcript coordinates (0-based)
+            end (int): End of the interval in transcript coordinates (not included)
+            stranded (bool): If True use the rightmost base of negative strand trascripts as 0
+        Returns:
+            tuple: Genomic start and end of the interval, and lists with the start of each block (relative to the start of the interval) and its length
+        Examples:
+            >>> exonmap(1000, [0, 900], [100, 100]).tx2genomeInterval(50, 150)
+            (1050, 1950, [0, 850], [50, 50])
+        """
+        if(self._flip(stranded)):
+            start, end = self.length-end, self.length-start
+        if(start<0 or end>self.length or end<=start):
+            raise BEDexception("This interval doesn't exist in the transcript")
+        starts=self.starts
+        cumulative=self.cumulative
+        first=bisect_right(cumulative, start)-1
+        last=bisect_right(cumulative, end-1)-1
+        genomeStart=starts[first]+start-cumulative[first]
+        blockStarts=[]
+        blockLengths=[]
+        for i in range(first, last+1):
+            blockStart=max(start, cumulative[i])
+            blockEnd=min(end, cumulative[i+1])
+            blockStarts.append(starts[i]+blockStart-cumulative[i]-genomeStart)
+            blockLengths.append(blockEnd-blockStart)
+        return (genomeStart, genomeStart+blockStarts[-1]+blockLengths[-1], blockStarts, blockLengths)
@@ -0,0 +1,166 @@
+import os
+import heapq
+import itertools
+import tempfile
+from bedparse import BEDexception
+from bedparse.parallel import _splitLines
+from bedparse.tokenizer import isHeader
+
+def _writeRun(lines, key, tmpdir):
+    # Sorts a list of lines and writes them to a temporary file
+    lines.sort(key=key)
+    run=tempfile.TemporaryFile(mode='w+', dir=tmpdir)
+    run.writelines(lines)
+    run.seek(0)
+    return run
+
+def externalSort(lines, key, maxLines=1000000, tmpdir=None):
+    """ Sorts the lines of a text file using a bounded amount of memory
+
+    The input is split in sorted runs of at most maxLines lines, which are written
+    to temporary files and then merged. The sort is stable, i.e. lines with the same
+    key are reported in their original order.
+
+    Args:
+        lines (iterable): Lines to sort, each terminated by a new line
+        key (function): Function computing the sort key of a line
+        maxLines (int): Maximum number of lines held in memory
+        tmpdir (str): Directory for the temporary files (defaults to the system temporary directory)
+    Returns:
+        generator: The sorted lines
+    """
+    runs=[]
+    lines=iter(lines)
+    try:
+        chunk=list(itertools.islice(lines, maxLines))
+        while chunk:
+            if(not chunk[-1].endswith('\n')):
+                chunk[-1]+='\n'
+            following=next(lines, None)
+            # If everything fits in memory skip the temporary files
+            if(following is None and not runs):
+                chunk.sort(key=key)
+                for line in chunk:
+                    yield line
+                return
+            runs.append(_writeRun(chunk, key, tmpdir))
+            chunk=[] if following is None else [following]
+            chunk.extend(itertools.islice(lines, maxLines-1))
+        for line in heapq.merge(*runs, key=key):
+            yield line
+    finally:
+        for run in runs:
+            run.close()
+
+def bedSortKey(line):
+    """ Sort key of a BED line: chromosome (in byte order), start and end
+
+    Comment, track and browser lines sort before all the records.
+
+    Args:
+        line (bytes): A line of a BED file
+    Returns:
+        tuple: The chromosome (bytes), start (int) and end (int)
+    """
+    if(isHeader(line)):
+        return (b'', -1, -1)
+    fields=line.split(b'\t', 3)
+    try:
+        return (fields[0], int(fields[1]), int(fields[2]))
+    except (IndexError, ValueError):
+        raise BEDexception("Line not valid: "+line.decode(errors='replace').rstrip())
+
+def _sortChunk(data):
+    # Sorts the lines of a chunk of a BED file, skipping empty lines
+    lines=[line for line in _splitLines(data) if line.strip()]
+    lines.sort(key=bedSortKey)
+    return lines
+
+def _sortRun(job):
+    # Sorts a chunk and writes it to a temporary file, whose name is returned.
+    # It runs in worker processes, so the file is not deleted when closed.
+    data, tmpdir = job
+    lines=_sortChunk(data)
+    with tempfile.NamedTemporaryFile(dir=tmpdir, prefix="bedparse", delete=False) as run:
+        run.write(b'\n'.join(lines)+b'\n')
+    return run.name
+
+def _readChunks(bedfile, size):
+    # Reads a binary file in chunks of about size bytes ending at the end of a line
+    while True:
+        data=bedfile.read(size)
+        if(not data):
+            break
+        if(not data.endswith(b'\n')):
+            data+=bedfile.readline()
+        yield data
+
+def _mergeRuns(names, tmpdir):
+    # Merges sorted runs into a new one
+    files=[open(name, 'rb') for name in names]
+    try:
+        with tempfile.NamedTemporaryFile(dir=tmpdir, prefix="bedparse", delete=False) as run:
+            run.writelines(heapq.merge(*files, key=bedSortKey))
+    finally:
+        for f in files:
+            f.close()
+        for name in names:
+            os.remove(name)
+    return run.name
+
+def sortBed(bedfile, memory=1<<30, threads=1, tmpdir=None, maxRuns=256):
+    """ Sorts a BED file by chromosome, start and end using a bounded amount of memory
+
+    The file is read in chunks that are sorted, possibly by several worker processes,
+    and written to temporary files (runs) that are then merged. If there are more than
+    maxRuns runs, groups of runs are merged first. Files that fit in a single chunk
+    are sorted in memory. Chromosomes are sorted in byte order and coordinates
+    numerically, as by LC_ALL=C sort -k1,1 -k2,2n -k3,3n. The sort is stable, and
+    comment, track and browser lines are reported first.
+
+    Args:
+        bedfile (file): BED file opened in binary mode
+        memory (int): Approximate memory budget, in bytes
+        threads (int): Number of worker processes sorting the chunks
+        tmpdir (str): Directory for the temporary files (defaults to the system temporary directory)
+        maxRuns (int): Maximum number of runs merged at once
+    Returns:
+        generator: The sorted lines (bytes), each terminated by a new line
+    """
+    # Sorting a list of lines in Python takes several times the size of its text,
+    # and each worker can have two chunks pending
+    chunkBytes=max(memory//(8*threads), 1<<16)
+    chunks=_readChunks(bedfile, chunkBytes)
+    first=next(chunks, b'')
+    second=next(chunks, None)
+    if(second is None):
+        for line in _sortChunk(first):
+            yield line+b'\n'
+        return
+    jobs=((chunk, tmpdir) for chunk in itertools.chain([first, second], chunks))
+    runs=[]
+    merged=[]
+    files=[]
+    try:
+        if(threads>1):
+            from bedparse.parallel import mapOrdered
+            names=mapOrdered(_sortRun, jobs, threads)
+        else:
+            names=map(_sortRun, jobs)
+        for name in names:
+            runs.append(name)
+        first=second=None
+        while(len(runs) > maxRuns):
+            while runs:
+                merged.append(_mergeRuns(runs[:maxRuns], tmpdir))
+                runs=runs[maxRuns:]
+            runs, merged = merged, []
+        files=[open(name, 'rb') for name in runs]
+        for line in heapq.merge(*files, key=bedSortKey):
+            yield line
+    finally:
+        for f in files:
+            f.close()
+        for name in runs+merged:
+            if(os.path.exists(name)):
+                os.remove(name)
@@ -0,0 +1,167 @@
+from bedparse import BEDexception
+from bedparse.tokenizer import _ints, isHeader
+
+class _record(object):
+    # Coordinates, strand and exon blocks of a BED line
+    __slots__=('line', 'fields', 'chrom', 'start', 'end', 'strand', 'blocks')
+
+    def __init__(self, line):
+        line=line.rstrip(b'\r\n')
+        fields=line.split(b'\t')
+        self.line=line
+        self.fields=fields
+        try:
+            self.chrom=fields[0]
+            self.start=int(fields[1])
+            self.end=int(fields[2])
+            self.strand=fields[5] if len(fields)>5 else b'.'
+            if(len(fields)>=12):
+                start=self.start
+                self.blocks=[(start+x, start+x+l) for x, l in zip(_ints(fields[11]), _ints(fields[10]))]
+            else:
+                # Records of length 0 (e.g. insertion sites) are considered 1 nt long
+                self.blocks=[(self.start, max(self.end, self.start+1))]
+        except (IndexError, ValueError):
+            raise BEDexception("Line not valid: "+line.decode(errors='replace'))
+        self.end=max(self.end, self.blocks[-1][1])
+
+def _records(lines):
+    for line in lines:
+        if(not isHeader(line)):
+            yield _record(line)
+
+def _sortedRecords(lines, what):
+    # Records of a file sorted by chromosome in byte order and start (e.g. by bedparse sort)
+    previous=None
+    for record in _records(lines):
+        if(previous is not None and (record.chrom, record.start) < previous):
+            raise BEDexception("The "+what+" is not sorted: "+record.line.decode(errors='replace')+" found after "+previous[0].decode()+":"+str(previous[1])+". Sort it with bedparse sort")
+        previous=(record.chrom, record.start)
+        yield record
+
+def _strandMatch(a, b, strand):
+    if(strand=="same"):
+        return a.strand==b.strand and a.strand!=b'.'
+    if(strand=="opposite"):
+        return (a.strand==b'+' and b.strand==b'-') or (a.strand==b'-' and b.strand==b'+')
+    return True
+
+def overlap(a, b):
+    """ Intersects the exon blocks of two records
+
+    Both lists must be sorted by start and each of them must not overlap itself,
+    as the blocks of BED12 records.
+
+    Args:
+        a (list): Blocks of the first record, as (start, end) tuples
+        b (list): Blocks of the second record, as (start, end) tuples
+    Returns:
+        list: The (start, end) intervals covered by both records, empty if they don't overlap
+    Examples:
+        >>> overlap([(100, 200), (300, 400)], [(150, 350)])
+        [(150, 200), (300, 350)]
+    """
+    if(len(a)==1 or len(b)==1):
+        if(len(a)==1):
+            a, b = b, a
+        start, end = b[0]
+        return [(max(x, start), min(y, end)) for x, y in a if x < end and y > start]
+    i=j=0
+    pieces=[]
+    while(i < len(a) and j < len(b)):
+        start=max(a[i][0], b[j][0])
+        end=min(a[i][1], b[j][1])
+        if(start < end):
+            pieces.append((start, end))
+        if(a[i][1] < b[j][1]):
+            i+=1
+        else:
+            j+=1
+    return pieces
+
+def _matches(record, candidates, strand):
+    matches=[]
+    for other in candidates:
+        if(other.start < record.end and other.end > record.start and _strandMatch(record, other, strand)):
+            pieces=overlap(record.blocks, other.blocks)
+            if(pieces):
+                matches.append((other, pieces))
+    return matches
+
+def sweepIntersect(a, b, strand=None):
+    """ Finds the overlaps between the records of two sorted BED files
+
+    Both files are read once, in parallel, and only the records of b that can
+    still overlap the following records of a are held in memory. BED12 records only
+    overlap in their exons. Both files must be sorted by chromosome (in byte order)
+    and start, as by :func:`bedparse.extsort.sortBed`.
+
+    Args:
+        a (iterable): Lines of the first BED file (bytes)
+        b (iterable): Lines of the second BED file (bytes)
+        strand (str): None to ignore the strand, "same" or "opposite" to require records on the same or on the opposite strand
+    Returns:
+        generator: For each record of a, the record and the list of (record of b, overlapping intervals) pairs, in the order of b. Records have the attributes line, fields, chrom, start, end, strand and blocks.
+    """
+    others=_sortedRecords(b, "file B")
+    following=next(others, None)
+    active=[]
+    chrom=None
+    for record in _sortedRecords(a, "file A"):
+        if(record.chrom!=chrom):
+            chrom=record.chrom
+            active=[]
+            while(following is not None and following.chrom < chrom):
+                following=next(others, None)
+        while(following is not None and following.chrom==chrom and following.start < record.end):
+            active.append(following)
+            following=next(others, None)
+        # Records of b ending before this record also end before all the following ones
+        active=[x for x in active if x.end > record.start]
+        yield (record, _matches(record, active, strand))
+    # The rest of b is read to check that it's sorted
+    for following in others:
+        pass
+
+def indexedIntersect(a, index, strand=None):
+    """ Finds the overlaps between the records of a BED file and an indexed BED file
+
+    Neither file needs to be sorted: the records overlapping each record of a are
+    retrieved from the index. BED12 records only overlap in their exons.
+
+    Args:
+        a (iterable): Lines of the first BED file (bytes)
+        index (bedindex): Index of the second BED file. See :class:`bedparse.bedindex`
+        strand (str): None to ignore the strand, "same" or "opposite" to require records on the same or on the opposite strand
+    Returns:
+        generator: For each record of a, the record and the list of (record of b, overlapping intervals) pairs, in the order of the second file. See :func:`sweepIntersect`
+    """
+    for record in _records(a):
+        candidates=[_record(line) for line in index.queryLines(record.chrom.decode(), record.start, record.end)]
+        yield (record, _matches(record, candidates, strand))
+
+def intersectionLines(record, pieces):
+    """ Formats the part of a record overlapping another one
+
+    BED12 records are reported as a single BED12 line whose blocks are the
+    overlapping intervals, with the thick part clipped to them. Other records are
+    reported as one line per interval, with the other fields unchanged.
+
+    Args:
+        record: A record returned by :func:`sweepIntersect` or :func:`indexedIntersect`
+        pieces (list): The overlapping intervals, as (start, end) tuples
+    Returns:
+        list: The lines (bytes, without line terminator)
+    """
+    fields=record.fields
+    if(len(fields)<12):
+        return [b'\t'.join([fields[0], b'%d' % start, b'%d' % end]+fields[3:]) for start, end in pieces]
+    start=pieces[0][0]
+    end=pieces[-1][1]
+    cdsStart=max(int(fields[6]), start)
+    cdsEnd=min(int(fields[7]), end)
+    if(cdsStart >= cdsEnd):
+        cdsStart=cdsEnd=start
+    lengths=b''.join([b'%d,' % (e-s) for s, e in pieces])
+    starts=b''.join([b'%d,' % (s-start) for s, e in pieces])
+    return [b'\t'.join(fields[:1]+[b'%d' % start, b'%d' % end]+fields[3:6]+[b'%d' % cdsStart, b'%d' % cdsEnd, fields[8], b'%d' % len(pieces), lengths, starts]+fields[12:])]
@@ -0,0 +1,262 @@
+import heapq
+import itertools
+from bedparse import BEDexception
+
+# Approximate memory used by each entry of the hash table, besides the key and the annotation
+_entryBytes=120
+# Number of records written to the temporary files at once
+_batchSize=10000
+# Maximum number of partitions of each new split of a partition larger than the
+# memory budget, and maximum number of times a partition is split again
+_maxSplit=16
+_maxLevels=3
+# Number of partition results merged in a single file, which bounds the open files
+_maxResults=32
+
+def readAnnotation(annotation, column, separator="\t"):
+    """ Reads the rows of an annotation file
+
+    Args:
+        annotation (file): Annotation file opened in text mode
+        column (int): Column of the joining key (0-based)
+        separator (str): Field separator
+    Returns:
+        generator: For each row, the key (bytes) and the other columns (bytes, each preceded by a tab)
+    """
+    import csv
+    for fields in csv.reader(annotation, delimiter=separator):
+        if(len(fields)<=column):
+            raise BEDexception("Some lines don't contain the annotation column")
+        yield (fields[column].encode(), ''.join("\t"+x for x in fields[:column]+fields[column+1:]).encode())
+
+def _add(table, key, value):
+    # Annotations are stored as bytes, and as a list only for keys with more than one row
+    previous=table.get(key)
+    if(previous is None):
+        table[key]=value
+    elif(isinstance(previous, list)):
+        previous.append(value)
+    else:
+        table[key]=[previous, value]
+
+def _matches(table, name):
+    value=table.get(name)
+    if(value is None):
+        return []
+    if(isinstance(value, list)):
+        return value
+    return [value]
+
+class _spillfile(object):
+    # Temporary file storing records in pickled batches
+    def __init__(self, tmpdir):
+        import tempfile
+        self.file=tempfile.TemporaryFile(dir=tmpdir)
+        self.batch=[]
+
+    def append(self, record):
+        self.batch.append(record)
+        if(len(self.batch) >= _batchSize):
+            self.flush()
+
+    def flush(self):
+        if(self.batch):
+            import pickle
+            pickle.dump(self.batch, self.file, protocol=pickle.HIGHEST_PROTOCOL)
+            self.batch=[]
+
+    def __iter__(self):
+        import pickle
+        self.flush()
+        self.file.seek(0)
+        while True:
+            try:
+                batch=pickle.load(self.file)
+            except EOFError:
+                return
+            for record in batch:
+                yield record
+
+    def close(self):
+        self.file.close()
+
+def _drain(table):
+    # Empties a hash table, returning its rows, so that they are freed as they are written
+    while(table):
+        key, values = table.popitem()
+        for value in ([values] if isinstance(values, bytes) else values):
+            yield (key, value)
+
+def _spill(records, level, partitions, tmpdir, files):
+    # Splits records whose first element is the key in partitions stored in temporary
+    # files, and returns them with the memory needed to load each in a hash table.
+    # The level is hashed with the key, so that each level splits the keys differently
+    parts=[_spillfile(tmpdir) for i in range(partitions)]
+    files.extend(parts)
+    sizes=[0]*partitions
+    for record in records:
+        i=hash((level, record[0])) % partitions
+        parts[i].append(record)
+        sizes[i]+=len(record[0] or b'')+len(record[-1])+_entryBytes
+    return (parts, sizes)
+
+def _scanJoin(annotationPart, linePart, memory, tmpdir, files):
+    # Joins a pair of partitions that can't be split further (nested scan): the
+    # annotation is loaded in chunks that fit in the memory budget (with at least
+    # one row each), and the BED lines are read once per chunk, adding the matches
+    # of each chunk after those of the previous ones
+    result=None
+    rows=iter(annotationPart)
+    more=True
+    while(more):
+        table=dict()
+        size=0
+        more=False
+        for key, value in rows:
+            _add(table, key, value)
+            size+=len(key)+len(value)+_entryBytes
+            if(size >= memory):
+                more=True
+                break
+        joined=_spillfile(tmpdir)
+        files.append(joined)
+        if(result is None):
+            for name, n, line in linePart:
+                joined.append((n, line, _matches(table, name)))
+        else:
+            for (name, n, line), (n, line, matches) in zip(linePart, result):
+                joined.append((n, line, matches+_matches(table, name)))
+            result.close()
+        result=joined
+    return result
+
+def _addResult(results, result, tmpdir, files):
+    # Adds the result of a partition to the list of results. When there are too
+    # many of them they are merged in a single file, to bound the open files
+    results.append(result)
+    if(len(results) >= _maxResults):
+        merged=_spillfile(tmpdir)
+        files.append(merged)
+        for record in heapq.merge(*results, key=lambda x: x[0]):
+            merged.append(record)
+        for part in results:
+            part.close()
+        results[:]=[merged]
+
+def _joinPartitions(annotationParts, sizes, lineParts, parentSize, memory, level, tmpdir, files, results):
+    # Joins each pair of partitions and adds the results, each in the order of the
+    # BED file, to results. Partitions larger than the memory budget are split again
+    # in as many partitions as needed to fit in the budget (at most _maxSplit) up to
+    # _maxLevels times. Those that can't be split further, because the previous split
+    # didn't reduce their size (i.e. they only contain one key) or the maximum level
+    # was reached, are joined with a nested scan
+    for annotationPart, size, linePart in zip(annotationParts, sizes, lineParts):
+        if(size > memory and size < parentSize and level < _maxLevels):
+            partitions=min(_maxSplit, 2*(size//max(memory, 1)+1))
+            subparts, subsizes = _spill(annotationPart, level+1, partitions, tmpdir, files)
+            annotationPart.close()
+            sublines=_spill(linePart, level+1, partitions, tmpdir, files)[0]
+            linePart.close()
+            _joinPartitions(subparts, subsizes, sublines, size, memory, level+1, tmpdir, files, results)
+            continue
+        if(size > memory):
+            result=_scanJoin(annotationPart, linePart, memory, tmpdir, files)
+        else:
+            table=dict()
+            for key, value in annotationPart:
+                _add(table, key, value)
+            result=_spillfile(tmpdir)
+            files.append(result)
+            for name, n, line in linePart:
+                result.append((n, line, _matches(table, name)))
+        annotationPart.close()
+        linePart.close()
+        _addResult(results, result, tmpdir, files)
+
+def hashJoin(lines, annotation, memory=1<<30, partitions=64, tmpdir=None):
+    """ Joins BED lines with annotation rows with a hash table
+
+    The annotation is loaded in a hash table and the BED lines are then streamed
+    through it. If the table grows beyond the memory budget, both inputs are split by
+    the hash of the key in partitions stored in temporary files, and each partition
+    is joined separately (grace hash join). Partitions that still don't fit in the
+    budget are split again, a limited number of times, and those that can't be split
+    further (e.g. the rows of a single key larger than the budget) are joined by reading
+    their BED lines once for each part of the annotation that fits in the budget. The
+    output is in the order of the BED lines in all cases, with the matching annotation
+    rows in the order of the file.
+
+    Args:
+        lines (iterable): Pairs of BED line and name (bytes, or None for lines without name), e.g. from :meth:`bedparse.reader.bedreader.column`
+        annotation (iterable): Pairs of key and annotation (bytes), e.g. from :func:`readAnnotation`
+        memory (int): Memory budget of the hash table, in bytes
+        partitions (int): Number of partitions of the first split, when the annotation doesn't fit in memory
+        tmpdir (str): Directory for the temporary files (defaults to the system temporary directory)
+    Returns:
+        generator: Pairs of BED line and list of the matching annotations
+    """
+    table=dict()
+    size=0
+    annotation=iter(annotation)
+    for key, value in annotation:
+        _add(table, key, value)
+        size+=len(key)+len(value)+_entryBytes
+        if(size > memory):
+            break
+    else:
+        for line, name in lines:
+            yield (line, _matches(table, name))
+        return
+
+    # The annotation doesn't fit in memory: partition both inputs on disk
+    files=[]
+    try:
+        annotationParts, sizes = _spill(itertools.chain(_drain(table), annotation), 0, partitions, tmpdir, files)
+        lineParts=_spill(((name, n, line) for n, (line, name) in enumerate(lines)), 0, partitions, tmpdir, files)[0]
+        results=[]
+        _joinPartitions(annotationParts, sizes, lineParts, float('inf'), memory, 0, tmpdir, files, results)
+        # Each partition is in the order of the BED file
+        for n, line, matches in heapq.merge(*results, key=lambda x: x[0]):
+            yield (line, matches)
+    finally:
+        for part in files:
+            part.close()
+
+def _checkSorted(records, what):
+    previous=None
+    for record in records:
+        if(previous is not None and record[0] is not None and record[0] < previous):
+            raise BEDexception("The "+what+" is not sorted by name: "+record[0].decode()+" found after "+previous.decode())
+        if(record[0] is not None):
+            previous=record[0]
+        yield record
+
+def mergeJoin(lines, annotation):
+    """ Joins BED lines with annotation rows sorted by name
+
+    Both inputs must be sorted by name in byte order (e.g. with LC_ALL=C sort).
+    Only the annotation rows of one name are held in memory at a time.
+
+    Args:
+        lines (iterable): Pairs of BED line and name (bytes, or None for lines without name), sorted by name
+        annotation (iterable): Pairs of key and annotation (bytes), sorted by key
+    Returns:
+        generator: Pairs of BED line and list of the matching annotations
+    """
+    annotation=_checkSorted(((key, value) for key, value in annotation), "annotation file")
+    current=next(annotation, None)
+    key=None
+    matches=[]
+    for name, line in _checkSorted(((name, line) for line, name in lines), "BED file"):
+        if(name is None):
+            yield (line, [])
+            continue
+        if(name!=key):
+            key=name
+            matches=[]
+            while(current is not None and current[0] < name):
+                current=next(annotation, None)
+            while(current is not None and current[0]==name):
+                matches.append(current[1])
+                current=next(annotation, None)
+        yield (line, matches)
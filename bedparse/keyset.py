@@ -0,0 +1,96 @@
+from bisect import bisect_right
+from bedparse import BEDexception
+
+class _sortedkeys(object):
+    # Sorted distinct keys, grouped in blocks of blockKeys keys each stored as a
+    # single bytes object with the keys separated by new lines. A lookup is a binary
+    # search on the first key of each block, followed by a substring search in
+    # the block. Uses a couple of bytes per key besides the keys themselves.
+    blockKeys=64
+
+    def __init__(self, keys):
+        keys=sorted(keys)
+        # Removing the duplicates from the sorted list needs less memory than a set
+        keys=[key for i, key in enumerate(keys) if i==0 or key!=keys[i-1]]
+        for key in keys:
+            if(b'\n' in key):
+                raise BEDexception("Keys can't contain new lines")
+        self.size=len(keys)
+        self.firsts=[keys[i] for i in range(0, len(keys), self.blockKeys)]
+        self.blocks=[b'\n'+b'\n'.join(keys[i:i+self.blockKeys])+b'\n' for i in range(0, len(keys), self.blockKeys)]
+
+    def __len__(self):
+        return self.size
+
+    def lookup(self):
+        # Returns the membership test function
+        firsts=self.firsts
+        blocks=self.blocks
+        def contains(key):
+            i=bisect_right(firsts, key)
+            return i > 0 and (b'\n'+key+b'\n') in blocks[i-1]
+        return contains
+
+class keyset(object):
+    """The keyset class is an immutable set of keys optimised for membership tests on large files
+
+    By default the keys are stored in a frozenset. For lists of many millions of keys,
+    compact=True stores them sorted in blocks of concatenated keys, which needs a
+    fraction of the memory but makes each lookup a binary search followed by a
+    substring search in a block, about twice as slow as the frozenset.
+
+    Examples:
+        >>> ids = keyset([b"ENST00000456328.2", b"ENST00000450305.2"])
+        >>> b"ENST00000456328.2" in ids
+        True
+        >>> ids.select([b"chr1\\t11868\\t14409\\tENST00000456328.2", b"chr1\\t11868\\t14409\\tENST00000488147.1"])
+        [b'chr1\\t11868\\t14409\\tENST00000456328.2']
+    """
+    def __init__(self, keys, compact=False):
+        """
+        :param keys: The keys
+        :type keys: iterable of bytes
+        :param compact: Store the keys in sorted blocks instead of a hash table
+        :type compact: bool
+        """
+        if(compact):
+            self.keys=_sortedkeys(keys)
+            self.__contains=self.keys.lookup()
+        else:
+            self.keys=frozenset(keys)
+            self.__contains=self.keys.__contains__
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __contains__(self, key):
+        return self.__contains(key)
+
+    def select(self, lines, column=3, inverse=False):
+        """ Selects the lines whose value in a column is in the set
+
+        Only the first column+1 fields of each line are split. Lines
+        with fewer columns are never selected (or always, if inverse is True).
+
+        Args:
+            lines (list): Lines (bytes, without line terminator)
+            column (int): Column to test (0-based, default 3 i.e. the BED name)
+            inverse (bool): Select the lines whose value is not in the set
+        Returns:
+            list: The selected lines, in the same order
+        """
+        contains=self.__contains
+        maxsplit=column+1
+        try:
+            if(inverse):
+                return [line for line in lines if not contains(line.split(b'\t', maxsplit)[column].rstrip())]
+            return [line for line in lines if contains(line.split(b'\t', maxsplit)[column].rstrip())]
+        except IndexError:
+            # Some lines have fewer columns
+            selected=[]
+            for line in lines:
+                fields=line.split(b'\t', maxsplit)
+                found=len(fields) > column and contains(fields[column].rstrip())
+                if(found != inverse):
+                    selected.append(line)
+            return selected
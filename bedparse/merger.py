@@ -0,0 +1,96 @@
+import heapq
+from bedparse import BEDexception
+from bedparse.tokenizer import isHeader
+
+def sortedRecords(lines):
+    """ Parses the coordinates, name and strand of the lines of a sorted BED file
+
+    Only the first six fields of each line are split. The lines must be sorted by
+    start within each chromosome, and all the lines of a chromosome must be
+    consecutive (e.g. the output of :func:`bedparse.extsort.sortBed`).
+
+    Args:
+        lines (iterable): Lines of a BED file (bytes)
+    Returns:
+        generator: Tuples of chromosome (bytes), start (int), end (int), name (bytes, or None for BED3) and strand (b"+", b"-" or b".")
+    """
+    seen=set()
+    chrom=None
+    previous=0
+    for line in lines:
+        if(isHeader(line)):
+            continue
+        fields=line.split(b'\t', 6)
+        try:
+            start=int(fields[1])
+            end=int(fields[2])
+        except (IndexError, ValueError):
+            raise BEDexception("Line not valid: "+line.decode(errors='replace').rstrip())
+        if(fields[0]!=chrom):
+            if(fields[0] in seen):
+                raise BEDexception("The BED file is not sorted: "+fields[0].decode()+" is not contiguous. Sort it with bedparse sort")
+            chrom=fields[0]
+            seen.add(chrom)
+        elif(start < previous):
+            raise BEDexception("The BED file is not sorted: "+line.decode(errors='replace').rstrip()+" found after start "+str(previous)+". Sort it with bedparse sort")
+        previous=start
+        n=len(fields)
+        strand=fields[5].rstrip() if n>5 else b'.'
+        yield (chrom, start, end, fields[3].rstrip() if n>3 else None, strand if strand==b'+' or strand==b'-' else b'.')
+
+def _unique(names):
+    # Distinct names in order of appearance
+    seen=set()
+    return [x for x in names if not (x in seen or seen.add(x))]
+
+def _close(closed, strand, interval):
+    heapq.heappush(closed, (interval[0], interval[1], strand, _unique(interval[2])))
+
+def mergeIntervals(lines, stranded=False, distance=0, names=False):
+    """ Merges the overlapping records of a sorted BED file
+
+    Records closer than distance are merged as well, so by default
+    book-ended records are merged. The merged intervals are reported sorted by
+    chromosome and start, and only the intervals that are still open are held in memory.
+
+    Args:
+        lines (iterable): Lines of a BED file sorted by chromosome and start (bytes)
+        stranded (bool): Only merge records on the same strand
+        distance (int): Maximum distance between records that are merged
+        names (bool): Collect the distinct names of the merged records
+    Returns:
+        generator: Tuples of chromosome (bytes), start (int), end (int), strand (b"+", b"-" or b"." if not stranded) and list of names (bytes, empty unless names is True)
+    """
+    # Open interval of each strand as [start, end, names], and closed intervals
+    # waiting for the open intervals that start before them
+    opened=dict()
+    closed=[]
+    chrom=None
+    for recordChrom, start, end, name, strand in sortedRecords(lines):
+        if(not stranded):
+            strand=b'.'
+        if(recordChrom!=chrom):
+            for key, interval in opened.items():
+                _close(closed, key, interval)
+            while closed:
+                yield (chrom,)+heapq.heappop(closed)
+            opened=dict()
+            chrom=recordChrom
+        interval=opened.get(strand)
+        if(interval is not None and start <= interval[1]+distance):
+            if(end > interval[1]):
+                interval[1]=end
+            if(names and name is not None):
+                interval[2].append(name)
+            continue
+        if(interval is not None):
+            _close(closed, strand, interval)
+        opened[strand]=[start, end, [name] if names and name is not None else []]
+        if(closed):
+            first=min(x[0] for x in opened.values())
+            while(closed and closed[0][0] <= first):
+                yield (chrom,)+heapq.heappop(closed)
+    for key, interval in opened.items():
+        _close(closed, key, interval)
+    while closed:
+        yield (chrom,)+heapq.heappop(closed)
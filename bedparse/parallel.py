@@ -0,0 +1,110 @@
+import os
+import itertools
+from collections import deque
+
+# Size of the chunks of input sent to each worker process
+chunkBytes=1<<22
+
+def _splitLines(data):
+    # Splits a chunk of a file into lines, without the terminators
+    lines=data.split(b'\n')
+    if(lines[-1]==b''):
+        lines.pop()
+    return lines
+
+def _lineRanges(path):
+    # Splits a file in byte ranges of roughly chunkBytes bytes,
+    # whose boundaries always coincide with the start of a line
+    size=chunkBytes
+    total=os.path.getsize(path)
+    start=0
+    with open(path, 'rb') as f:
+        while(start < total):
+            f.seek(min(start+size, total))
+            f.readline()
+            end=min(f.tell(), total)
+            yield (path, start, end)
+            start=end
+
+def _streamChunks(stream):
+    # Reads a non-seekable stream in chunks of roughly chunkBytes
+    # bytes, extending each chunk to the end of its last line
+    while True:
+        data=stream.read(chunkBytes)
+        if(not data):
+            break
+        if(not data.endswith(b'\n')):
+            data+=stream.readline()
+        yield data
+
+def _runChunk(job):
+    processor, options, chunk = job
+    if(isinstance(chunk, tuple)):
+        path, start, end = chunk
+        with open(path, 'rb') as f:
+            f.seek(start)
+            chunk=f.read(end-start)
+    return processor(_splitLines(chunk), options)
+
+def _isRegularFile(bedfile):
+    name=getattr(bedfile, 'name', None)
+    return isinstance(name, str) and os.path.isfile(name) and bedfile.seekable()
+
+def mapChunks(bedfile, processor, options, threads=1, lines=100000):
+    """ Applies a function to consecutive chunks of lines of a file
+
+    With more than one thread, the chunks are processed by a pool of worker
+    processes. Regular files are split into line-aligned byte ranges that each
+    worker reads on its own, while streams (e.g. stdin) are read by the main
+    process and sent to the workers. In both cases the results are returned in
+    the same order as the input, and at most two chunks per worker are held in
+    memory at any time.
+
+    Args:
+        bedfile (file): Input file opened in binary mode
+        processor (function): Top-level function taking a list of lines (bytes, without line terminator) and the options. It must return the output for those lines.
+        options (object): Any picklable object passed as second argument to processor
+        threads (int): Number of worker processes
+        lines (int): Number of lines per chunk when running on a single thread
+    Returns:
+        generator: The result of processor for each chunk, in the input order
+    """
+    if(threads<=1):
+        while True:
+            chunk=[line.rstrip(b'\n') for line in itertools.islice(bedfile, lines)]
+            if(not chunk):
+                break
+            yield processor(chunk, options)
+        return
+
+    if(_isRegularFile(bedfile)):
+        chunks=_lineRanges(bedfile.name)
+    else:
+        chunks=_streamChunks(bedfile)
+    jobs=((processor, options, chunk) for chunk in chunks)
+    for out in mapOrdered(_runChunk, jobs, threads):
+        yield out
+
+def mapOrdered(function, jobs, threads):
+    """ Applies a function to each job with a pool of worker processes
+
+    Jobs are submitted as they are consumed from the iterable, and at most two
+    jobs per worker are pending at any time.
+
+    Args:
+        function (function): Top-level function taking a job as its only argument
+        jobs (iterable): Picklable jobs
+        threads (int): Number of worker processes
+    Returns:
+        generator: The result of function for each job, in the same order as the jobs
+    """
+    # multiprocessing is slow to import, and only needed with more than one thread
+    from multiprocessing import Pool
+    with Pool(threads) as pool:
+        pending=deque()
+        for job in jobs:
+            pending.append(pool.apply_async(function, (job,)))
+            if(len(pending) >= 2*threads):
+                yield pending.popleft().get()
+        while pending:
+            yield pending.popleft().get()
@@ -0,0 +1,92 @@
+import mmap
+from bedparse.parallel import _isRegularFile, _splitLines, _streamChunks
+
+# Size of the blocks of a memory mapped file that are split into lines at once
+blockBytes=1<<22
+
+class bedreader(object):
+    """The bedreader class reads the lines of a BED file as bytes, without decoding them
+
+    Regular files are memory mapped and split into lines in large blocks, which avoids
+    the per-line buffering of file objects. Streams (e.g. stdin) are read in blocks as well.
+    :meth:`column` only extracts the field that the caller needs, without splitting
+    the rest of the line.
+
+    Examples:
+        >>> with bedreader(open("transcripts.bed", "rb")) as reader:
+        ...     for line, name in reader.column(3):
+        ...         print(name)
+    """
+    def __init__(self, bedfile):
+        """
+        :param bedfile: BED file opened in binary mode
+        :type bedfile: file
+        """
+        self.bedfile=bedfile
+        self.data=None
+        if(_isRegularFile(bedfile) and bedfile.seek(0, 2)>0):
+            self.data=mmap.mmap(bedfile.fileno(), 0, access=mmap.ACCESS_READ)
+        elif(bedfile.seekable()):
+            bedfile.seek(0)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def close(self):
+        """ Closes the reader and the underlying file
+        """
+        if(self.data is not None):
+            self.data.close()
+            self.data=None
+        self.bedfile.close()
+
+    def blocks(self):
+        """ Iterates over the file in blocks of lines
+
+        Returns:
+            generator: Lists of lines (bytes, without the line terminator)
+        """
+        if(self.data is None):
+            for chunk in _streamChunks(self.bedfile):
+                yield _splitLines(chunk)
+            return
+        data=self.data
+        size=len(data)
+        start=0
+        while(start < size):
+            end=data.find(b'\n', min(start+blockBytes, size)-1)
+            end=size if end==-1 else end+1
+            yield _splitLines(data[start:end])
+            start=end
+
+    def __iter__(self):
+        """ Iterates over the lines of the file
+
+        Returns:
+            generator: The lines (bytes), without the line terminator
+        """
+        for lines in self.blocks():
+            for line in lines:
+                yield line
+
+    def column(self, n):
+        """ Iterates over the lines of the file and one of their columns
+
+        Args:
+            n (int): Column to extract (0-based)
+        Returns:
+            generator: Pairs of line (bytes, without the line terminator) and content of column n (bytes without trailing whitespace, or None if the line has fewer columns)
+        """
+        for lines in self.blocks():
+            for line in lines:
+                fields=line.split(b'\t', n+1)
+                if(len(fields) > n+1):
+                    yield (line, fields[n])
+                elif(len(fields) == n+1):
+                    yield (line, fields[n].rstrip())
+                else:
+                    yield (line, None)
@@ -0,0 +1,133 @@
+from array import array
+from bedparse import BEDexception
+from bedparse.bedline import bedline
+
+_strands = frozenset((b"+", b"-", b".", b""))
+
+def _ints(field):
+    # Converts the content of fields 11 or 12 into a list of int
+    if(field.endswith(b",")):
+        field=field[:-1]
+    return list(map(int, field.split(b",")))
+
+def tokenize(line):
+    """ Splits and validates a BED[3,4,6,12] line
+
+    All the integer fields are converted in a single pass, without the regular
+    expressions and the per-field checks used by :class:`bedparse.bedline`.
+    If the line is not valid, it is handed to bedline, so that the exception
+    raised is exactly the same that bedline would raise.
+
+    Args:
+        line (bytes): A line of a BED file
+    Returns:
+        list: The fields of the line. Start, end, thickStart, thickEnd and the number of exons are converted to int,
+        exon lengths and starts to lists of int, and the other fields are left as bytes.
+    Examples:
+        >>> tokenize(b"chr1\\t100\\t420\\tName\\t0\\t+\\t210\\t310\\t0\\t2\\t20,20,\\t0,300,\\n")
+        [b'chr1', 100, 420, b'Name', b'0', b'+', 210, 310, b'0', 2, [20, 20], [0, 300]]
+    """
+    fields=line.split(b"\t")
+    bedType=len(fields)
+    fields[bedType-1]=fields[bedType-1].rstrip()
+    try:
+        if(bedType==12):
+            chrom, start, end, name, score, strand, cdsStart, cdsEnd, color, nEx, exLengths, exStarts = fields
+            start=int(start)
+            end=int(end)
+            cdsStart=int(cdsStart)
+            cdsEnd=int(cdsEnd)
+            nEx=int(nEx)
+            exLengths=_ints(exLengths)
+            exStarts=_ints(exStarts)
+            if(start<=end and strand in _strands and start<=cdsStart<=cdsEnd<=end and
+               len(exLengths)==nEx and len(exStarts)==nEx):
+                return [chrom, start, end, name, score, strand, cdsStart, cdsEnd, color, nEx, exLengths, exStarts]
+        elif(bedType==6 or bedType==4 or bedType==3):
+            fields[1]=int(fields[1])
+            fields[2]=int(fields[2])
+            if(fields[1]<=fields[2] and (bedType<6 or fields[5] in _strands)):
+                return fields
+    except ValueError:
+        pass
+    return _tokenizeSlow(fields)
+
+def _tokenizeSlow(fields):
+    # Validates the line with bedline. This either raises the
+    # appropriate BEDexception or returns the fields parsed by bedline
+    # (e.g. for numbers that int() only accepts as str)
+    record=bedline([x.decode() if isinstance(x, bytes) else x for x in fields])
+    if(record.bedType==12):
+        out=[record.__dict__[key] for key in record._bedline__fields[:12]]
+        out[10]=[int(x) for x in record.exLengths.split(",")]
+        out[11]=[int(x) for x in record.exStarts.split(",")]
+    else:
+        out=[record.__dict__[key] for key in record._bedline__fields[:record.bedType]]
+    return [x.encode() if isinstance(x, str) else x for x in out]
+
+def isHeader(line):
+    """ Tells whether a line of a BED file is a comment, track, browser or empty line
+
+    These lines are skipped by all the sub-commands, even if their fields look like coordinates.
+
+    Args:
+        line (bytes): A line of a BED file
+    Returns:
+        bool: True if the line isn't a BED record
+    Examples:
+        >>> isHeader(b"track name=genes")
+        True
+        >>> isHeader(b"#chr1\t100\t420")
+        True
+        >>> isHeader(b"chr1\t100\t420")
+        False
+    """
+    return line.startswith((b'#', b'track', b'browser')) or line.strip()==b''
+
+def tokenizeColumns(lines):
+    """ Splits and validates BED lines into columns
+
+    The BED fields of each line are validated as by :func:`tokenize`. All the lines must
+    have the same number of fields, and the fields after the largest BED type (3, 4, 6
+    or 12) that fits in the lines, such as the extra fields of gtf2bed, are kept as bytes.
+    Comment, track and browser lines are skipped.
+
+    Args:
+        lines (iterable): Lines of a BED file (bytes)
+    Returns:
+        tuple: The BED type, the list of columns (one list of values per field) and, for BED12 lines,
+        an array with the offsets of the blocks of each line (None otherwise). Columns 11 and 12 of
+        BED12 lines hold the exon lengths and starts of all the lines concatenated.
+    Examples:
+        >>> tokenizeColumns([b"chr1\\t100\\t420\\tName\\tgene1", b"chr2\\t10\\t20\\tOther\\tgene2"])
+        (4, [[b'chr1', b'chr2'], [100, 10], [420, 20], [b'Name', b'Other'], [b'gene1', b'gene2']], None)
+    """
+    columns=None
+    offsets=None
+    for line in lines:
+        if(isHeader(line)):
+            continue
+        fields=line.rstrip(b'\r\n').split(b'\t')
+        if(columns is None):
+            nFields=len(fields)
+            bedType=max([n for n in (3, 4, 6, 12) if n<=nFields] or [nFields])
+            columns=[[] for i in range(nFields)]
+            if(bedType==12):
+                offsets=array('q', [0])
+        elif(len(fields)!=nFields):
+            raise BEDexception("All the lines must have the same number of fields: "+line.decode(errors='replace').rstrip())
+        parsed=tokenize(b'\t'.join(fields[:bedType]) if nFields > bedType else line)
+        if(bedType==12):
+            for i in range(10):
+                columns[i].append(parsed[i])
+            columns[10].extend(parsed[10])
+            columns[11].extend(parsed[11])
+            offsets.append(len(columns[10]))
+        else:
+            for i in range(bedType):
+                columns[i].append(parsed[i])
+        for i in range(bedType, nFields):
+            columns[i].append(fields[i])
+    if(columns is None):
+        return (0, [], None)
+    return (bedType, columns, offsets)
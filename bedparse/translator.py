@@ -0,0 +1,117 @@
+from types import MappingProxyType
+from bedparse import BEDexception
+from bedparse.chromalias import isRegistered, aliasTable
+
+# Translators already built, by (assembly, target, patches)
+_translators=dict()
+
+class chrtranslator(object):
+    """The chrtranslator class converts chromosome names between naming conventions
+
+    The tables of hg38 and mm10 (UCSC and Ensembl conventions) are distributed with bedparse.
+    Other assemblies, and other conventions such as GenBank or RefSeq accessions, can be added
+    with :func:`bedparse.chromalias.registerAssembly`. Registered assemblies take precedence
+    over the built-in ones, and for them the patches option has no effect, since
+    alias files list all the sequences of the assembly.
+
+    The conversion table is built once, when the object is created, and can't be
+    modified afterwards, so the same translator can be safely shared by any number
+    of records and calls. Use :func:`getTranslator` to reuse the translators already built.
+
+    Examples:
+        >>> translator = chrtranslator("hg38", "ens")
+        >>> translator.translate("chr1")
+        '1'
+        >>> translator.translateNames(["chr1", "chrM", "chr1"])
+        ['1', 'MT', '1']
+    """
+    __slots__ = ("assembly", "target", "patches", "table")
+    def __init__(self, assembly, target, patches=False):
+        """
+        :param assembly: Assembly (hg38, mm10 or a registered assembly)
+        :type assembly: str
+        :param target: Desidered chromosome name convention (ucsc or ens, or any convention of a registered assembly)
+        :type target: str
+        :param patches: Also convert the contigs added by patches (up to p11 for hg38 and p4 for mm10)
+        :type patches: bool
+        """
+        if(isRegistered(assembly)):
+            table=aliasTable(assembly, target)
+        else:
+            table=_builtinTable(assembly, target, patches)
+        object.__setattr__(self, "assembly", assembly)
+        object.__setattr__(self, "target", target)
+        object.__setattr__(self, "patches", bool(patches))
+        object.__setattr__(self, "table", MappingProxyType(table))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("chrtranslator objects are immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError("chrtranslator objects are immutable")
+
+    def __reduce__(self):
+        return (getTranslator, (self.assembly, self.target, self.patches))
+
+    def __contains__(self, name):
+        return name in self.table
+
+    def translate(self, name):
+        """ Converts a chromosome name
+
+        Args:
+            name (str): The chromosome name
+        Returns:
+            str: The converted name, or None if the chromosome is not known
+        """
+        return self.table.get(name)
+
+    def translateNames(self, names):
+        """ Converts a list of chromosome names
+
+        Each distinct name is only looked up once.
+
+        Args:
+            names (iterable): The chromosome names
+        Returns:
+            list: The converted names, with None for unknown chromosomes
+        """
+        names=list(names)
+        table=self.table
+        converted={name: table.get(name) for name in set(names)}
+        return [converted[name] for name in names]
+
+def _builtinTable(assembly, target, patches):
+    # The tables of hg38 and mm10 distributed with bedparse.
+    # They are only imported when needed
+    if(assembly not in ("hg38", "mm10")):
+        raise BEDexception("The specified assembly is not supported")
+    if(target not in ("ucsc", "ens")):
+        raise BEDexception("The specified target naming convention is not supported")
+    from bedparse import chrnames
+    if(target=="ucsc"):
+        direction="ensembl2ucsc"
+    else:
+        direction="ucsc2ensembl"
+    table=dict(getattr(chrnames, assembly+"_"+direction))
+    if(patches):
+        table.update(getattr(chrnames, assembly+"_"+direction+"_patches"))
+    return table
+
+def getTranslator(assembly, target, patches=False):
+    """ Returns the translator for an assembly and naming convention
+
+    Translators are built on first use and then shared.
+
+    Args:
+        assembly (str): Assembly (hg38, mm10 or a registered assembly)
+        target (str): Desidered chromosome name convention
+        patches (bool): Also convert the contigs added by patches
+    Returns:
+        chrtranslator: The translator
+    """
+    key=(assembly, target, bool(patches))
+    translator=_translators.get(key)
+    if(translator is None):
+        translator=_translators[key]=chrtranslator(assembly, target, patches)
+    return translator
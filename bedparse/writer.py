@@ -0,0 +1,112 @@
+import sys
+
+def formatFields(fields, end='\n'):
+    """ Formats the fields of a BED record as a line of text
+
+    Lists of exon starts or lengths are joined with commas, and a trailing comma is added.
+
+    Args:
+        fields (list): The fields of the record
+        end (str): Line terminator
+    Returns:
+        str: The formatted line
+    """
+    out=[]
+    for field in fields:
+        if(isinstance(field, bytes)):
+            out.append(field.decode())
+        elif(isinstance(field, str)):
+            out.append(field)
+        elif(isinstance(field, (list, tuple, memoryview))):
+            out.append(''.join(str(x)+"," for x in field))
+        else:
+            out.append(str(field))
+    return '\t'.join(out)+end
+
+def formatRecord(record, end='\n'):
+    """ Formats a bedline or compactbedline object as a line of text
+
+    Unlike :meth:`bedparse.bedline.print`, the record is never modified.
+
+    Args:
+        record (bedline): The record to format
+        end (str): Line terminator
+    Returns:
+        str: The formatted line
+    """
+    if(hasattr(record, 'fields')):
+        fields=record.fields()
+    else:
+        fields=[record.__dict__[key] for key in record._bedline__fields[:record.bedType]]
+        if(record.bedType==12):
+            fields[10]+=","
+            fields[11]+=","
+    return formatFields(fields, end=end)
+
+class bedwriter(object):
+    """The bedwriter class collects formatted records in a buffer and writes them in large blocks
+
+    It writes to the binary buffer of the output stream (by default stdout) when available.
+    It can be used as a context manager, in which case it is flushed on exit.
+    """
+    def __init__(self, stream=None, bufferSize=1<<20):
+        """
+        :param stream: Output stream (defaults to sys.stdout)
+        :param bufferSize: Number of characters to buffer before writing
+        """
+        if(stream is None):
+            stream=sys.stdout
+        self.stream=getattr(stream, 'buffer', stream)
+        self.binary=(self.stream is not stream) or not hasattr(stream, 'encoding')
+        self.bufferSize=bufferSize
+        self.buffer=[]
+        self.size=0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.flush()
+        return False
+
+    def writeText(self, text):
+        """ Writes already formatted text (str or bytes)
+
+        Args:
+            text (str): The text to write
+        """
+        self.buffer.append(text)
+        self.size+=len(text)
+        if(self.size >= self.bufferSize):
+            self.flush()
+
+    def writeFields(self, fields, end='\n'):
+        """ Writes a record given as a list of fields. See :func:`formatFields`
+        """
+        self.writeText(formatFields(fields, end=end))
+
+    def write(self, record, end='\n'):
+        """ Writes a record
+
+        Args:
+            record: A bedline, compactbedline or bedbatch object
+            end (str): Line terminator
+        """
+        if(hasattr(record, 'format')):
+            self.writeText(record.format(end=end))
+        else:
+            self.writeText(formatRecord(record, end=end))
+
+    def flush(self):
+        """ Writes the content of the buffer to the output stream
+        """
+        if(not self.buffer):
+            return
+        if(self.binary):
+            data=b''.join(x if isinstance(x, bytes) else x.encode() for x in self.buffer)
+        else:
+            data=''.join(x if isinstance(x, str) else x.decode() for x in self.buffer)
+        self.buffer=[]
+        self.size=0
+        self.stream.write(data)
+        self.stream.flush()
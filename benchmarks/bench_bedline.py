@@ -0,0 +1,77 @@
+""" Benchmarks of the bedline methods and of gtf2bed """
+import io
+import pytest
+import bedparse
+
+@pytest.fixture(scope="session")
+def fields(bedfile):
+    """ The fields of each line of the BED file """
+    with open(bedfile) as f:
+        return [line.rstrip("\n").split("\t") for line in f]
+
+@pytest.fixture(scope="session")
+def transcripts(fields):
+    """ A bedline object for each line of the BED file """
+    return [bedparse.bedline(x) for x in fields]
+
+@pytest.mark.benchmark(group="bedline")
+def test_bedline(benchmark, fields):
+    benchmark(lambda: [bedparse.bedline(x) for x in fields])
+
+@pytest.mark.benchmark(group="bedline")
+def test_promoter(benchmark, transcripts):
+    benchmark(lambda: [tx.promoter() for tx in transcripts])
+
+@pytest.mark.benchmark(group="bedline")
+@pytest.mark.parametrize("which", [5, 3])
+def test_utr(benchmark, transcripts, which):
+    benchmark(lambda: [tx.utr(which=which) for tx in transcripts])
+
+@pytest.mark.benchmark(group="bedline")
+def test_cds(benchmark, transcripts):
+    benchmark(lambda: [tx.cds() for tx in transcripts])
+
+@pytest.mark.benchmark(group="bedline")
+def test_introns(benchmark, transcripts):
+    benchmark(lambda: [tx.introns() for tx in transcripts])
+
+@pytest.mark.benchmark(group="bedline")
+def test_tx2genome(benchmark, transcripts):
+    # Middle of each transcript
+    queries=[(tx, sum(int(x) for x in tx.exLengths.rstrip(",").split(","))//2) for tx in transcripts]
+    benchmark(lambda: [tx.tx2genome(coord) for tx, coord in queries])
+
+@pytest.mark.benchmark(group="bedline")
+def test_exonmap(benchmark, transcripts):
+    # Every tenth base of each transcript, mapped to the genome and back
+    def convert():
+        for tx in transcripts:
+            exons=bedparse.exonmap.fromBedline(tx)
+            exons.genome2tx(exons.tx2genome(range(0, exons.length, 10)))
+    benchmark(convert)
+
+@pytest.mark.benchmark(group="bedline")
+def test_bed12tobed6(benchmark, transcripts):
+    benchmark(lambda: [tx.bed12tobed6(appendExN=True) for tx in transcripts])
+
+@pytest.mark.benchmark(group="bedline")
+def test_translateChr(benchmark, transcripts):
+    benchmark(lambda: [tx.translateChr(assembly="hg38", target="ens") for tx in transcripts])
+
+@pytest.mark.benchmark(group="dataframe")
+@pytest.mark.parametrize("operation", ["promoter", "utr", "cds", "introns", "bed12tobed6"])
+def test_dataframe(benchmark, bedfile, operation):
+    pytest.importorskip("pandas")
+    from bedparse import dataframe
+    df=bedparse.read_dataframe(bedfile)
+    args=(3,) if operation=="utr" else ()
+    benchmark(getattr(dataframe, operation), df, *args)
+
+@pytest.mark.benchmark(group="gtf2bed")
+@pytest.mark.parametrize("stream", [False, True])
+def test_gtf2bed(benchmark, gtffile, stream):
+    def convert():
+        output=io.BytesIO()
+        with open(gtffile) as gtf:
+            bedparse.gtf2bed(gtf, extra=["gene_id"], stream=stream, output=output)
+    benchmark.pedantic(convert, rounds=3, iterations=1)
@@ -0,0 +1,95 @@
+""" End to end benchmarks of the command line tool
+
+Each sub-command runs in a new interpreter, as it does in a pipeline,
+so the times include the startup of bedparse.
+"""
+import os
+import subprocess
+import sys
+import pytest
+import generators
+
+root=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def bedparse(*args):
+    env=dict(os.environ)
+    env["PYTHONPATH"]=root+os.pathsep+env.get("PYTHONPATH", "")
+    with open(os.devnull, "wb") as devnull:
+        subprocess.run([sys.executable, "-m", "bedparse.bedparse"]+[str(x) for x in args], stdout=devnull, env=env, check=True)
+
+def run(benchmark, *args):
+    benchmark.pedantic(bedparse, args=args, rounds=3, iterations=1)
+
+@pytest.mark.benchmark(group="cli")
+@pytest.mark.parametrize("subcommand", ["3pUTR", "5pUTR", "cds", "promoter", "introns", "bed12tobed6", "validateFormat"])
+def test_transcripts(benchmark, bedfile, subcommand):
+    run(benchmark, subcommand, bedfile)
+
+@pytest.mark.benchmark(group="cli")
+def test_convertChr(benchmark, bedfile):
+    run(benchmark, "convertChr", "--assembly", "hg38", "--target", "ens", bedfile)
+
+@pytest.mark.benchmark(group="cli")
+def test_filter(benchmark, bedfile, annotation):
+    run(benchmark, "filter", "--annotation", annotation, "--column", 2, bedfile)
+
+@pytest.mark.benchmark(group="cli")
+def test_join(benchmark, bedfile, annotation):
+    run(benchmark, "join", "--annotation", annotation, "--column", 2, bedfile)
+
+@pytest.mark.benchmark(group="cli")
+def test_tx2genome(benchmark, bedfile, intervals):
+    run(benchmark, "tx2genome", "--transcripts", bedfile, intervals)
+
+@pytest.mark.benchmark(group="cli")
+def test_gtf2bed(benchmark, gtffile):
+    run(benchmark, "gtf2bed", "--extraFields", "gene_id,gene_name", gtffile)
+
+@pytest.mark.benchmark(group="cli")
+def test_sort(benchmark, bedfile):
+    run(benchmark, "sort", bedfile)
+
+@pytest.mark.benchmark(group="cli")
+def test_merge(benchmark, bedfile, tmp_path):
+    sortedfile=str(tmp_path / "sorted.bed")
+    bedparse("sort", "-o", sortedfile, bedfile)
+    run(benchmark, "merge", "--stranded", "--names", sortedfile)
+
+@pytest.mark.benchmark(group="cli")
+@pytest.mark.parametrize("mode", ["--sorted", "--index"])
+def test_intersect(benchmark, bedfile, tmp_path, mode):
+    sortedfile=str(tmp_path / "sorted.bed")
+    bedparse("sort", "-o", sortedfile, bedfile)
+    if(mode=="--index"):
+        bedparse("index", sortedfile)
+        run(benchmark, "intersect", "-a", bedfile, "-b", sortedfile, "-wa", "-wb")
+    else:
+        run(benchmark, "intersect", "--sorted", "-a", sortedfile, "-b", sortedfile, "-wa", "-wb")
+
+@pytest.mark.benchmark(group="cli")
+def test_closest(benchmark, bedfile, records, datadir):
+    queries=generators.writeFile(os.path.join(str(datadir), "%d.queries.bed" % records), generators.bedLines(records, 4, seed=1))
+    run(benchmark, "closest", "--reference", bedfile, queries)
+
+@pytest.mark.benchmark(group="cli")
+def test_coverage(benchmark, bedfile, tmp_path):
+    sortedfile=str(tmp_path / "sorted.bed")
+    bedparse("sort", "-o", sortedfile, bedfile)
+    run(benchmark, "coverage", sortedfile)
+
+@pytest.mark.benchmark(group="cli")
+@pytest.mark.parametrize("extension", ["arrow", "parquet"])
+def test_columnar(benchmark, bedfile, tmp_path, extension):
+    pytest.importorskip("pyarrow")
+    table=str(tmp_path / ("transcripts."+extension))
+    bedparse("sort", "-o", table, bedfile)
+    run(benchmark, "promoter", table)
+
+@pytest.mark.benchmark(group="cli")
+def test_index(benchmark, bedfile):
+    run(benchmark, "index", bedfile)
+
+@pytest.mark.benchmark(group="cli")
+def test_query(benchmark, bedfile):
+    bedparse("index", bedfile)
+    run(benchmark, "query", bedfile, "chr1", "chr2:1000000-50000000", "chrX:100000000")
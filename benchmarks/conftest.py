@@ -0,0 +1,60 @@
+""" Configuration of the benchmark suite
+
+The benchmarks need the pytest-benchmark plugin. Results are saved in
+benchmarks/results, and can be compared between commits or releases with
+pytest-benchmark compare. See benchmarks/README.md.
+"""
+import os
+import pytest
+import generators
+
+try:
+    import pytest_benchmark
+except ImportError:
+    # Without the plugin there is nothing to run
+    collect_ignore_glob=["bench_*.py"]
+
+resultsDir=os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_configure(config):
+    # Every run is saved, so that regressions between releases are visible
+    if(hasattr(config.option, "benchmark_storage")):
+        if(config.option.benchmark_storage=="file://./.benchmarks"):
+            config.option.benchmark_storage="file://"+resultsDir
+        config.option.benchmark_autosave=True
+
+def pytest_addoption(parser):
+    parser.addoption("--records", default="1000,100000",
+                     help="Comma separated list of the numbers of records of the synthetic files (default 1000,100000, up to 10000000).")
+
+def pytest_generate_tests(metafunc):
+    if("records" in metafunc.fixturenames):
+        records=[int(x) for x in metafunc.config.getoption("records").split(",")]
+        metafunc.parametrize("records", records, scope="session")
+
+@pytest.fixture(scope="session")
+def datadir(tmp_path_factory):
+    return tmp_path_factory.mktemp("data")
+
+@pytest.fixture(scope="session")
+def bedfile(datadir, records):
+    """ Path to a BED12 file with the given number of records """
+    return generators.writeFile(os.path.join(str(datadir), "%d.bed" % records), generators.bedLines(records))
+
+@pytest.fixture(scope="session")
+def gtffile(datadir, records):
+    """ Path to a GTF file with the given number of transcripts """
+    return generators.writeFile(os.path.join(str(datadir), "%d.gtf" % records), generators.gtfLines(records))
+
+@pytest.fixture(scope="session")
+def annotation(datadir, records):
+    """ Path to an annotation of half of the transcripts, with a gene name in column 1 and the transcript in column 2 """
+    lines=("G%d\ttx%d\n" % (i, i) for i in range(0, records, 2))
+    return generators.writeFile(os.path.join(str(datadir), "%d.txt" % records), lines)
+
+@pytest.fixture(scope="session")
+def intervals(datadir, records):
+    """ Path to a file with an interval of 30 bases in transcript coordinates on each transcript """
+    lines=("tx%d\t%d\t%d\n" % (i, i%20, i%20+30) for i in range(records))
+    return generators.writeFile(os.path.join(str(datadir), "%d.intervals" % records), lines)
@@ -0,0 +1,107 @@
+""" Generators of synthetic BED and GTF files for the benchmarks
+
+The records are random but reproducible: the same seed always gives the same file.
+Chromosome names follow the UCSC convention of hg38, so that they can be converted
+by translateChr.
+
+Examples:
+    $ python benchmarks/generators.py bed12 1000000 > transcripts.bed
+    $ python benchmarks/generators.py gtf 1000000 > annotation.gtf
+"""
+import random
+import sys
+
+chromosomes=["chr%s" % x for x in list(range(1, 23))+["X", "Y"]]
+
+def transcripts(n, seed=0):
+    """ Generates random BED12 transcripts
+
+    About 70% of the transcripts are coding (thickStart < thickEnd).
+
+    Args:
+        n (int): Number of transcripts
+        seed (int): Seed of the random number generator
+    Returns:
+        generator: Lists with the 12 fields of each transcript (exon lengths and starts as lists of int)
+    """
+    rng=random.Random(seed)
+    for i in range(n):
+        chrom=rng.choice(chromosomes)
+        start=rng.randint(0, 200000000)
+        lengths=[rng.randint(50, 500) for x in range(rng.randint(1, 10))]
+        starts=[0]
+        for length in lengths[:-1]:
+            starts.append(starts[-1]+length+rng.randint(50, 5000))
+        end=start+starts[-1]+lengths[-1]
+        if(rng.random() < 0.7):
+            exon=rng.randrange(len(lengths))
+            thickStart=start+starts[exon]+rng.randint(0, lengths[exon]-1)
+            thickEnd=rng.randint(thickStart+1, end)
+        else:
+            thickStart=thickEnd=start
+        yield [chrom, start, end, "tx%d" % i, 0, rng.choice("+-"), thickStart, thickEnd, 0, len(lengths), lengths, starts]
+
+def bedLines(n, bedType=12, seed=0):
+    """ Generates the lines of a random BED file
+
+    Args:
+        n (int): Number of records
+        bedType (int): Number of columns (3, 4, 6 or 12)
+        seed (int): Seed of the random number generator
+    Returns:
+        generator: The lines, terminated by a new line
+    """
+    for fields in transcripts(n, seed):
+        fields=fields[:bedType]
+        if(bedType==12):
+            fields[10]="".join("%d," % x for x in fields[10])
+            fields[11]="".join("%d," % x for x in fields[11])
+        yield "\t".join(str(x) for x in fields)+"\n"
+
+def gtfLines(n, seed=0):
+    """ Generates the lines of a random GTF file in the Ensembl format
+
+    Each transcript has a transcript line, one line per exon and, for coding
+    transcripts, one CDS line per coding exon. The transcripts of each
+    chromosome are not consecutive, as in most GTF files.
+
+    Args:
+        n (int): Number of transcripts
+        seed (int): Seed of the random number generator
+    Returns:
+        generator: The lines, terminated by a new line
+    """
+    for chrom, start, end, name, score, strand, thickStart, thickEnd, color, count, lengths, starts in transcripts(n, seed):
+        attributes='gene_id "g%s"; transcript_id "%s"; gene_name "G%s"; transcript_biotype "%s";' % (name[2:], name, name[2:], "protein_coding" if thickStart<thickEnd else "lncRNA")
+        yield "%s\tbench\ttranscript\t%d\t%d\t.\t%s\t.\t%s\n" % (chrom, start+1, end, strand, attributes)
+        for length, exonStart in zip(lengths, starts):
+            yield "%s\tbench\texon\t%d\t%d\t.\t%s\t.\t%s\n" % (chrom, start+exonStart+1, start+exonStart+length, strand, attributes)
+        for length, exonStart in zip(lengths, starts):
+            cdsStart=max(start+exonStart, thickStart)
+            cdsEnd=min(start+exonStart+length, thickEnd)
+            if(cdsStart < cdsEnd):
+                yield "%s\tbench\tCDS\t%d\t%d\t.\t%s\t0\t%s\n" % (chrom, cdsStart+1, cdsEnd, strand, attributes)
+
+def writeFile(path, lines):
+    """ Writes the lines generated by :func:`bedLines` or :func:`gtfLines` to a file
+
+    Args:
+        path (str): Path to the file
+        lines (iterable): The lines
+    Returns:
+        str: The path
+    """
+    with open(path, "w") as f:
+        f.writelines(lines)
+    return path
+
+if __name__ == "__main__":
+    if(len(sys.argv) < 3 or sys.argv[1] not in ("bed3", "bed4", "bed6", "bed12", "gtf")):
+        sys.exit("Usage: generators.py bed3|bed4|bed6|bed12|gtf records [seed]")
+    n=int(sys.argv[2])
+    seed=int(sys.argv[3]) if len(sys.argv) > 3 else 0
+    if(sys.argv[1]=="gtf"):
+        lines=gtfLines(n, seed)
+    else:
+        lines=bedLines(n, int(sys.argv[1][3:]), seed)
+    sys.stdout.writelines(lines)
@@ -0,0 +1,71 @@
+#!/usr/bin/python3
+""" Measures the time needed to start the bedparse command line tool
+
+Runs ``python -X importtime -c "import bedparse.bedparse"`` several times in a new
+interpreter and reports the median cumulative import time of bedparse and of the
+slowest modules it loads. With --max-ms the script fails when the import of
+bedparse.bedparse takes longer than the given number of milliseconds, so that it
+can be used to catch regressions of the startup time.
+
+Examples:
+    $ python benchmarks/startup.py --repeat 20 --max-ms 60
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+def importTimes(module="bedparse.bedparse"):
+    """ Imports a module in a new interpreter and returns the import times
+
+    Args:
+        module (str): Module to import
+    Returns:
+        dict: The cumulative import time (in microseconds) of the module and of each module it loaded
+    """
+    env=dict(os.environ)
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+    root=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env["PYTHONPATH"]=root+os.pathsep+env.get("PYTHONPATH", "")
+    out=subprocess.run([sys.executable, "-X", "importtime", "-c", "import "+module],
+                       env=env, stderr=subprocess.PIPE, check=True).stderr.decode()
+    times=dict()
+    for line in out.splitlines():
+        if(not line.startswith("import time:") or "cumulative" in line):
+            continue
+        self, cumulative, name = line[len("import time:"):].split("|")
+        # Modules are listed after the modules they import. A top level
+        # module ends the list of the modules imported because of it.
+        times[name.strip()]=int(cumulative)
+        if(not name[1:].startswith(" ")):
+            if(name.strip()==module):
+                return times
+            times=dict()
+    raise RuntimeError("The import time of "+module+" was not reported")
+
+def _median(values):
+    values=sorted(values)
+    return values[len(values)//2]
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Measures the import time of the bedparse command line tool.")
+    parser.add_argument("--repeat", "-r", type=int, default=10, help="Number of measurements (default 10).")
+    parser.add_argument("--top", type=int, default=10, help="Number of modules to report (default 10).")
+    parser.add_argument("--max-ms", type=float, default=None, help="Fail if the import of bedparse.bedparse takes longer than this (milliseconds).")
+    args = parser.parse_args(args)
+
+    # The first run compiles the modules, so it is not counted
+    importTimes()
+    runs=[importTimes() for i in range(args.repeat)]
+    modules=set(name for times in runs for name in times)
+    medians={name: _median([times.get(name, 0) for times in runs]) for name in modules}
+    total=medians["bedparse.bedparse"]/1000
+    print("bedparse.bedparse\t%.1f ms" % total)
+    modules.discard("bedparse.bedparse")
+    for name in sorted(modules, key=lambda x: -medians[x])[:args.top]:
+        print("%s\t%.1f ms" % (name, medians[name]/1000))
+    if(args.max_ms is not None and total > args.max_ms):
+        sys.exit("The import of bedparse.bedparse took %.1f ms, more than the limit of %.1f ms" % (total, args.max_ms))
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,9 @@
+import re
 from setuptools import setup
 
+with open("bedparse/_version.py", "r") as fh:
+    version = re.search(r'__version__ = "([^"]+)"', fh.read()).group(1)
+
 with open("README.md", "r") as fh:
     long_description = fh.read()
 
@@ -7,7 +11,7 @@ setup(name='bedparse',
       description='A simple library and CLI tool to manipulate BED files',
       long_description=long_description,
       long_description_content_type="text/markdown",
-      version="0.2.3",
+      version=version,
       url='https://github.com/tleonardi/bedparse',
       author='Tommaso Leonardi',
       author_email='tom@tleo.io',
@@ -21,6 +25,7 @@ setup(name='bedparse',
       ],
       packages=['bedparse'],
       install_requires=['argparse', 'setuptools'],
+      extras_require={'zstd': ['zstandard'], 'arrow': ['pyarrow'], 'numpy': ['numpy'], 'pandas': ['pandas', 'numpy'], 'polars': ['polars', 'numpy']},
       python_requires='>=3.4',
       entry_points={
           'console_scripts': [
@@ -263,6 +263,519 @@ class KnownValues(unittest.TestCase):
             result = bedparse.bedline(bed).bed12tobed6(whichExon="last", appendExN=True)
             self.assertEqual(result[0],res)
 
+    def test_bedbatch(self):
+        '''bedbatch methods should return the same records as the bedline methods'''
+        cases = (
+                (self.known_promoters100, lambda x: x.promoter(up=100, down=100)),
+                (self.known_introns, lambda x: x.introns()),
+                (self.known_5pUTRs, lambda x: x.utr(which=5)),
+                (self.known_3pUTRs, lambda x: x.utr(which=3)),
+                (self.known_CDSs, lambda x: x.cds()),
+                (self.known_CDS_ignoreCDSonly, lambda x: x.cds(ignoreCDSonly=True))
+                )
+        for known, method in cases:
+            batch = bedparse.bedbatch([list(bed) for bed, res in known])
+            expected = [bedparse.bedline(list(res)) for bed, res in known if res is not None]
+            self.assertEqual(list(method(batch)), expected)
+        bed, res = self.known_bed12tobed6
+        batch = bedparse.bedbatch([list(bed)]).bed12tobed6(appendExN=True)
+        self.assertEqual(list(batch), [bedparse.bedline(list(i)) for i in res])
+        for known, whichExon in ((self.known_bed12tobed6_first, "first"), (self.known_bed12tobed6_last, "last")):
+            batch = bedparse.bedbatch([list(bed) for bed, res in known]).bed12tobed6(whichExon=whichExon, appendExN=True)
+            self.assertEqual(list(batch), [bedparse.bedline(list(res[0])) for bed, res in known])
+            self.assertEqual(list(batch.source), [0, 1])
+
+    def test_compactbedline(self):
+        '''compactbedline methods should return the same records as the bedline methods'''
+        cases = (
+                (self.known_promoters, lambda x: x.promoter()),
+                (self.known_introns, lambda x: x.introns()),
+                (self.known_5pUTRs, lambda x: x.utr(which=5)),
+                (self.known_3pUTRs, lambda x: x.utr(which=3)),
+                (self.known_CDSs, lambda x: x.cds()),
+                (self.known_CDS_ignoreCDSonly, lambda x: x.cds(ignoreCDSonly=True))
+                )
+        for known, method in cases:
+            for bed, res in known:
+                result = method(bedparse.compactbedline(list(bed)))
+                if(res is None):
+                    self.assertEqual(result, None)
+                else:
+                    self.assertEqual(result.toBedline(), bedparse.bedline(list(res)))
+        for bed in self.badBed:
+            self.assertRaises(bedparse.BEDexception, bedparse.compactbedline, list(bed))
+        for tx, examples, broken_examples in self.known_tx2genome:
+            tx = bedparse.compactbedline(list(tx))
+            for (txCoord, genomeCoord) in examples:
+                self.assertEqual(tx.tx2genome(txCoord), genomeCoord)
+        record = bedparse.compactbedline([b"chr1", b"100", b"420", b"Name", b"0", b"+", b"210", b"310", b"255,0,0", b"4", b"20,20,20,20,", b"0,100,200,300,"])
+        self.assertEqual(record.color, "255,0,0")
+        self.assertEqual(record.utr(which=3).utr(which=3), None)
+
+    def test_tokenize(self):
+        '''tokenize() should raise the same exceptions as bedline for bad BED lines'''
+        from bedparse.tokenizer import tokenize
+        for bed in self.badBed:
+            line = "\t".join(str(x) for x in bed).encode()
+            with self.assertRaises(bedparse.BEDexception) as expected:
+                bedparse.bedline([str(x) for x in bed])
+            with self.assertRaises(bedparse.BEDexception) as result:
+                tokenize(line)
+            self.assertEqual(str(result.exception), str(expected.exception))
+        for bed, res in self.known_CDSs:
+            line = "\t".join(str(x) for x in bed).encode()
+            resLine = "\t".join(str(x) for x in res).encode()
+            self.assertEqual(bedparse.compactbedline.fromBytes(line).cds(), bedparse.compactbedline.fromBytes(resLine))
+
+    def test_mapChunks(self):
+        '''mapChunks() should return the same output with one or more worker processes'''
+        import io
+        import tempfile
+        import argparse
+        from bedparse import parallel
+        from bedparse.bedparse import _introns
+        bed = [bed for bed, res in self.known_introns + self.known_CDSs if len(bed)==12]
+        data = "".join("\t".join(str(x) for x in line)+"\n" for line in bed*50).encode()
+        options = argparse.Namespace()
+        expected = "".join(parallel.mapChunks(io.BytesIO(data), _introns, options, lines=7))
+        self.assertEqual(expected, bedparse.bedbatch.fromLines(data.splitlines()).introns().format())
+        chunkBytes = parallel.chunkBytes
+        parallel.chunkBytes = 100
+        try:
+            self.assertEqual("".join(parallel.mapChunks(io.BytesIO(data), _introns, options, threads=2)), expected)
+            with tempfile.NamedTemporaryFile() as bedfile:
+                bedfile.write(data)
+                bedfile.flush()
+                with open(bedfile.name, 'rb') as f:
+                    self.assertEqual("".join(parallel.mapChunks(f, _introns, options, threads=2)), expected)
+        finally:
+            parallel.chunkBytes = chunkBytes
+
+    def test_bedwriter(self):
+        '''bedwriter should write the same lines as print() without modifying the records'''
+        import io
+        from bedparse.writer import bedwriter
+        bed, res = self.known_introns[0]
+        record = bedparse.bedline(list(bed))
+        stream = io.BytesIO()
+        with bedwriter(stream) as writer:
+            writer.write(record)
+            writer.write(record)
+            writer.write(bedparse.compactbedline(list(bed)))
+            writer.write(bedparse.bedbatch([list(bed)]))
+        expected = "chr1\t100\t420\tName\t0\t+\t210\t310\t.\t4\t20,20,20,20,\t0,100,200,300,\n"
+        self.assertEqual(stream.getvalue().decode(), expected*4)
+        self.assertEqual(record, bedparse.bedline(list(bed)))
+
+    def test_gtf2bedStream(self):
+        '''Streaming and parallel gtf2bed should report the same transcripts as the default mode'''
+        import io, random, contextlib, tempfile
+        from bedparse.extsort import externalSort
+        attr = 'gene_id "g%d"; transcript_id "t%d"; transcript_biotype "protein_coding";'
+        gtf = []
+        for i in range(20):
+            start = 1000*i+1
+            gtf.append("chr%d\tsrc\ttranscript\t%d\t%d\t.\t+\t.\t%s\n" % (i//7, start, start+499, attr % (i, i)))
+            gtf.append("chr%d\tsrc\texon\t%d\t%d\t.\t+\t.\t%s\n" % (i//7, start, start+99, attr % (i, i)))
+            gtf.append("chr%d\tsrc\texon\t%d\t%d\t.\t+\t.\t%s\n" % (i//7, start+200, start+499, attr % (i, i)))
+            gtf.append("chr%d\tsrc\tCDS\t%d\t%d\t.\t+\t0\t%s\n" % (i//7, start+50, start+299, attr % (i, i)))
+        def run(lines, **kwargs):
+            out = io.StringIO()
+            with contextlib.redirect_stdout(out):
+                bedparse.gtf2bed(io.StringIO(''.join(lines)), **kwargs)
+            return out.getvalue().splitlines()
+        def runFile(lines, **kwargs):
+            out = io.StringIO()
+            with tempfile.NamedTemporaryFile('w', suffix='.gtf') as gtfFile:
+                gtfFile.write(''.join(lines))
+                gtfFile.flush()
+                with contextlib.redirect_stdout(out):
+                    bedparse.gtf2bed(open(gtfFile.name), **kwargs)
+            return out.getvalue().splitlines()
+        expected = run(gtf)
+        self.assertEqual(len(expected), 20)
+        self.assertEqual(run(gtf, stream=True), expected)
+        shuffled = list(gtf)
+        random.Random(1).shuffle(shuffled)
+        self.assertRaisesRegex(bedparse.BEDexception, "not grouped by transcript.*sort option", run, shuffled, stream=True)
+        # Transcripts split in two non consecutive parts are reported, and not converted as two records
+        split = gtf[:2]+gtf[4:8]+gtf[2:4]+gtf[8:]
+        self.assertRaisesRegex(bedparse.BEDexception, r"not grouped by transcript \(t0 ", run, split, stream=True)
+        self.assertRaisesRegex(bedparse.BEDexception, r"not grouped by chromosome \(chr0 ", run, gtf[:4]+gtf[-4:]+gtf[4:-4], stream=True)
+        self.assertEqual(run(shuffled, sort=True), expected)
+        self.assertEqual(list(externalSort(shuffled, key=lambda x: x, maxLines=7)), sorted(gtf))
+        self.assertEqual(runFile(gtf, threads=2), expected)
+        self.assertEqual(runFile(gtf, threads=2, stream=True), expected)
+        self.assertEqual(runFile(shuffled, threads=2, sort=True), run(shuffled, sort=True))
+
+    def test_parseAttributes(self):
+        '''parseAttributes should parse quoted and unquoted GTF attributes'''
+        from bedparse.converters import parseAttributes, _extraInfo
+        attributes = 'gene_id "G1"; transcript_id "T1"; exon_number 2; tag "basic"; tag "CCDS"; gene_name "A B"'
+        self.assertEqual(parseAttributes(attributes), {'gene_id': 'G1', 'transcript_id': 'T1', 'exon_number': '2', 'tag': 'CCDS', 'gene_name': 'A B'})
+        self.assertEqual(_extraInfo(attributes, ['gene_name', 'missing'], 'transcript_biotype', ['lncRNA']), {'gene_name': 'A B', 'missing': '.', 'transcript_biotype': '.'})
+
+    def test_bedindex(self):
+        '''bedindex should return the same records as a linear scan'''
+        import os
+        import random
+        import tempfile
+        rng = random.Random(1)
+        lines = ["track name=test\n"]
+        for i in range(500):
+            start = rng.randint(0, 1<<rng.choice((10, 16, 20, 30)))
+            lines.append("chr%d\t%d\t%d\tName%d\t0\t+\n" % (rng.randint(1, 3), start, start+rng.choice((0, 10, 1000, 100000, 10000000)), i))
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "test.bed")
+            with open(path, "w") as bedfile:
+                bedfile.writelines(lines)
+            with bedparse.bedindex.build(path) as index:
+                self.assertEqual(len(index), 500)
+            with bedparse.bedindex(path) as index:
+                for i in range(200):
+                    chrom = "chr%d" % rng.randint(1, 4)
+                    start = rng.randint(0, 1<<rng.choice((10, 16, 20, 30)))
+                    end = start+rng.choice((1, 100, 100000))
+                    expected = [line for line in lines[1:] if line.split("\t")[0]==chrom and int(line.split("\t")[1]) < end and max(int(line.split("\t")[2]), int(line.split("\t")[1])+1) > start]
+                    self.assertEqual([line.decode() for line in index.queryLines(chrom, start, end)], expected)
+                self.assertEqual([tx.name for tx in index.query("chr1", 0, 1<<31)], [line.split("\t")[3] for line in lines[1:] if line.startswith("chr1\t")])
+        self.assertEqual(bedparse.parseRegion("chr1:1,001-2,000"), ("chr1", 1000, 2000))
+        self.assertRaises(bedparse.BEDexception, bedparse.parseRegion, "chr1:2000-1000")
+
+    def test_bedreader(self):
+        '''bedreader should return the same lines and columns from files and streams'''
+        import io
+        import tempfile
+        from bedparse import reader
+        data = b"chr1\t10\t20\tA\t0\t+\nchr1\t10\t20\tB \r\nchr1\t10\nchr2\t30\t40\tC\t0\t-"
+        expected = [(b"chr1\t10\t20\tA\t0\t+", b"A"), (b"chr1\t10\t20\tB \r", b"B"), (b"chr1\t10", None), (b"chr2\t30\t40\tC\t0\t-", b"C")]
+        with reader.bedreader(io.BytesIO(data)) as bed:
+            self.assertEqual(list(bed.column(3)), expected)
+        blockBytes = reader.blockBytes
+        reader.blockBytes = 7
+        try:
+            with tempfile.NamedTemporaryFile() as bedfile:
+                bedfile.write(data)
+                bedfile.flush()
+                with reader.bedreader(open(bedfile.name, 'rb')) as bed:
+                    self.assertEqual(list(bed.column(3)), expected)
+                with reader.bedreader(open(bedfile.name, 'rb')) as bed:
+                    self.assertEqual(list(bed), [line for line, name in expected])
+        finally:
+            reader.blockBytes = blockBytes
+
+    def test_translator(self):
+        '''Chromosome translators should be shared, immutable and not leak patches between calls'''
+        from bedparse.translator import getTranslator
+        patch = "chr1_KN196472v1_fix"
+        translator = getTranslator("hg38", "ens")
+        self.assertIs(getTranslator("hg38", "ens"), translator)
+        self.assertIsNone(translator.translate(patch))
+        self.assertIsNotNone(getTranslator("hg38", "ens", patches=True).translate(patch))
+        bedparse.bedline([patch, 1000, 2000, "Tx1"]).translateChr(assembly="hg38", target="ens", patches=True)
+        self.assertRaises(bedparse.BEDexception, bedparse.bedline([patch, 1000, 2000, "Tx1"]).translateChr, assembly="hg38", target="ens")
+        self.assertRaises(AttributeError, setattr, translator, "patches", True)
+        with self.assertRaises(TypeError):
+            translator.table[patch] = "1"
+        self.assertEqual(translator.translateNames(["chr1", "chrM", "chrFoo", "chr1"]), ["1", "MT", None, "1"])
+        lines = [["chr1", 100, 200, "A", 0, "+"], ["chrFoo", 100, 200, "B", 0, "+"], ["chrM", 100, 200, "C", 0, "-"]]
+        batch = bedparse.bedbatch(lines)
+        self.assertEqual([record.chr for record in batch.translateChr("hg38", "ens", ignore=True)], [bedparse.bedline(line).translateChr("hg38", "ens", ignore=True).chr for line in lines])
+        self.assertEqual([record.chr for record in batch.translateChr("hg38", "ens", suppress=True)], ["1", "MT"])
+        self.assertRaises(bedparse.BEDexception, batch.translateChr, "hg38", "ens")
+
+    def test_chromAlias(self):
+        '''Registered chromosome alias tables should be usable by translateChr'''
+        import os
+        import tempfile
+        from bedparse import chromalias
+        formats = {
+            "withHeader": "# ucsc\tassembly\tgenbank\tensembl\nchr1\t1\tCM000663.2\t1\nchrUn_x\tHSCHRUN_1\tKI270302.1\tKI270302.1\n",
+            "noHeader": "1\tchr1\tensembl,assembly\nCM000663.2\tchr1\tgenbank\nKI270302.1\tchrUn_x\tgenbank,ensembl\n",
+            "report": "# Assembly name:  test\n# Sequence-Name\tSequence-Role\tAssigned-Molecule\tGenBank-Accn\tRefSeq-Accn\tUCSC-style-name\n" +
+                      "1\tassembled-molecule\t1\tCM000663.2\tNC_000001.11\tchr1\nHSCHRUN_1\tunplaced-scaffold\tna\tKI270302.1\tna\tchrUn_x\n"
+        }
+        cache = os.environ.get("BEDPARSE_CACHE")
+        with tempfile.TemporaryDirectory() as tmp:
+            os.environ["BEDPARSE_CACHE"] = tmp
+            try:
+                for assembly, content in formats.items():
+                    path = os.path.join(tmp, assembly+".txt")
+                    with open(path, "w") as aliasFile:
+                        aliasFile.write(content)
+                    self.assertIn("genbank", chromalias.registerAssembly(assembly, path))
+                    record = bedparse.bedline(["chr1", 100, 200, "Tx1"])
+                    self.assertEqual(record.translateChr(assembly=assembly, target="ens").chr, "1")
+                    self.assertEqual(record.translateChr(assembly=assembly, target="ucsc").chr, "chr1")
+                    self.assertEqual(bedparse.bedline(["chrUn_x", 100, 200, "Tx1"]).translateChr(assembly=assembly, target="ens").chr, "KI270302.1")
+                    self.assertEqual(bedparse.bedline(["KI270302.1", 100, 200, "Tx1"]).translateChr(assembly=assembly, target="ucsc").chr, "chrUn_x")
+                self.assertEqual(chromalias.registeredAssemblies(), sorted(formats))
+                self.assertRaises(bedparse.BEDexception, bedparse.bedline(["chr1", 100, 200, "Tx1"]).translateChr, assembly="hg19", target="ens")
+            finally:
+                if(cache is None):
+                    del os.environ["BEDPARSE_CACHE"]
+                else:
+                    os.environ["BEDPARSE_CACHE"] = cache
+
+    def test_startupImports(self):
+        '''The command line tool should not import modules that are only needed by some subcommands'''
+        import os
+        import subprocess
+        import sys
+        root = os.path.dirname(os.path.dirname(os.path.abspath(bedparse.__file__)))
+        code = "import sys, bedparse.bedparse; print(' '.join(sorted(sys.modules)))"
+        out = subprocess.run([sys.executable, "-c", code], cwd=root, stdout=subprocess.PIPE, check=True).stdout.decode()
+        modules = set(out.split())
+        self.assertIn("bedparse.bedparse", modules)
+        for module in ("pkg_resources", "importlib.metadata", "multiprocessing", "bedparse.chrnames", "bedparse.chromalias", "pickle", "tempfile", "csv", "json", "gzip", "threading"):
+            self.assertNotIn(module, modules)
+
+    def test_compressed(self):
+        '''Compressed files should be detected from their content and read like plain files'''
+        import gzip
+        import os
+        import tempfile
+        from bedparse import compressed
+        lines = "".join("chr1\t%d\t%d\tTx%d\n" % (i, i+100, i) for i in range(100000))
+        with tempfile.TemporaryDirectory() as tmp:
+            paths = {"plain": os.path.join(tmp, "a.bed"), "gzip": os.path.join(tmp, "b.bed"), "bgzf": os.path.join(tmp, "c.bed.gz")}
+            with open(paths["plain"], "w") as f:
+                f.write(lines)
+            with gzip.open(paths["gzip"], "wt") as f:
+                f.write(lines)
+            with compressed.openOutput(paths["bgzf"]) as f:
+                f.write(lines.encode())
+            for fmt, path in paths.items():
+                with open(path, "rb") as f:
+                    self.assertEqual(compressed.detectFormat(f.read(16)), None if fmt=="plain" else fmt)
+                with compressed.openInput(path, "r") as f:
+                    self.assertEqual(f.read(), lines)
+                with compressed.openInput(path) as f:
+                    self.assertEqual(sum(1 for line in f), 100000)
+            # Each BGZF block is a complete gzip member
+            with gzip.open(paths["bgzf"], "rt") as f:
+                self.assertEqual(f.read(), lines)
+            self.assertRaises(bedparse.BEDexception, bedparse.bedindex.build, paths["bgzf"])
+
+    def test_arrowio(self):
+        '''BED files converted to Arrow and Parquet, also partitioned by chromosome, should be read back unchanged'''
+        import os
+        import tempfile
+        from bedparse import compressed
+        self.assertEqual(compressed.detectFormat(b"ARROW1\x00\x00\xff\xff\xff\xff"), "arrow")
+        self.assertEqual(compressed.detectFormat(b"PAR1\x15\x04\x15\x00"), "parquet")
+        self.assertEqual(compressed.outputFormat("a.bed.parquet"), "parquet")
+        try:
+            import pyarrow
+        except ImportError:
+            self.skipTest("pyarrow is not installed")
+        from bedparse import arrowio
+        lines = "".join("chr%d\t%d\t%d\tTx%d\t0\t%s\t%d\t%d\t0\t2\t10,20,\t0,%d,\tGene%d\n" % (i%3+1, i, i+500, i, "+-"[i%2], i+5, i+400, 480, i//2) for i in range(1000))
+        with tempfile.TemporaryDirectory() as tmp:
+            for name in ("a.arrow", "a.parquet", "chromosomes"):
+                path = os.path.join(tmp, name)
+                with compressed.openOutput(path, partitionByChr=(name=="chromosomes"), extraColumns=["gene_id"]) as f:
+                    f.write(lines.encode())
+                with compressed.openInput(path, "r") as f:
+                    result = f.read()
+                if(name=="chromosomes"):
+                    self.assertEqual(sorted(os.listdir(path)), ["chrom=chr1", "chrom=chr2", "chrom=chr3"])
+                    result = "".join(sorted(result.splitlines(True), key=lambda x: int(x.split("\t")[3][2:])))
+                self.assertEqual(result, lines)
+            table = arrowio.readTable(os.path.join(tmp, "a.parquet"))
+            self.assertEqual(table.schema.names[-3:], ["blockSizes", "blockStarts", "gene_id"])
+            self.assertEqual(table.column("blockStarts")[1].as_py(), [0, 480])
+            self.assertRaises(bedparse.BEDexception, arrowio.toTable, [b"chr1\t10\t20", b"chr1\t10\t20\tName"])
+
+    def test_dataframe(self):
+        '''The DataFrame operations should give the same records as bedbatch, with list and exploded blocks'''
+        import importlib
+        from bedparse import dataframe
+        libraries = []
+        for name in ("pandas", "polars"):
+            try:
+                importlib.import_module(name)
+                libraries.append(name)
+            except ImportError:
+                pass
+        if(not libraries):
+            self.skipTest("Neither pandas nor polars is installed")
+        batch = bedparse.bedbatch([list(bed) for bed, res in self.known_5pUTRs+self.known_3pUTRs+self.known_CDSs])
+        operations = [("promoter", (), "promoter", ()), ("utr", (3,), "utr", (3,)), ("utr", (5,), "utr", (5,)),
+                      ("cds", (True,), "cds", (True,)), ("introns", (), "introns", ()),
+                      ("bed12tobed6", (True, "last"), "bed12tobed6", (True, "last"))]
+        for library in libraries:
+            for explode in (False, True):
+                df = dataframe.to_dataframe(batch, library, explode)
+                self.assertEqual(len(df), len(batch) if not explode else len(batch.exStarts))
+                self.assertEqual(dataframe.from_dataframe(df).format(), batch.format())
+                for function, args, method, methodArgs in operations:
+                    result = getattr(dataframe, function)(df, *args)
+                    self.assertEqual(dataframe.from_dataframe(result).format(), getattr(batch, method)(*methodArgs).format())
+
+    def test_joiner(self):
+        '''The hash join, with and without partitions, and the merge join should give the same matches'''
+        import io
+        from bedparse import joiner
+        lines = [("chr1\t%d\t%d\tTx%d" % (i, i+10, i % 500)).encode() for i in range(2000)]
+        lines.append(b"chr1\t10\t20")
+        bed = [(line, line.split(b"\t")[3] if line.count(b"\t")==3 else None) for line in lines]
+        annotation = "".join("Gene%d\tTx%d\n" % (i, i % 300) for i in range(600))
+        rows = list(joiner.readAnnotation(io.StringIO(annotation), 1))
+        self.assertEqual(rows[0], (b"Tx0", b"\tGene0"))
+        expected = list(joiner.hashJoin(bed, rows))
+        self.assertEqual(expected[0], (lines[0], [b"\tGene0", b"\tGene300"]))
+        self.assertEqual(expected[400], (lines[400], []))
+        self.assertEqual(expected[-1], (lines[-1], []))
+        self.assertEqual(list(joiner.hashJoin(bed, rows, memory=1000, partitions=7)), expected)
+        # Partitions larger than the budget are split again, and those that can't be split
+        # further (a single key, or a budget smaller than a row) are joined with a nested scan
+        self.assertEqual(list(joiner.hashJoin(bed, rows, memory=1000, partitions=2)), expected)
+        self.assertEqual(list(joiner.hashJoin(bed[:300], rows, memory=1, partitions=2)), expected[:300])
+        hot = [(b"Tx1", b"\tGene%d" % i) for i in range(100)]
+        self.assertEqual(list(joiner.hashJoin(bed[:3], hot, memory=1000, partitions=2))[1], (lines[1], [x[1] for x in hot]))
+        bed.sort(key=lambda x: x[0])
+        bed.sort(key=lambda x: b"" if x[1] is None else x[1])
+        rows.sort(key=lambda x: x[0])
+        self.assertEqual(list(joiner.mergeJoin(bed, rows)), list(joiner.hashJoin(bed, rows)))
+        self.assertRaises(bedparse.BEDexception, list, joiner.mergeJoin(reversed(bed), rows))
+
+    def test_sortBed(self):
+        '''sortBed should give the same result in memory, with runs on disk and with several workers'''
+        import io
+        import random
+        from bedparse.extsort import sortBed
+        rng = random.Random(1)
+        lines = [b"chr%d\t%d\t%d\tTx%d" % (rng.randint(1, 12), rng.randint(0, 1000), rng.randint(1000, 1100), i) for i in range(3000)]
+        data = b"track name=test\n" + b"\n".join(lines) + b"\n#chr1\t5\t10\n"
+        expected = [b"track name=test\n", b"#chr1\t5\t10\n"] + [x+b"\n" for x in sorted(lines, key=lambda x: (x.split(b"\t")[0], int(x.split(b"\t")[1]), int(x.split(b"\t")[2])))]
+        self.assertEqual(list(sortBed(io.BytesIO(data))), expected)
+        self.assertEqual(list(sortBed(io.BytesIO(data), memory=1000, maxRuns=4)), expected)
+        self.assertEqual(list(sortBed(io.BytesIO(data), memory=1000, threads=2)), expected)
+        self.assertRaises(bedparse.BEDexception, list, sortBed(io.BytesIO(b"chr1\tx\t10\n")))
+
+    def test_mergeIntervals(self):
+        '''mergeIntervals should merge overlapping records and report them sorted'''
+        from bedparse.merger import mergeIntervals
+        lines = [b"chr1\t100\t200\ta\t0\t+", b"chr1\t150\t300\tb\t0\t-", b"chr1\t160\t170\td\t0\t-",
+                 b"chr1\t200\t400\ta\t0\t+", b"chr1\t450\t600\te\t0\t+", b"chr2\t5\t10"]
+        self.assertEqual(list(mergeIntervals(lines)), [(b"chr1", 100, 400, b".", []), (b"chr1", 450, 600, b".", []), (b"chr2", 5, 10, b".", [])])
+        self.assertEqual(list(mergeIntervals([b"track name=test", b"#chr1\t1\t5000"]+lines)), list(mergeIntervals(lines)))
+        self.assertEqual(list(mergeIntervals(lines, distance=50, names=True))[0], (b"chr1", 100, 600, b".", [b"a", b"b", b"d", b"e"]))
+        self.assertEqual(list(mergeIntervals(lines, stranded=True, names=True)),
+                         [(b"chr1", 100, 400, b"+", [b"a"]), (b"chr1", 150, 300, b"-", [b"b", b"d"]), (b"chr1", 450, 600, b"+", [b"e"]), (b"chr2", 5, 10, b".", [])])
+        self.assertRaises(bedparse.BEDexception, list, mergeIntervals(reversed(lines)))
+        self.assertRaises(bedparse.BEDexception, list, mergeIntervals(lines+[b"chr1\t1000\t1001"]))
+
+    def test_intersect(self):
+        '''The sweep-line and the indexed intersections should only find overlaps in exons'''
+        import os
+        import tempfile
+        from bedparse.intersect import sweepIntersect, indexedIntersect, intersectionLines, overlap
+        a = [b"chr1\t100\t1000\ttx1\t0\t+\t150\t900\t0\t3\t100,100,100,\t0,400,800,", b"chr1\t2000\t3000\ttx2\t0\t-", b"chr2\t10\t20\ttx3"]
+        b = [b"chr1\t150\t450\tp1\t0\t+", b"chr1\t250\t350\tp2\t0\t-", b"chr1\t850\t2100\tp3\t0\t-", b"chr3\t1\t5\tp4\t0\t+"]
+        self.assertEqual(overlap([(100, 200), (500, 600), (900, 1000)], [(150, 550), (950, 960)]), [(150, 200), (500, 550), (950, 960)])
+        result = [(x.line, [(y.line, pieces) for y, pieces in matches]) for x, matches in sweepIntersect(a, b)]
+        self.assertEqual(result, [(a[0], [(b[0], [(150, 200)]), (b[2], [(900, 1000)])]), (a[1], [(b[2], [(2000, 2100)])]), (a[2], [])])
+        self.assertEqual([len(m) for x, m in sweepIntersect(a, b, strand="same")], [1, 1, 0])
+        self.assertEqual([len(m) for x, m in sweepIntersect(a, b, strand="opposite")], [1, 0, 0])
+        record, matches = next(sweepIntersect(a, b))
+        self.assertEqual(intersectionLines(record, [(150, 200), (900, 950)]), [b"chr1\t150\t950\ttx1\t0\t+\t150\t900\t0\t2\t50,50,\t0,750,"])
+        self.assertRaises(bedparse.BEDexception, list, sweepIntersect(a, list(reversed(b))))
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "b.bed")
+            with open(path, "wb") as f:
+                f.write(b"\n".join(b)+b"\n")
+            with bedparse.bedindex.build(path) as index:
+                indexed = [(x.line, [(y.line, pieces) for y, pieces in matches]) for x, matches in indexedIntersect(reversed(a), index)]
+        self.assertEqual(indexed, list(reversed(result)))
+
+    def test_tssindex(self):
+        '''tssindex should report the closest TSS with a distance signed by the strand of the transcript'''
+        from bedparse.closest import tssindex
+        index = tssindex([b"chr1\t1000\t2000\tTx1\t0\t+", b"chr1\t5000\t8000\tTx2\t0\t-", b"chr1\t5000\t6000\tTx3\t0\t+",
+                          b"chr1\t3000\t4000\tTx4", b"chr1\t1000\t1500\tTx5\t0\t+"])
+        self.assertEqual(len(index), 5)
+        self.assertEqual(index.closest("chr1", 1500, 1600), [("chr1", 1000, "Tx1", "+", 500), ("chr1", 1000, "Tx5", "+", 500)])
+        self.assertEqual(index.closest("chr1", 1500, 1600, ties=False), [("chr1", 1000, "Tx1", "+", 500)])
+        self.assertEqual(index.closest("chr1", 8500), [("chr1", 7999, "Tx2", "-", -501)])
+        self.assertEqual(index.closest("chr1", 4500), [("chr1", 5000, "Tx3", "+", -500)])
+        self.assertEqual(index.closest("chr1", 2999, 3001), [("chr1", 3000, "Tx4", ".", 0)])
+        self.assertEqual(index.closest("chr1", 2000), [("chr1", 1000, "Tx1", "+", 1000), ("chr1", 1000, "Tx5", "+", 1000), ("chr1", 3000, "Tx4", ".", -1000)])
+        self.assertEqual(index.closest("chr1", 2000, ties=False), [("chr1", 1000, "Tx1", "+", 1000)])
+        self.assertEqual(index.closest("chr2", 100), [])
+        self.assertRaises(bedparse.BEDexception, tssindex, [b"chr1\t1000\t2000"])
+
+    def test_coverage(self):
+        '''coverage should only count the exons and give the same result with any batch size'''
+        from bedparse.coverage import coverage
+        lines = [b"chr1\t100\t1000\ttx1\t0\t+\t100\t100\t0\t3\t100,100,100,\t0,400,800,", b"chr1\t150\t250\tr1\t0\t-",
+                 b"chr1\t200\t550\tr2\t0\t+\t200\t200\t0\t2\t50,50,\t0,300,", b"chr1\t950\t960\tr3\t0\t+", b"chr2\t5\t10\tr4\t0\t+"]
+        expected = [(b"chr1", 100, 150, 1), (b"chr1", 150, 250, 2), (b"chr1", 500, 550, 2), (b"chr1", 550, 600, 1),
+                    (b"chr1", 900, 950, 1), (b"chr1", 950, 960, 2), (b"chr1", 960, 1000, 1), (b"chr2", 5, 10, 1)]
+        self.assertEqual(list(coverage(lines)), expected)
+        self.assertEqual(list(coverage(lines, batchSize=1)), expected)
+        self.assertEqual(list(coverage(lines, strand="-")), [(b"chr1", 150, 250, 1)])
+        self.assertRaises(bedparse.BEDexception, list, coverage(list(reversed(lines))))
+
+    def test_keyset(self):
+        '''Both storage modes of keyset should select the same lines'''
+        from bedparse.keyset import keyset
+        keys = [b"Tx%d" % i for i in range(0, 3000, 3)] + [b"Tx3", b""]
+        lines = [b"chr1\t%d\t%d\tTx%d" % (i, i+10, i) for i in range(3000)]
+        lines += [b"chr1\t10\t20\tTx6\r", b"chr1\t10\t20\tTx9\t0\t+", b"chr1\t10\t20", b"chr1\t10\t20\tTx1 \t0"]
+        for compact in (False, True):
+            ids = keyset(iter(keys), compact=compact)
+            self.assertEqual(len(ids), 1001)
+            self.assertIn(b"Tx2997", ids)
+            self.assertNotIn(b"Tx2998", ids)
+            self.assertNotIn(b"Tx", ids)
+            selected = ids.select(lines)
+            self.assertEqual(len(selected), 1002)
+            self.assertEqual(selected[-2:], [b"chr1\t10\t20\tTx6\r", b"chr1\t10\t20\tTx9\t0\t+"])
+            self.assertEqual(ids.select(lines, inverse=True), [x for x in lines if x not in selected])
+
+    def test_exonmap(self):
+        '''exonmap should agree with tx2genome and genome2tx should be its inverse'''
+        tx = bedparse.bedline(["chr1", 1000, 2000, "Tx1", 0, "-", 1000, 1000, 0, 3, "100,200,100,", "0,400,900,"])
+        exons = bedparse.exonmap.fromBedline(tx)
+        self.assertEqual(exons.length, 400)
+        for stranded in (False, True):
+            genome = exons.tx2genome(range(400), stranded=stranded)
+            self.assertEqual(list(genome), [tx.tx2genome(x, stranded=stranded) for x in range(400)])
+            self.assertEqual(list(exons.genome2tx(genome, stranded=stranded)), list(range(400)))
+            self.assertEqual(tx.genome2tx(genome[10], stranded=stranded), 10)
+        self.assertEqual(list(exons.genome2tx([999, 1100, 1399, 1400, 1599, 2000])), [-1, -1, -1, 100, 299, -1])
+        self.assertRaises(bedparse.BEDexception, exons.tx2genome, [0, 400])
+        self.assertRaises(bedparse.BEDexception, tx.genome2tx, 1200)
+        batch = bedparse.bedbatch.fromLines([b"chr1\t1000\t2000\tTx1\t0\t-\t1000\t1000\t0\t3\t100,200,100,\t0,400,900,", b"chr1\t10\t20\tTx2"])
+        self.assertEqual(list(batch.exonMap(0).tx2genome([0, 100, 399], stranded=True)), [1999, 1599, 1000])
+        self.assertEqual(list(batch.exonMap(1).genome2tx([15])), [5])
+        self.assertRaises(bedparse.BEDexception, batch.exonMap(1).genome2tx, [15], True)
+
+    def test_tx2genomeInterval(self):
+        '''tx2genomeInterval should split intervals at the exon junctions'''
+        import argparse
+        import tempfile
+        from bedparse.bedparse import _tx2genome
+        exons = bedparse.exonmap(1000, [0, 400, 900], [100, 200, 100], "-")
+        self.assertEqual(exons.tx2genomeInterval(50, 150), (1050, 1450, [0, 350], [50, 50]))
+        self.assertEqual(exons.tx2genomeInterval(0, 400), (1000, 2000, [0, 400, 900], [100, 200, 100]))
+        self.assertEqual(exons.tx2genomeInterval(0, 10, stranded=True), (1990, 2000, [0], [10]))
+        self.assertRaises(bedparse.BEDexception, exons.tx2genomeInterval, 390, 401)
+        self.assertRaises(bedparse.BEDexception, exons.tx2genomeInterval, 10, 10)
+        with tempfile.NamedTemporaryFile() as transcripts:
+            # Commented out transcripts are ignored
+            transcripts.write(b"#chr9\t0\t5000\tTx1\t0\t+\n")
+            transcripts.write(b"chr1\t1000\t2000\tTx1\t0\t-\t1000\t1000\t0\t3\t100,200,100,\t0,400,900,\n")
+            transcripts.flush()
+            args = argparse.Namespace(transcripts=transcripts.name, stranded=True, skipMissing=False)
+            out = _tx2genome([b"Tx1\t95\t305\tORF1\t7", b"# comment", b"Tx1\t0\t1"], args)
+            self.assertEqual(out, "chr1\t1095\t1905\tORF1\t7\t-\t1095\t1095\t0\t3\t5,200,5,\t0,305,805,\n"
+                                  "chr1\t1999\t2000\tTx1\t0\t-\t1999\t1999\t0\t1\t1,\t0,\n")
+            self.assertRaises(bedparse.BEDexception, _tx2genome, [b"Tx2\t0\t1"], args)
+            args.skipMissing = True
+            self.assertEqual(_tx2genome([b"Tx2\t0\t1"], args), "")
 
     def test_tx2genome(self):
         '''tx2genome should return corred coordinates for known cases'''